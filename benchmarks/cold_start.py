@@ -0,0 +1,121 @@
+"""
+Worker cold-start benchmark.
+
+Measures how long a fresh process takes until its first rendered text: importing pixel_renderer,
+constructing the processor, and the first render (which sets up fontconfig and loads the fonts).
+Every start is a new Python process, with the fontconfig cache of the font set either:
+- cold: deleted before every start, so fontconfig scans and parses every font file
+- warm: prebuilt (as `download_fonts` does), so fontconfig only reads its cache
+
+Usage:
+    python -m benchmarks.cold_start
+    python -m benchmarks.cold_start --fonts noto_sans_minimal --starts 20 --output cold_start.json
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import shutil
+import subprocess
+import sys
+from time import perf_counter, perf_counter_ns
+
+from benchmarks.common import BenchmarkResult, add_output_arguments, report_and_compare
+
+FONT_SETS = ("noto_sans", "noto_sans_minimal")
+CACHES = ("cold", "warm")
+
+
+def _font_sources(fonts: str):
+    from font_download.example_fonts.noto_sans import FONTS_NOTO_SANS, FONTS_NOTO_SANS_MINIMAL
+
+    return {"noto_sans": FONTS_NOTO_SANS, "noto_sans_minimal": FONTS_NOTO_SANS_MINIMAL}[fonts]
+
+
+def run_start(fonts: str) -> dict:
+    """Start up in the current (fresh) process, returning the duration of every phase in nanoseconds."""
+    start = perf_counter_ns()
+    from font_download import FontConfig
+    from pixel_renderer import PixelRendererProcessor
+
+    imported = perf_counter_ns()
+    processor = PixelRendererProcessor(font=FontConfig(sources=_font_sources(fonts)))
+    initialized = perf_counter_ns()
+    processor.render_text("Hello world")
+    rendered = perf_counter_ns()
+    return {
+        "import_ns": imported - start,
+        "init_ns": initialized - imported,
+        "first_render_ns": rendered - initialized,
+        "total_ns": rendered - start,
+    }
+
+
+def _start_in_subprocess(fonts: str) -> dict:
+    completed = subprocess.run(
+        [sys.executable, "-m", "benchmarks.cold_start", "--child", fonts],
+        capture_output=True,
+        text=True,
+        check=False,
+    )
+    if completed.returncode != 0:
+        raise RuntimeError(f"Cold start with {fonts} failed:\n{completed.stderr}")
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def measure(fonts: str, cache: str, starts: int) -> BenchmarkResult:
+    from font_download import FontConfig
+    from font_download.download_fonts import build_fontconfig_cache, fontconfig_cache_dir
+
+    config_dir = FontConfig(sources=_font_sources(fonts)).get_font_dir()
+    cache_dir = fontconfig_cache_dir(config_dir)
+
+    phases = []
+    start = perf_counter()
+    for _ in range(starts):
+        if cache == "cold":
+            shutil.rmtree(cache_dir, ignore_errors=True)
+            cache_dir.mkdir(parents=True)
+        else:
+            build_fontconfig_cache(config_dir)
+        phases.append(_start_in_subprocess(fonts))
+    seconds = perf_counter() - start
+
+    def mean_ms(phase: str) -> float:
+        return sum(p[phase] for p in phases) / len(phases) / 1e6
+
+    return BenchmarkResult.from_latencies(
+        f"cold_start/{fonts}/{cache}",
+        [p["total_ns"] for p in phases],
+        seconds,
+        import_ms=mean_ms("import_ns"),
+        init_ms=mean_ms("init_ns"),
+        first_render_ms=mean_ms("first_render_ns"),
+    )
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--fonts", nargs="+", choices=FONT_SETS, default=list(FONT_SETS))
+    parser.add_argument("--caches", nargs="+", choices=CACHES, default=list(CACHES))
+    parser.add_argument("--starts", type=int, default=10, help="Process starts per case")
+    parser.add_argument("--child", choices=FONT_SETS, help=argparse.SUPPRESS)
+    add_output_arguments(parser)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(run_start(args.child)))
+        return 0
+
+    results = []
+    for fonts in args.fonts:
+        for cache in args.caches:
+            print(f"Running cold_start/{fonts}/{cache}...", file=sys.stderr)
+            results.append(measure(fonts, cache, args.starts))
+
+    return report_and_compare(results, args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
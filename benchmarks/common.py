@@ -0,0 +1,122 @@
+"""Result format, machine info and baseline comparison shared by the benchmarks."""
+
+from __future__ import annotations
+
+import json
+import os
+import platform
+import resource
+import sys
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+
+import numpy as np
+
+
+@dataclass(slots=True)
+class BenchmarkResult:
+    """One benchmark case. `key` identifies the case when comparing against a baseline."""
+
+    key: str
+    iterations: int
+    seconds: float
+    throughput_per_s: float
+    p50_ms: float
+    p99_ms: float
+    peak_rss_mb: float
+    extra: dict = field(default_factory=dict)
+
+    @classmethod
+    def from_latencies(
+        cls, key: str, latencies_ns: list[int], seconds: float, iterations: int | None = None, **extra
+    ) -> BenchmarkResult:
+        latencies_ms = np.asarray(latencies_ns, dtype=np.float64) / 1e6
+        iterations = len(latencies_ns) if iterations is None else iterations
+        return cls(
+            key=key,
+            iterations=iterations,
+            seconds=seconds,
+            throughput_per_s=iterations / seconds if seconds > 0 else 0.0,
+            p50_ms=float(np.percentile(latencies_ms, 50)) if len(latencies_ms) else 0.0,
+            p99_ms=float(np.percentile(latencies_ms, 99)) if len(latencies_ms) else 0.0,
+            peak_rss_mb=peak_rss_mb(),
+            extra=extra,
+        )
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of this process and its waited-for children, in MiB."""
+    # ru_maxrss is reported in kilobytes on Linux and in bytes on macOS
+    scale = 1 if sys.platform == "darwin" else 1024
+    peak = max(
+        resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss,
+    )
+    return peak * scale / (1024 * 1024)
+
+
+def machine_info() -> dict:
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "cpu_count": os.cpu_count(),
+    }
+
+
+def write_results(results: list[BenchmarkResult], output: Path | None) -> dict:
+    """Print results as JSON and write them to `output` if given."""
+    report = {"machine": machine_info(), "results": [result.to_dict() for result in results]}
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    print(text)
+    if output is not None:
+        output.parent.mkdir(parents=True, exist_ok=True)
+        output.write_text(text, encoding="utf-8")
+    return report
+
+
+def compare_to_baseline(results: list[BenchmarkResult], baseline_path: Path, tolerance: float) -> list[str]:
+    """Compare results against a stored report, returning a description of every regression.
+
+    A case regresses if its throughput dropped, or its p99 latency grew, by more than `tolerance`
+    (a fraction, e.g. 0.1 for 10%). Cases missing from the baseline are ignored.
+    """
+    baseline = json.loads(baseline_path.read_text(encoding="utf-8"))
+    baseline_by_key = {result["key"]: result for result in baseline["results"]}
+
+    regressions = []
+    for result in results:
+        expected = baseline_by_key.get(result.key)
+        if expected is None:
+            continue
+        if expected["throughput_per_s"] and result.throughput_per_s < expected["throughput_per_s"] * (1 - tolerance):
+            regressions.append(
+                f"{result.key}: throughput {result.throughput_per_s:.1f}/s "
+                f"< baseline {expected['throughput_per_s']:.1f}/s"
+            )
+        if expected["p99_ms"] and result.p99_ms > expected["p99_ms"] * (1 + tolerance):
+            regressions.append(f"{result.key}: p99 {result.p99_ms:.3f}ms > baseline {expected['p99_ms']:.3f}ms")
+    return regressions
+
+
+def add_output_arguments(parser) -> None:
+    parser.add_argument("--output", type=Path, help="Write the JSON report to this path")
+    parser.add_argument("--baseline", type=Path, help="Compare against a previously written JSON report")
+    parser.add_argument(
+        "--tolerance", type=float, default=0.1, help="Allowed relative regression against the baseline (default: 0.1)"
+    )
+
+
+def report_and_compare(results: list[BenchmarkResult], args) -> int:
+    """Write the report and return the process exit code (1 if any case regressed)."""
+    write_results(results, args.output)
+    if args.baseline is None:
+        return 0
+
+    regressions = compare_to_baseline(results, args.baseline, args.tolerance)
+    for regression in regressions:
+        print(f"REGRESSION {regression}", file=sys.stderr)
+    return 1 if regressions else 0
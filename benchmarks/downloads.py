@@ -0,0 +1,125 @@
+"""
+Font download benchmark.
+
+Downloads every font of `FONTS_NOTO_SANS` from a local stand-in for the font host, with:
+- urlretrieve: a new connection per font, `os.cpu_count()` downloads at once (the previous downloader)
+- session: `FontDownloader`, pooled kept-alive connections, limited per host
+
+The stand-in serves synthetic fonts, and simulates the cost of opening a (TLS) connection and the
+latency of every request, which is what pooling saves on a real host.
+
+Usage:
+    python -m benchmarks.downloads
+    python -m benchmarks.downloads --connect-ms 100 --latency-ms 30 --size-kb 512 --output downloads.json
+"""
+
+from __future__ import annotations
+
+import argparse
+import functools
+import os
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from time import perf_counter, perf_counter_ns
+from urllib.parse import quote
+from urllib.request import urlretrieve
+
+from benchmarks.common import BenchmarkResult, add_output_arguments, report_and_compare
+
+MODES = ("urlretrieve", "session")
+
+
+class _Handler(SimpleHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, for the clients that use it
+
+    def setup(self):
+        super().setup()
+        time.sleep(self.server.connect_s)
+        with self.server.lock:
+            self.server.connections += 1
+
+    def do_GET(self):
+        time.sleep(self.server.latency_s)
+        super().do_GET()
+
+    def log_message(self, format, *args):  # noqa: A002
+        pass
+
+
+class _FontHost(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, directory: Path, connect_s: float, latency_s: float) -> None:
+        super().__init__(("127.0.0.1", 0), functools.partial(_Handler, directory=directory))
+        self.connect_s = connect_s
+        self.latency_s = latency_s
+        self.connections = 0
+        self.lock = threading.Lock()
+
+
+def _download_with_urlretrieve(url: str, path: Path) -> None:
+    urlretrieve(url, path)
+
+
+def measure(mode: str, served_dir: Path, names: list[str], args: argparse.Namespace) -> BenchmarkResult:
+    from font_download.downloader import FontDownloader
+
+    host = _FontHost(served_dir, args.connect_ms / 1000, args.latency_ms / 1000)
+    threading.Thread(target=host.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{host.server_port}"
+
+    downloader = FontDownloader(max_connections_per_host=args.connections_per_host) if mode == "session" else None
+    download = downloader.download if downloader is not None else _download_with_urlretrieve
+
+    with tempfile.TemporaryDirectory() as output_dir:
+
+        def download_font(name: str) -> int:
+            start = perf_counter_ns()
+            download(f"{base_url}/{quote(name)}", Path(output_dir) / name)
+            return perf_counter_ns() - start
+
+        start = perf_counter()
+        with ThreadPoolExecutor(max_workers=os.cpu_count()) as executor:
+            latencies = list(executor.map(download_font, names))
+        seconds = perf_counter() - start
+
+    host.shutdown()
+    host.server_close()
+    if downloader is not None:
+        downloader.close()
+    return BenchmarkResult.from_latencies(
+        f"downloads/{mode}", latencies, seconds, connections=host.connections, fonts=len(names)
+    )
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--modes", nargs="+", choices=MODES, default=list(MODES))
+    parser.add_argument("--size-kb", type=int, default=256, help="Size of every served font")
+    parser.add_argument("--connect-ms", type=float, default=50, help="Simulated cost of opening a connection")
+    parser.add_argument("--latency-ms", type=float, default=20, help="Simulated latency of every request")
+    parser.add_argument("--connections-per-host", type=int, default=8)
+    add_output_arguments(parser)
+    args = parser.parse_args()
+
+    from font_download.example_fonts.noto_sans import FONTS_NOTO_SANS
+
+    names = [source.name for source in FONTS_NOTO_SANS]
+    results = []
+    with tempfile.TemporaryDirectory() as served_dir:
+        for name in names:
+            (Path(served_dir) / name).write_bytes(os.urandom(args.size_kb * 1024))
+        for mode in args.modes:
+            print(f"Running downloads/{mode}...", file=sys.stderr)
+            results.append(measure(mode, Path(served_dir), names, args))
+
+    return report_and_compare(results, args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,155 @@
+"""
+Font fallback cost per script.
+
+Renders the multilingual corpus (one string set per font family, see `benchmarks.multilingual_corpus`)
+with a warmed-up processor, and reports for every family:
+- first_hit_ms: the first render of that script, which resolves the fallback font through fontconfig/Pango
+- warm p50/p99: later renders of the same script
+- a per-stage profile of the first hit (Pango measurement includes fallback resolution and font loading,
+  show_layout includes glyph rasterization)
+
+Families whose first hit costs more than --preload-threshold-ms are reported as preload candidates.
+By default all families share one process, so the order of families affects first hits;
+use --isolate to measure every family in a fresh process.
+
+Usage:
+    python -m benchmarks.font_fallback --output fallback.json
+    python -m benchmarks.font_fallback --isolate --families NotoSansCuneiform NotoSansArabic
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import subprocess
+import sys
+from itertools import cycle, islice
+from time import perf_counter, perf_counter_ns
+
+from benchmarks.common import BenchmarkResult, add_output_arguments, report_and_compare
+from benchmarks.multilingual_corpus import build_corpus
+
+# Latin text used to initialize fontconfig and the base font before measuring any other script
+_BASE_WARMUP = ["Hello world", "The quick brown fox jumps over the lazy dog", "0123456789"]
+
+
+def _build_processor():
+    from font_download import FontConfig
+    from font_download.example_fonts.noto_sans import FONTS_NOTO_SANS
+    from pixel_renderer import PixelRendererProcessor
+
+    processor = PixelRendererProcessor(font=FontConfig(sources=FONTS_NOTO_SANS))
+    for text in _BASE_WARMUP:
+        processor.render_text(text)
+    return processor
+
+
+def measure_family(processor, family: str, texts: list[str], warm_iterations: int) -> BenchmarkResult:
+    from pixel_renderer import get_render_stats, reset_render_stats
+
+    reset_render_stats()
+    start = perf_counter_ns()
+    processor.render_text(texts[0])
+    first_hit_ns = perf_counter_ns() - start
+    first_hit = get_render_stats().stages
+
+    reset_render_stats()
+    latencies = []
+    start = perf_counter()
+    for text in islice(cycle(texts), warm_iterations):
+        text_start = perf_counter_ns()
+        processor.render_text(text)
+        latencies.append(perf_counter_ns() - text_start)
+    seconds = perf_counter() - start
+    warm = get_render_stats().stages
+
+    return BenchmarkResult.from_latencies(
+        f"fallback/{family}",
+        latencies,
+        seconds,
+        first_hit_ms=first_hit_ns / 1e6,
+        first_hit_measure_ms=first_hit["measure"].total_ns / 1e6,
+        first_hit_show_layout_ms=first_hit["show_layout"].total_ns / 1e6,
+        warm_measure_ms=warm["measure"].total_ns / warm["measure"].count / 1e6,
+        warm_show_layout_ms=warm["show_layout"].total_ns / warm["show_layout"].count / 1e6,
+    )
+
+
+def _measure_in_process(corpus: dict[str, list[str]], warm_iterations: int) -> list[BenchmarkResult]:
+    from pixel_renderer import enable_render_stats
+
+    enable_render_stats()
+    processor = _build_processor()
+    return [measure_family(processor, family, texts, warm_iterations) for family, texts in corpus.items()]
+
+
+def _measure_isolated(family: str, texts: list[str], warm_iterations: int) -> BenchmarkResult:
+    completed = subprocess.run(
+        [
+            sys.executable,
+            "-m",
+            "benchmarks.font_fallback",
+            "--warm-iterations",
+            str(warm_iterations),
+            "--child-corpus",
+            json.dumps({family: texts}),
+        ],
+        capture_output=True,
+        text=True,
+        check=False,
+    )
+    if completed.returncode != 0:
+        raise RuntimeError(f"Fallback benchmark for {family} failed:\n{completed.stderr}")
+    return BenchmarkResult(**json.loads(completed.stdout.strip().splitlines()[-1]))
+
+
+def main() -> int:
+    from font_download.example_fonts.noto_sans import FONTS_NOTO_SANS
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--families", nargs="+", help="Only measure these font families (default: all)")
+    parser.add_argument("--samples-per-family", type=int, default=8)
+    parser.add_argument("--warm-iterations", type=int, default=200)
+    parser.add_argument("--isolate", action="store_true", help="Measure every family in a fresh process")
+    parser.add_argument("--preload-threshold-ms", type=float, default=5.0)
+    parser.add_argument("--child-corpus", help=argparse.SUPPRESS)
+    add_output_arguments(parser)
+    args = parser.parse_args()
+
+    if args.child_corpus:
+        [result] = _measure_in_process(json.loads(args.child_corpus), args.warm_iterations)
+        print(json.dumps(result.to_dict(), ensure_ascii=False))
+        return 0
+
+    corpus = build_corpus(FONTS_NOTO_SANS, samples_per_family=args.samples_per_family)
+    if args.families:
+        unknown = [family for family in args.families if family not in corpus]
+        if unknown:
+            parser.error(f"unknown font families: {', '.join(unknown)} (choose from {', '.join(sorted(corpus))})")
+        corpus = {family: corpus[family] for family in args.families}
+
+    if args.isolate:
+        # Download fonts once, so that no child measures network time
+        from font_download import FontConfig
+
+        FontConfig(sources=FONTS_NOTO_SANS).get_font_dir()
+        results = [_measure_isolated(family, texts, args.warm_iterations) for family, texts in corpus.items()]
+    else:
+        results = _measure_in_process(corpus, args.warm_iterations)
+
+    exit_code = report_and_compare(results, args)
+
+    slowest = sorted(results, key=lambda result: result.extra["first_hit_ms"], reverse=True)
+    preload = [result for result in slowest if result.extra["first_hit_ms"] > args.preload_threshold_ms]
+    print(f"\n{len(preload)} font families exceed {args.preload_threshold_ms}ms on first hit:", file=sys.stderr)
+    for result in preload:
+        print(
+            f"  {result.key.removeprefix('fallback/')}: first hit {result.extra['first_hit_ms']:.2f}ms "
+            f"(measure {result.extra['first_hit_measure_ms']:.2f}ms), warm p50 {result.p50_ms:.3f}ms",
+            file=sys.stderr,
+        )
+    return exit_code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
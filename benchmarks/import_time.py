@@ -0,0 +1,97 @@
+"""
+Import-time benchmark.
+
+Measures, in fresh Python processes, how long importing each entry point of the packages takes, and
+which heavy dependencies it loads. Heavy dependencies load on first use, so a target that imports one
+it must not (e.g. `render_text` importing transformers) fails the benchmark (exit code 1).
+
+Usage:
+    python -m benchmarks.import_time
+    python -m benchmarks.import_time --targets pixel_renderer render_text --imports 20 --output import_time.json
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import subprocess
+import sys
+from time import perf_counter
+
+from benchmarks.common import BenchmarkResult, add_output_arguments, report_and_compare
+
+HEAVY_MODULES = ("transformers", "torch", "gi", "cairo", "signwriting", "utf8_tokenizer")
+
+# target: (import statement, heavy modules it must not load)
+TARGETS = {
+    "pixel_renderer": ("import pixel_renderer", HEAVY_MODULES),
+    "font_download": ("import font_download", HEAVY_MODULES),
+    "font_selection": ("import font_download.selection", HEAVY_MODULES),
+    "render_text": ("from pixel_renderer import render_text", ("transformers", "torch", "utf8_tokenizer")),
+    "processor": ("from pixel_renderer import PixelRendererProcessor", ()),
+}
+
+
+# Runs in a fresh interpreter that has imported nothing else (not even this module and its numpy)
+_CHILD_CODE = """
+import json, sys
+from time import perf_counter_ns
+start = perf_counter_ns()
+{statement}
+import_ns = perf_counter_ns() - start
+print(json.dumps({{"import_ns": import_ns, "modules": list(sys.modules)}}))
+"""
+
+
+def run_import(target: str) -> dict:
+    """Import the target in a fresh process, returning its duration and the heavy modules it loaded."""
+    statement, _ = TARGETS[target]
+    completed = subprocess.run(
+        [sys.executable, "-c", _CHILD_CODE.format(statement=statement)], capture_output=True, text=True, check=False
+    )
+    if completed.returncode != 0:
+        raise RuntimeError(f"Importing {target} failed:\n{completed.stderr}")
+    child = json.loads(completed.stdout.strip().splitlines()[-1])
+    return {"import_ns": child["import_ns"], "heavy_modules": [m for m in HEAVY_MODULES if m in child["modules"]]}
+
+
+def measure(target: str, imports: int) -> BenchmarkResult:
+    runs = []
+    start = perf_counter()
+    for _ in range(imports):
+        runs.append(run_import(target))
+    seconds = perf_counter() - start
+
+    _, forbidden = TARGETS[target]
+    heavy_modules = sorted({module for run in runs for module in run["heavy_modules"]})
+    return BenchmarkResult.from_latencies(
+        f"import/{target}",
+        [run["import_ns"] for run in runs],
+        seconds,
+        heavy_modules=heavy_modules,
+        unexpected_modules=[module for module in heavy_modules if module in forbidden],
+    )
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--targets", nargs="+", choices=list(TARGETS), default=list(TARGETS))
+    parser.add_argument("--imports", type=int, default=10, help="Fresh processes per target")
+    add_output_arguments(parser)
+    args = parser.parse_args()
+
+    results = []
+    for target in args.targets:
+        print(f"Running import/{target}...", file=sys.stderr)
+        results.append(measure(target, args.imports))
+
+    exit_code = report_and_compare(results, args)
+    for result in results:
+        if result.extra["unexpected_modules"]:
+            print(f"REGRESSION {result.key}: imports {', '.join(result.extra['unexpected_modules'])}", file=sys.stderr)
+            exit_code = 1
+    return exit_code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
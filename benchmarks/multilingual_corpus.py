@@ -0,0 +1,54 @@
+"""
+Multilingual stress corpus: one set of sample strings per font family of a font set.
+
+The strings are generated from Unicode data (see `font_download.scripts`), so no font files are needed.
+
+Usage:
+    python -m benchmarks.multilingual_corpus --output corpus.json
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import random
+from pathlib import Path
+
+from font_download.fonts import FontsSources
+from font_download.scripts import family_characters, font_family, sample_text
+
+
+def build_corpus(
+    sources: FontsSources, samples_per_family: int = 8, length: int = 16, seed: int = 0
+) -> dict[str, list[str]]:
+    """Map every font family in `sources` to `samples_per_family` random strings of its characters.
+
+    Families whose characters are unknown (e.g. scripts newer than this Python's Unicode data) are skipped.
+    """
+    rng = random.Random(seed)
+    families = dict.fromkeys(font_family(source.name) for source in sources)
+    return {
+        family: [sample_text(family, length=length, rng=rng) for _ in range(samples_per_family)]
+        for family in families
+        if family_characters(family)
+    }
+
+
+def main() -> None:
+    from font_download.example_fonts.noto_sans import FONTS_NOTO_SANS
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--samples-per-family", type=int, default=8)
+    parser.add_argument("--length", type=int, default=16, help="Characters per sample")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", type=Path, required=True)
+    args = parser.parse_args()
+
+    corpus = build_corpus(FONTS_NOTO_SANS, args.samples_per_family, args.length, args.seed)
+    args.output.parent.mkdir(parents=True, exist_ok=True)
+    args.output.write_text(json.dumps(corpus, indent=2, ensure_ascii=False), encoding="utf-8")
+    print(f"Wrote {len(corpus)} font families to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+Worker transfer benchmark.
+
+Compares sending a processor to a worker (pickling it) with sending its `PixelRendererSpec`:
+pickle size, unpickle latency, and the latency until the worker has a processor ready to render
+(unpickling, plus `spec.to_processor()` for the spec).
+
+Usage:
+    python -m benchmarks.pickle_size
+    python -m benchmarks.pickle_size --fonts noto_sans_minimal --loads 1000 --output pickle_size.json
+"""
+
+from __future__ import annotations
+
+import argparse
+import pickle
+import sys
+from time import perf_counter, perf_counter_ns
+
+from benchmarks.common import BenchmarkResult, add_output_arguments, report_and_compare
+
+FONT_SETS = ("noto_sans", "noto_sans_minimal")
+PAYLOADS = ("processor", "spec")
+
+
+def _font_sources(fonts: str):
+    from font_download.example_fonts.noto_sans import FONTS_NOTO_SANS, FONTS_NOTO_SANS_MINIMAL
+
+    return {"noto_sans": FONTS_NOTO_SANS, "noto_sans_minimal": FONTS_NOTO_SANS_MINIMAL}[fonts]
+
+
+def _rebuild(payload: str, pickled: bytes):
+    loaded = pickle.loads(pickled)
+    return loaded if payload == "processor" else loaded.to_processor()
+
+
+def measure(fonts: str, payload: str, loads: int) -> BenchmarkResult:
+    from font_download import FontConfig
+    from pixel_renderer import PixelRendererProcessor
+
+    processor = PixelRendererProcessor(font=FontConfig(sources=_font_sources(fonts)))
+    # Both are sent once the fonts are downloaded, as when starting workers
+    spec = processor.spec
+    pickled = pickle.dumps(processor if payload == "processor" else spec, protocol=pickle.HIGHEST_PROTOCOL)
+
+    unpickle_ns, rebuild_ns = [], []
+    start = perf_counter()
+    for _ in range(loads):
+        before = perf_counter_ns()
+        pickle.loads(pickled)
+        unpickle_ns.append(perf_counter_ns() - before)
+
+        before = perf_counter_ns()
+        _rebuild(payload, pickled)
+        rebuild_ns.append(perf_counter_ns() - before)
+    seconds = perf_counter() - start
+
+    return BenchmarkResult.from_latencies(
+        f"pickle/{fonts}/{payload}",
+        unpickle_ns,
+        seconds,
+        pickle_bytes=len(pickled),
+        rebuild_p50_ms=sorted(rebuild_ns)[len(rebuild_ns) // 2] / 1e6,
+    )
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--fonts", nargs="+", choices=FONT_SETS, default=list(FONT_SETS))
+    parser.add_argument("--payloads", nargs="+", choices=PAYLOADS, default=list(PAYLOADS))
+    parser.add_argument("--loads", type=int, default=200, help="Unpickles per case")
+    add_output_arguments(parser)
+    args = parser.parse_args()
+
+    results = []
+    for fonts in args.fonts:
+        for payload in args.payloads:
+            print(f"Running pickle/{fonts}/{payload}...", file=sys.stderr)
+            results.append(measure(fonts, payload, args.loads))
+
+    return report_and_compare(results, args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
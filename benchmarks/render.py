@@ -0,0 +1,216 @@
+"""
+Render benchmark for PixelRendererProcessor.
+
+Covers every combination of workload (see `benchmarks.workloads`), execution mode and start:
+- sequential: one processor rendering in a loop
+- threaded: one processor shared by a thread pool
+- multiprocess: a process pool, each worker holding its own processor
+- batched: batches of texts rendered and collated into one padded array (latency is per batch)
+- cold: a fresh process with no warm-up, so first-render costs are included
+- warm: warm-up renders in every thread/worker before measuring
+
+Every case runs in its own Python process, so peak RSS and caches do not leak between cases.
+Results are printed (and optionally written) as JSON, and can be compared against a baseline report.
+
+Usage:
+    python -m benchmarks.render
+    python -m benchmarks.render --workloads word long_text --modes sequential --output bench.json
+    python -m benchmarks.render --baseline bench.json  # exits with 1 on regression
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import multiprocessing as mp
+import os
+import subprocess
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from itertools import cycle, islice
+from time import perf_counter, perf_counter_ns
+
+import numpy as np
+
+from benchmarks.common import BenchmarkResult, add_output_arguments, report_and_compare
+from benchmarks.workloads import WORKLOADS
+
+MODES = ("sequential", "threaded", "multiprocess", "batched")
+STARTS = ("cold", "warm")
+FONT_SETS = ("noto_sans", "noto_sans_minimal")
+
+
+def _font_sources(fonts: str):
+    from font_download.example_fonts.noto_sans import FONTS_NOTO_SANS, FONTS_NOTO_SANS_MINIMAL
+
+    return {"noto_sans": FONTS_NOTO_SANS, "noto_sans_minimal": FONTS_NOTO_SANS_MINIMAL}[fonts]
+
+
+def _build_processor(fonts: str):
+    from font_download import FontConfig
+    from pixel_renderer import PixelRendererProcessor
+
+    return PixelRendererProcessor(font=FontConfig(sources=_font_sources(fonts)))
+
+
+def _render_timed(processor, texts: list[str]) -> list[int]:
+    latencies = []
+    for text in texts:
+        start = perf_counter_ns()
+        processor.render_text(text)
+        latencies.append(perf_counter_ns() - start)
+    return latencies
+
+
+def _chunks(items: list, count: int) -> list[list]:
+    return [chunk for chunk in (items[i::count] for i in range(count)) if chunk]
+
+
+# Multiprocess workers hold their processor in a global, set up once by the pool initializer
+_worker_processor = None
+
+
+def _worker_init(processor, warmup_texts: list[str]) -> None:
+    global _worker_processor
+    _worker_processor = processor
+    _render_timed(processor, warmup_texts)
+
+
+def _worker_render(texts: list[str]) -> list[int]:
+    return _render_timed(_worker_processor, texts)
+
+
+def _collate(images: list[np.ndarray]) -> np.ndarray:
+    """Pad rendered images to the widest one and stack them, like a DataLoader collate function."""
+    height = max(image.shape[0] for image in images)
+    width = max(image.shape[1] for image in images)
+    batch = np.full((len(images), height, width, 3), 255, dtype=np.uint8)
+    for i, image in enumerate(images):
+        batch[i, : image.shape[0], : image.shape[1]] = image
+    return batch
+
+
+def run_case(case: dict) -> BenchmarkResult:
+    """Run one benchmark case in the current (fresh) process."""
+    key = f"{case['workload']}/{case['mode']}/{case['start']}"
+    workload = WORKLOADS[case["workload"]]
+    texts = list(islice(cycle(workload), case["iterations"]))
+    warm = case["start"] == "warm"
+    warmup_texts = list(islice(cycle(workload), case["warmup"])) if warm else []
+    workers = case["workers"]
+
+    start = perf_counter()
+    import pixel_renderer  # noqa: F401
+
+    import_s = perf_counter() - start
+
+    start = perf_counter()
+    processor = _build_processor(case["fonts"])
+    init_s = perf_counter() - start
+
+    extra = {"import_s": import_s, "init_s": init_s, "case": case}
+
+    if case["mode"] == "sequential":
+        _render_timed(processor, warmup_texts)
+        start = perf_counter()
+        latencies = _render_timed(processor, texts)
+        seconds = perf_counter() - start
+        return BenchmarkResult.from_latencies(key, latencies, seconds, first_render_ms=latencies[0] / 1e6, **extra)
+
+    if case["mode"] == "threaded":
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            # Rendering state is per thread, so warm up the pool threads before measuring
+            list(executor.map(lambda chunk: _render_timed(processor, chunk), _chunks(warmup_texts, workers)))
+            start = perf_counter()
+            per_thread = list(executor.map(lambda chunk: _render_timed(processor, chunk), _chunks(texts, workers)))
+            seconds = perf_counter() - start
+        latencies = [latency for thread_latencies in per_thread for latency in thread_latencies]
+        return BenchmarkResult.from_latencies(key, latencies, seconds, **extra)
+
+    if case["mode"] == "multiprocess":
+        context = mp.get_context(case["start_method"])
+        start = perf_counter()
+        with context.Pool(workers, initializer=_worker_init, initargs=(processor, warmup_texts)) as pool:
+            pool_start_s = perf_counter() - start
+            start = perf_counter()
+            per_worker = pool.map(_worker_render, _chunks(texts, workers * 4))
+            seconds = perf_counter() - start
+        latencies = [latency for worker_latencies in per_worker for latency in worker_latencies]
+        return BenchmarkResult.from_latencies(key, latencies, seconds, pool_start_s=pool_start_s, **extra)
+
+    if case["mode"] == "batched":
+        batch_size = case["batch_size"]
+        for batch_start in range(0, len(warmup_texts), batch_size):
+            _collate([processor.render_text(text) for text in warmup_texts[batch_start : batch_start + batch_size]])
+        latencies = []
+        start = perf_counter()
+        for batch_start in range(0, len(texts), batch_size):
+            batch_texts = texts[batch_start : batch_start + batch_size]
+            batch_started = perf_counter_ns()
+            _collate([processor.render_text(text) for text in batch_texts])
+            latencies.append(perf_counter_ns() - batch_started)
+        seconds = perf_counter() - start
+        return BenchmarkResult.from_latencies(key, latencies, seconds, iterations=len(texts), **extra)
+
+    raise ValueError(f"Unknown mode: {case['mode']}")
+
+
+def _run_case_in_subprocess(case: dict) -> BenchmarkResult:
+    completed = subprocess.run(
+        [sys.executable, "-m", "benchmarks.render", "--case", json.dumps(case)],
+        capture_output=True,
+        text=True,
+        check=False,
+    )
+    if completed.returncode != 0:
+        raise RuntimeError(f"Benchmark case {case} failed:\n{completed.stderr}")
+    return BenchmarkResult(**json.loads(completed.stdout.strip().splitlines()[-1]))
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workloads", nargs="+", choices=list(WORKLOADS), default=list(WORKLOADS))
+    parser.add_argument("--modes", nargs="+", choices=MODES, default=list(MODES))
+    parser.add_argument("--starts", nargs="+", choices=STARTS, default=list(STARTS))
+    parser.add_argument("--fonts", choices=FONT_SETS, default="noto_sans")
+    parser.add_argument("--iterations", type=int, default=2000, help="Texts rendered per case")
+    parser.add_argument("--warmup", type=int, default=100, help="Warm-up renders per thread/worker (warm starts)")
+    parser.add_argument("--workers", type=int, default=min(4, os.cpu_count() or 1))
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--start-method", choices=mp.get_all_start_methods(), default=mp.get_start_method())
+    parser.add_argument("--case", help=argparse.SUPPRESS)
+    add_output_arguments(parser)
+    args = parser.parse_args()
+
+    if args.case:
+        print(json.dumps(run_case(json.loads(args.case)).to_dict(), ensure_ascii=False))
+        return 0
+
+    # Download fonts up front, so that no case measures network time
+    from font_download import FontConfig
+
+    FontConfig(sources=_font_sources(args.fonts)).get_font_dir()
+
+    results = []
+    for workload in args.workloads:
+        for mode in args.modes:
+            for start in args.starts:
+                case = {
+                    "workload": workload,
+                    "mode": mode,
+                    "start": start,
+                    "fonts": args.fonts,
+                    "iterations": args.iterations,
+                    "warmup": args.warmup,
+                    "workers": args.workers,
+                    "batch_size": args.batch_size,
+                    "start_method": args.start_method,
+                }
+                print(f"Running {workload}/{mode}/{start}...", file=sys.stderr)
+                results.append(_run_case_in_subprocess(case))
+
+    return report_and_compare(results, args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
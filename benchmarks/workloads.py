@@ -1,12 +1,88 @@
 # ruff: noqa: E501
-from tqdm import tqdm
+"""Text workloads shared by the benchmarks."""
 
-from font_download import FontConfig
-from font_download.example_fonts.noto_sans import FONTS_NOTO_SANS
-from pixel_renderer import PixelRendererProcessor
+from signwriting.formats.fsw_to_swu import fsw2swu
 
-# 512 words of lorem ipsum
-text = """
+# Sample words representative of real usage (mix of languages, lengths, special chars)
+WORDS = [
+    "Hello",
+    "World",
+    "the",
+    "a",
+    "is",
+    "of",
+    "and",
+    "to",
+    "in",
+    "that",
+    "שלום",
+    "עולם",
+    "את",
+    "של",
+    "על",
+    "עם",
+    "לא",
+    "הוא",
+    "היא",
+    "זה",
+    "I",
+    "you",
+    "we",
+    "they",
+    "it",
+    "be",
+    "have",
+    "do",
+    "say",
+    "get",
+    "make",
+    "go",
+    "know",
+    "take",
+    "see",
+    "come",
+    "think",
+    "look",
+    "want",
+    "give",
+    "use",
+    "find",
+    "tell",
+    "ask",
+    "work",
+    "seem",
+    "feel",
+    "try",
+    "leave",
+    "call",
+    "<en>",
+    "<he>",
+    "\x0e",
+    "\x0f",  # Special tokens
+    ".",
+    ",",
+    "!",
+    "?",
+    ":",
+    ";",
+    "-",
+    "(",
+    ")",
+    '"',
+    "hello!",
+    "world.",
+    "test,",
+    "foo-bar",
+    "(test)",
+    '"quoted"',
+    "אבגדהוזחטיכלמנסעפצקרשת",  # Hebrew alphabet
+    "ABCDEFGHIJKLMNOPQRSTUVWXYZ",  # English alphabet
+    "0123456789",  # Numbers
+    " ",  # Space
+]
+
+# 512 words of lorem ipsum, rendered as a single line (16 x 19072 pixels)
+LONG_TEXT = """
 Lorem ipsum dolor sit amet, consectetur adipiscing elit. Sed at ante nec leo condimentum blandit. Vestibulum risus elit, pellentesque at congue in, finibus in lacus. Quisque facilisis eget sapien pretium hendrerit. Donec vestibulum malesuada risus eu pharetra. Donec lectus massa, ultricies in convallis vitae, aliquet ac odio. Praesent id placerat dolor, egestas lobortis lacus. Curabitur quis est egestas, ultricies mauris non, porttitor sapien. Nam tempor et neque non mattis.
 
 Curabitur ac urna erat. Ut dictum nisi a semper auctor. Interdum et malesuada fames ac ante ipsum primis in faucibus. Vestibulum eu massa neque. Aliquam a venenatis erat, ut aliquet enim. Vestibulum elit ipsum, varius ac rutrum et, aliquet non urna. Etiam ligula libero, vehicula tristique nisl sit amet, lobortis tristique dui. In hac habitasse platea dictumst. Praesent malesuada at lorem vitae venenatis. Maecenas eget risus gravida, pretium quam non, vehicula lectus. Sed in risus congue, scelerisque risus ut, suscipit magna. Sed sollicitudin placerat egestas. Quisque fringilla non turpis et congue.
@@ -18,12 +94,67 @@ Nullam sit amet venenatis enim. Suspendisse in imperdiet purus, ut dapibus ante.
 Ut consectetur, ante at efficitur ultrices, turpis odio dignissim erat, eget bibendum eros diam ac orci. Suspendisse rutrum libero et libero accumsan, vitae auctor urna malesuada. Nam sed vestibulum nisl, vel porttitor neque. Vivamus aliquet porta ante, eu porta velit. Nam vitae luctus tellus. Aliquam erat volutpat. Vestibulum ante ipsum primis in faucibus orci luctus et ultrices posuere cubilia curae; Etiam faucibus arcu diam, sit amet sodales nisl interdum vel. Cras ex sem, laoreet sit amet volutpat sed, placerat sit amet turpis. Nulla et velit quam. Proin consequat metus ac tincidunt facilisis. Nullam vehicula sollicitudin pretium. Vivamus maximus rhoncus turpis, vel vulputate velit placerat id. Nullam ornare fermentum imperdiet. Suspendisse non diam in ex tincidunt blandit.
 """
 
-font_config = FontConfig(sources=FONTS_NOTO_SANS)
-pixel_processor = PixelRendererProcessor(font=font_config)
+MULTILINGUAL = [
+    "Hello, world!",
+    "שלום עולם",
+    "مرحبا بالعالم",
+    "नमस्ते दुनिया",
+    "হ্যালো বিশ্ব",
+    "வணக்கம் உலகம்",
+    "Привет, мир",
+    "Γειά σου Κόσμε",
+    "你好，世界",
+    "こんにちは世界",
+    "안녕하세요 세계",
+    "สวัสดีชาวโลก",
+    "გამარჯობა მსოფლიო",
+    "Բարեւ աշխարհ",
+    "ሰላም ልዑል",
+    "ආයුබෝවන් ලෝකය",
+    "ᐊᐃᓐᖓᐃ",
+    "𒀭𒆗𒀳𒀭𒁇",
+]
+
+EMOJI = [
+    "🤗",
+    "hello 🌍",
+    "👍🏽",
+    "👨‍👩‍👧‍👦",
+    "🇮🇱🇺🇸🇯🇵",
+    "🤡🎉🤖👹",
+    "❤️‍🔥 on fire",
+    "🧑🏿‍💻 coding",
+]
+
+CONTROL_TOKENS = [
+    "\x0e",
+    "\x0f",
+    "\x02",
+    "\x03",
+    "\r\n",
+    "\t",
+    " ",
+    "hello\r\n\x02 ",
+    "\x0eword\x0f",
+    "tab\tseparated\tvalues",
+    "<en>\x0e",
+    "\x00\x01\x1b",
+]
 
-# Rendered shape: (16, 19072, 3)
-print(pixel_processor.render_text(text).shape)
+SIGNWRITING = [
+    fsw2swu(fsw)
+    for fsw in [
+        "M525x535S2e748483x510S10011501x466S2e704510x500S10019476x475",
+        "AS14c20S27106M518x529S14c20481x471S27106503x489",
+        "M518x533S1870a489x515S18701482x490S20500508x496S2e734500x468",
+    ]
+]
 
-# Single threaded, ~850it/s
-for _ in tqdm(range(10000)):
-    pixel_processor.render_text(text)
+WORKLOADS = {
+    "word": WORDS,
+    "long_text": [LONG_TEXT],
+    "multilingual": MULTILINGUAL,
+    "emoji": EMOJI,
+    "control_tokens": CONTROL_TOKENS,
+    "signwriting": SIGNWRITING,
+}
@@ -8,4 +8,5 @@ if __name__ == "__main__":
 
     pixel_processor.render_text_image("hello!").save("demos_output/hello.png")
 
-    pixel_processor.save_pretrained("demos_output/processor")
+    # Saves the fonts too, so that the processor loads on machines without internet access
+    pixel_processor.save_pretrained("demos_output/processor", bundle_fonts=True)
@@ -0,0 +1,84 @@
+"""
+Atomic writes and locks of files shared between processes (font caches, fontconfig files).
+
+A file is written to a temporary file in its directory and renamed over its path once complete, so readers
+never see a partially written file. `tempfile` creates owner-only files (0600) and directories (0700),
+which the rename keeps; temporary files and directories are given the permissions of regularly created ones
+instead, so that a shared cache stays readable by the other users of it. Files read, modified and written
+by several processes (e.g. an index) are modified under a `file_lock`.
+"""
+
+from __future__ import annotations
+
+import os
+import tempfile
+from collections.abc import Iterator
+from contextlib import contextmanager
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:  # Windows: no locking across processes
+    fcntl = None
+
+
+def _current_umask() -> int:
+    # The umask can only be read by setting it, so it is read once, on import
+    umask = os.umask(0)
+    os.umask(umask)
+    return umask
+
+
+# Modes of a file created with `open(path, "w")`, and a directory created with `os.mkdir`
+_UMASK = _current_umask()
+FILE_MODE = 0o666 & ~_UMASK
+DIRECTORY_MODE = 0o777 & ~_UMASK
+
+
+def create_temp_file(directory: Path, prefix: str) -> Path:
+    """Create an empty temporary file in `directory`, with the permissions of a regularly created file."""
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix=prefix)
+    os.close(fd)
+    try:
+        os.chmod(temp_path, FILE_MODE)
+    except BaseException:
+        Path(temp_path).unlink(missing_ok=True)
+        raise
+    return Path(temp_path)
+
+
+def create_temp_dir(directory: Path, prefix: str) -> Path:
+    """Create an empty temporary directory in `directory`, with the permissions of a regularly created one."""
+    temp_dir = Path(tempfile.mkdtemp(dir=directory, prefix=prefix))
+    try:
+        os.chmod(temp_dir, DIRECTORY_MODE)
+    except BaseException:
+        temp_dir.rmdir()
+        raise
+    return temp_dir
+
+
+def write_file_atomically(path: Path, content: str | bytes) -> None:
+    """Write `content` (text is encoded as UTF-8) to `path`, replacing it in a single rename."""
+    temp_path = create_temp_file(path.parent, f".{path.name}.")
+    try:
+        if isinstance(content, str):
+            temp_path.write_text(content, encoding="utf-8")
+        else:
+            temp_path.write_bytes(content)
+        os.replace(temp_path, path)
+    except BaseException:
+        temp_path.unlink(missing_ok=True)
+        raise
+
+
+@contextmanager
+def file_lock(path: Path, shared: bool = False) -> Iterator[None]:
+    """Exclusive (or shared) lock on `path` across processes and threads.
+
+    Released when the context exits, or the process dies.
+    """
+    with open(path, "a") as lock_file:
+        if fcntl is not None:
+            fcntl.flock(lock_file, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+        yield
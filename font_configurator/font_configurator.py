@@ -5,13 +5,16 @@ import logging
 import os
 import pathlib
 import platform
-import sys
+from collections.abc import Iterable
 from ctypes.util import find_library
+from functools import cache
 from typing import ClassVar
+from xml.sax.saxutils import escape, quoteattr
 
 import gi
 from platformdirs import user_cache_dir
 
+from font_configurator.fontconfig_library import FONTCONFIG_REMAP_DIR_VERSION, fontconfig_function, load_fontconfig
 from font_configurator.fontconfig_managers import (
     BaseFontconfigManager,
     DarwinFontconfigManager,
@@ -19,13 +22,77 @@ from font_configurator.fontconfig_managers import (
     LinuxFontconfigManager,
     SupportedPlatforms,
 )
+from font_configurator.fontconfig_templates import font_selection_xml
 
 gi.require_version("Pango", "1.0")
 gi.require_version("PangoCairo", "1.0")
-from gi.repository import Pango, PangoCairo  # type: ignore  # noqa: E402, F401
+from gi.repository import GObject, Pango, PangoCairo  # type: ignore  # noqa: E402, F401
 
 FONTCONFIG_CACHE_DIR = pathlib.Path(user_cache_dir("font_configurator"))
 
+# cairo_font_type_t value of CAIRO_FONT_TYPE_FT, a fontconfig/FreeType font map independent of PANGOCAIRO_BACKEND
+CAIRO_FONT_TYPE_FT = 1
+
+# (pid, path, size, mtime_ns) of the fontconfig file that fontconfig was last reinitialized with in this process
+_active_fontconfig: tuple[int, str, int, int] | None = None
+
+
+def _fontconfig_file_state(fontconfig_path: pathlib.Path) -> tuple[int, str, int, int]:
+    stat = fontconfig_path.stat()
+    return os.getpid(), str(fontconfig_path), stat.st_size, stat.st_mtime_ns
+
+
+# A prototype of its own: declaring the types of ctypes.pythonapi.PyCapsule_GetPointer would change them for all
+# other code of the process using it
+_capsule_get_pointer = ctypes.PYFUNCTYPE(ctypes.c_void_p, ctypes.py_object, ctypes.c_char_p)(
+    ("PyCapsule_GetPointer", ctypes.pythonapi)
+)
+
+# argtypes and restype of the pangoft2 functions used, declared once when the library is loaded
+PANGOFT2_PROTOTYPES = {
+    "pango_fc_font_map_set_config": ([ctypes.c_void_p, ctypes.c_void_p], None),
+    "pango_fc_font_map_get_config": ([ctypes.c_void_p], ctypes.c_void_p),
+    "pango_fc_font_map_config_changed": ([ctypes.c_void_p], None),
+}
+
+logger = logging.getLogger(__name__)
+
+
+def _gobject_pointer(obj: GObject.Object) -> int:
+    """Address of the C object wrapped by a PyGObject object."""
+    return _capsule_get_pointer(obj.__gpointer__, None)
+
+
+def _open_pangoft2() -> ctypes.CDLL:
+    for name in ("libpangoft2-1.0.so.0", "libpangoft2-1.0.0.dylib"):
+        try:
+            return ctypes.CDLL(name)
+        except OSError:
+            logger.debug("Could not load '%s'", name)
+
+    # find_library spawns subprocesses, so it is only used when the usual names fail
+    lib_path = find_library("pangoft2-1.0")
+    if lib_path:
+        try:
+            return ctypes.CDLL(lib_path)
+        except OSError:
+            logger.debug("Could not load '%s'", lib_path)
+
+    msg = "Could not load the pangoft2 library, which is required for per-font-map fontconfig configurations."
+    logger.error(msg)
+    raise RuntimeError(msg)
+
+
+@cache
+def _load_pangoft2() -> ctypes.CDLL:
+    """Pango's fontconfig backend library, which gi has already loaded into this process, once per process."""
+    pangoft2 = _open_pangoft2()
+    for name, (argtypes, restype) in PANGOFT2_PROTOTYPES.items():
+        function = getattr(pangoft2, name)
+        function.argtypes = argtypes
+        function.restype = restype
+    return pangoft2
+
 
 class FontConfigurator:
     manager_map: ClassVar[dict[SupportedPlatforms, type[BaseFontconfigManager]]] = {
@@ -33,8 +100,10 @@ class FontConfigurator:
         SupportedPlatforms.LINUX: LinuxFontconfigManager,  # Linux
     }
 
-    def __init__(self) -> None:
+    def __init__(self, fontconfig_library: str | os.PathLike | None = None) -> None:
         self.logger = logging.getLogger(__name__)
+        # path of the fontconfig C library, by default $FONTCONFIG_LIBRARY or found on the system
+        self.fontconfig_library = fontconfig_library
         self.detected_system = self._detect_supported_system()
         self.font_manager = self._get_fontconfig_manager()
 
@@ -98,9 +167,10 @@ class FontConfigurator:
         fontconfig_destination_dir: pathlib.Path,
         font_dir: pathlib.Path,
         mode: FontconfigMode,
+        cache_dir: pathlib.Path | None = None,
     ) -> pathlib.Path:
         return self.font_manager.create_fontconfig_from_template(
-            font_dir=font_dir, fontconfig_output_dir=fontconfig_destination_dir, mode=mode
+            font_dir=font_dir, fontconfig_output_dir=fontconfig_destination_dir, mode=mode, cache_dir=cache_dir
         )
 
     def _validate_inputs(
@@ -132,6 +202,7 @@ class FontConfigurator:
             FontconfigMode.SYSTEM_EXTENDED,
             FontconfigMode.SYSTEM_ISOLATED,
             FontconfigMode.TEMPLATE_MINIMAL,
+            FontconfigMode.IN_MEMORY,
         ):
             if font_dir is None:
                 msg = f"{mode} requires 'font_dir'"
@@ -161,6 +232,7 @@ class FontConfigurator:
         fontconfig_source_path: pathlib.Path | None,
         font_dir: pathlib.Path | None,
         fontconfig_destination_dir: pathlib.Path | None,
+        fontconfig_cache_dir: pathlib.Path | None = None,
     ) -> pathlib.Path:
         match mode:
             case FontconfigMode.FROM_FILE:
@@ -199,84 +271,22 @@ class FontConfigurator:
                     fontconfig_destination_dir=fontconfig_destination_dir,
                     font_dir=font_dir,
                     mode=mode,
+                    cache_dir=fontconfig_cache_dir,
                 )
+            case FontconfigMode.IN_MEMORY:
+                assert font_dir is not None
+                return self._create_in_memory_fontconfig(font_dir=font_dir, cache_dir=fontconfig_cache_dir)
             case _:
                 msg = f"Unknown font configuration mode: {mode}"
                 self.logger.error(msg)
                 raise ValueError(msg)
 
-    def _find_and_load_fontconfig(self) -> tuple[ctypes.CDLL, str | None]:  # noqa: C901
+    def _find_and_load_fontconfig(self) -> tuple[ctypes.CDLL, str]:
         """
-        Finds and loads the fontconfig C library using multiple strategies.
-        Returns a tuple of the loaded library object and the path it was loaded from.
-        Raises RuntimeError if the library cannot be loaded.
+        Returns the process-wide fontconfig C library (see `fontconfig_library.load_fontconfig`)
+        and the path it was loaded from. Raises RuntimeError if the library cannot be loaded.
         """
-        # Strategy 1: Use ctypes.util.find_library
-        lib_path = find_library("fontconfig")
-        if lib_path:
-            try:
-                self.logger.debug("Strategy 1: Found fontconfig via find_library: %s. Attempting to load.", lib_path)
-                return ctypes.CDLL(lib_path), lib_path
-            except (OSError, TypeError) as e:
-                self.logger.warning("find_library found '%s' but ctypes could not load it: %s", lib_path, e)
-
-        # Strategy 2: Try common names and let the dynamic linker find them.
-        self.logger.debug("Strategy 2: Trying common names for the dynamic linker.")
-        darwin_names = ["libfontconfig.1.dylib", "fontconfig.dylib"]
-        linux_names = ["libfontconfig.so.1", "libfontconfig.so"]
-        generic_names = ["fontconfig"]
-
-        # Order matters: try detected-platform names first, then others as a fallback.
-        potential_names: list[str] = []
-        if self.detected_system == SupportedPlatforms.LINUX:
-            potential_names.extend(linux_names)
-            potential_names.extend(darwin_names)
-        else:  # Default to Darwin-first order
-            potential_names.extend(darwin_names)
-            potential_names.extend(linux_names)
-        potential_names.extend(generic_names)
-
-        # Remove duplicates while preserving order
-        potential_names = list(dict.fromkeys(potential_names))
-
-        for name in potential_names:
-            try:
-                self.logger.debug("Attempting to load '%s' with dynamic linker", name)
-                return ctypes.CDLL(name), name
-            except (OSError, TypeError):
-                self.logger.debug("Dynamic linker failed to find and load '%s'", name)
-
-        # Strategy 3: Manually search common directories (e.g., Homebrew, venv)
-        self.logger.debug("Strategy 3: Manually searching common library paths.")
-        search_dirs: list[pathlib.Path] = [
-            pathlib.Path("/opt/homebrew/lib"),  # Homebrew on Apple Silicon
-            pathlib.Path("/usr/local/lib"),  # Homebrew on Intel, other custom installs
-            pathlib.Path("/usr/lib64"),  # Standard Linux
-            pathlib.Path("/usr/lib"),  # Standard Linux
-            pathlib.Path(sys.prefix) / "lib",  # Python venv/conda env
-        ]
-
-        # Use the same ordered list of library names from strategy 2
-        for directory in search_dirs:
-            if not directory.is_dir():
-                continue
-            self.logger.debug("Searching in directory: %s", directory)
-            for name in potential_names:
-                candidate_path = directory / name
-                if candidate_path.is_file():
-                    self.logger.debug("Found candidate file: %s", candidate_path)
-                    try:
-                        return ctypes.CDLL(str(candidate_path)), str(candidate_path)
-                    except (OSError, TypeError) as e:
-                        self.logger.warning("Found candidate '%s' but failed to load: %s", candidate_path, e)
-
-        msg = (
-            "Could not find and load the fontconfig C library. Please ensure fontconfig "
-            "is installed and accessible. Searched standard paths, Homebrew paths, "
-            "and Python virtual environment paths."
-        )
-        self.logger.error(msg)
-        raise RuntimeError(msg)
+        return load_fontconfig(self.fontconfig_library)
 
     def _reinitialize_fontconfig_cache(self) -> None:
         """
@@ -299,6 +309,192 @@ class FontConfigurator:
             self.logger.exception(msg)
             raise RuntimeError(msg) from e
 
+    def _build_in_memory_fontconfig(
+        self,
+        font_dir: pathlib.Path,
+        cache_dir: pathlib.Path | None = None,
+        cache_alias: str | None = None,
+        selected_fonts: Iterable[pathlib.Path | str] | None = None,
+    ) -> tuple[ctypes.CDLL, int]:
+        """
+        Builds a fontconfig configuration with only `font_dir` (and optionally a cache dir) through the C API.
+        With `cache_alias`, the fonts are cached under that path instead of the path of `font_dir`.
+        With `selected_fonts`, those font files are used instead, from their own directories.
+        Returns the loaded library and the new FcConfig pointer, owned by the caller.
+        """
+        if self.detected_system not in (SupportedPlatforms.DARWIN, SupportedPlatforms.LINUX):
+            msg = f"In-memory fontconfig is not supported on this platform: {self.detected_system}"
+            self.logger.error(msg)
+            raise NotImplementedError(msg)
+
+        fontconfig, lib_path = self._find_and_load_fontconfig()
+        # Raises RuntimeError if fontconfig is too old to parse configuration XML from memory, before creating one
+        parse_from_memory = (
+            fontconfig_function(fontconfig, "FcConfigParseAndLoadFromMemory")
+            if cache_dir is not None or selected_fonts is not None
+            else None
+        )
+
+        config = fontconfig.FcConfigCreate()
+        if not config:
+            msg = f"FcConfigCreate failed in library at '{lib_path}'"
+            self.logger.error(msg)
+            raise RuntimeError(msg)
+
+        if cache_alias is not None and fontconfig.FcGetVersion() < FONTCONFIG_REMAP_DIR_VERSION:
+            self.logger.debug("fontconfig at '%s' cannot cache fonts under another path, scanning them", lib_path)
+            cache_alias = None
+
+        if cache_dir is not None:
+            # A cache dir can only be set through configuration XML, parsed from memory without touching any file
+            config_xml = f"<cachedir>{escape(str(cache_dir.resolve()))}</cachedir>"
+            if cache_alias is not None:
+                # The remapped font directory is part of the system font set, and its cache found under the alias
+                config_xml += f"<remap-dir as-path={quoteattr(cache_alias)}>{escape(str(font_dir))}</remap-dir>"
+            if not parse_from_memory(config, f"<fontconfig>{config_xml}</fontconfig>".encode(), 1):
+                self.logger.warning("Could not set fontconfig cache directory: %s", cache_dir)
+                cache_alias = None
+        else:
+            cache_alias = None
+
+        if selected_fonts is not None:
+            # The directories of the fonts are part of the system font set, filtered as they are scanned
+            selection_xml = font_selection_xml(str(path) for path in selected_fonts)
+            if not parse_from_memory(config, f"<fontconfig>{selection_xml}</fontconfig>".encode(), 1):
+                fontconfig.FcConfigDestroy(config)
+                msg = f"Could not select the fonts of font directory: {font_dir}"
+                self.logger.error(msg)
+                raise RuntimeError(msg)
+
+        # Builds the system font set (empty without a cache alias or selected fonts), so that fontconfig does not
+        # load the system configuration
+        fontconfig.FcConfigBuildFonts(config)
+        added_to_system_set = cache_alias is not None or selected_fonts is not None
+        if not added_to_system_set and not fontconfig.FcConfigAppFontAddDir(config, os.fsencode(font_dir)):
+            fontconfig.FcConfigDestroy(config)
+            msg = f"FcConfigAppFontAddDir failed for font directory: {font_dir}"
+            self.logger.error(msg)
+            raise RuntimeError(msg)
+
+        return fontconfig, config
+
+    def _create_in_memory_fontconfig(
+        self, font_dir: pathlib.Path, cache_dir: pathlib.Path | None = None
+    ) -> pathlib.Path:
+        """
+        Builds a fontconfig configuration with only `font_dir` through the C API, and makes it current.
+        Unlike TEMPLATE_MINIMAL, no file is written or parsed, and no environment variable is set.
+        Returns the font directory, as there is no configuration file.
+        """
+        global _active_fontconfig
+
+        fontconfig, config = self._build_in_memory_fontconfig(font_dir=font_dir, cache_dir=cache_dir)
+
+        # The current configuration is process-wide and lives as long as the process, so it is never destroyed
+        if not fontconfig.FcConfigSetCurrent(config):
+            msg = f"FcConfigSetCurrent failed for font directory: {font_dir}"
+            self.logger.error(msg)
+            raise RuntimeError(msg)
+        _active_fontconfig = None
+
+        self.logger.debug("Set in-memory fontconfig configuration with font directory: %s", font_dir)
+        return font_dir
+
+    def _find_and_load_pangoft2(self) -> ctypes.CDLL:
+        """
+        Returns Pango's fontconfig backend library, with the prototypes of `PANGOFT2_PROTOTYPES` declared.
+        Raises RuntimeError if the library cannot be loaded.
+        """
+        return _load_pangoft2()
+
+    def create_font_map(
+        self,
+        font_dir: pathlib.Path | str,
+        fontconfig_cache_dir: pathlib.Path | str | None = None,
+        fontconfig_cache_alias: str | None = None,
+        selected_fonts: Iterable[pathlib.Path | str] | None = None,
+    ) -> PangoCairo.FontMap:
+        """
+        Creates a Pango font map that only sees the fonts of `font_dir`, through its own fontconfig configuration.
+        With `fontconfig_cache_dir`, the scanned fonts are read from (or written to) that persistent cache.
+        With `fontconfig_cache_alias` too, they are cached under that path instead of the path of `font_dir`
+        (`<remap-dir>`), so that a cache built elsewhere, e.g. shipped in a font bundle, is used.
+        With `selected_fonts`, the font map sees those font files instead, scanned from their directories and
+        filtered (`<selectfont>`), e.g. a few fonts of a large font store, whose cache is shared by every selection.
+
+        Unlike `setup_font`, this leaves the process-wide fontconfig configuration, the environment and
+        Pango's default font map untouched, so font maps of different font directories can be used side by side.
+        Pass the font map to `pixel_renderer.renderer.render_text` to render with it.
+
+        Raises RuntimeError if the font map cannot be bound to a fontconfig configuration.
+        """
+        font_dir = pathlib.Path(font_dir).resolve()
+        font_map = PangoCairo.FontMap.new_for_font_type(CAIRO_FONT_TYPE_FT)
+        if font_map is None:
+            msg = "Cairo was built without FreeType support, so fontconfig font maps cannot be created."
+            self.logger.error(msg)
+            raise RuntimeError(msg)
+
+        pangoft2 = self._find_and_load_pangoft2()
+
+        cache_dir = pathlib.Path(fontconfig_cache_dir) if fontconfig_cache_dir is not None else None
+        if selected_fonts is not None:
+            # Matched against the paths fontconfig scans, under resolved directories
+            selected_fonts = [pathlib.Path(path).resolve() for path in selected_fonts]
+        fontconfig, config = self._build_in_memory_fontconfig(
+            font_dir=font_dir, cache_dir=cache_dir, cache_alias=fontconfig_cache_alias, selected_fonts=selected_fonts
+        )
+        # The font map holds its own reference to the configuration, which is released with the font map
+        pangoft2.pango_fc_font_map_set_config(_gobject_pointer(font_map), config)
+        fontconfig.FcConfigDestroy(config)
+
+        self.logger.debug("Created PangoCairo FontMap with in-memory fontconfig for font directory: %s", font_dir)
+        return font_map
+
+    def add_font_files(self, font_map: PangoCairo.FontMap | None, font_paths: Iterable[pathlib.Path | str]) -> None:
+        """
+        Adds font files to the fontconfig configuration of a font map from `create_font_map`, or to the
+        process-wide configuration for None (Pango's default font map, with the fontconfig backend), and
+        makes the font map see them. Used for fonts that are downloaded after the font map was created.
+
+        Raises RuntimeError if fontconfig cannot add a font file.
+        """
+        fontconfig, _ = self._find_and_load_fontconfig()
+        pangoft2 = self._find_and_load_pangoft2()
+
+        font_map_pointer = _gobject_pointer(font_map if font_map is not None else PangoCairo.FontMap.get_default())
+        # NULL for a font map without a configuration of its own, which fontconfig reads as the current one
+        config = pangoft2.pango_fc_font_map_get_config(font_map_pointer)
+        for font_path in font_paths:
+            if not fontconfig.FcConfigAppFontAddFile(config, os.fsencode(font_path)):
+                msg = f"FcConfigAppFontAddFile failed for font file: {font_path}"
+                self.logger.error(msg)
+                raise RuntimeError(msg)
+        # Drops the font map's cached font sets, so that it sees the new fonts
+        pangoft2.pango_fc_font_map_config_changed(font_map_pointer)
+
+    def _reset_pango_font_map(self, *, fontconfig_backend: bool = False) -> None:
+        if fontconfig_backend:
+            # without PANGOCAIRO_BACKEND, only a FreeType font map is guaranteed to use fontconfig (e.g. on macOS)
+            new_font_map = PangoCairo.FontMap.new_for_font_type(CAIRO_FONT_TYPE_FT)
+        else:
+            new_font_map = PangoCairo.FontMap.new()
+        PangoCairo.FontMap.set_default(new_font_map)  # type: ignore
+        self.logger.debug("Set new PangoCairo default FontMap to clear font cache.")
+
+    def _reinitialize_if_changed(self, result_path: pathlib.Path) -> None:
+        global _active_fontconfig
+
+        file_state = _fontconfig_file_state(result_path)
+        if file_state == _active_fontconfig:
+            # fontconfig already uses this exact file, reinitializing would only drop its loaded fonts
+            self.logger.debug("Fontconfig is already initialized with %s, not reinitializing.", result_path)
+            return
+
+        self._reinitialize_fontconfig_cache()
+        self._reset_pango_font_map()
+        _active_fontconfig = file_state
+
     def _configure_environment(self, result_path: pathlib.Path, *, force_reinitialize: bool = True) -> None:
         match self.detected_system:
             case SupportedPlatforms.DARWIN | SupportedPlatforms.LINUX:
@@ -313,11 +509,7 @@ class FontConfigurator:
                 # after setting the environment, force the underlying C library to re-read it
                 # this is crucial for applications/tests that switch font configs in a single process
                 if force_reinitialize:
-                    self._reinitialize_fontconfig_cache()
-
-                    new_font_map = PangoCairo.FontMap.new()
-                    PangoCairo.FontMap.set_default(new_font_map)  # type: ignore
-                    self.logger.debug("Set new PangoCairo default FontMap to clear font cache.")
+                    self._reinitialize_if_changed(result_path=result_path)
             case _:
                 msg = f"Environment variables for fontconfig are not set for this platform: {self.detected_system}"
                 self.logger.error(msg)
@@ -331,6 +523,7 @@ class FontConfigurator:
         fontconfig_destination_dir: pathlib.Path | str | None = FONTCONFIG_CACHE_DIR,
         *,
         force_reinitialize: bool = True,
+        fontconfig_cache_dir: pathlib.Path | str | None = None,
     ) -> pathlib.Path:
         # validate inputs
         fontconfig_source_path, font_dir, fontconfig_destination_dir = self._validate_inputs(
@@ -346,9 +539,16 @@ class FontConfigurator:
             fontconfig_source_path=fontconfig_source_path,
             font_dir=font_dir,
             fontconfig_destination_dir=fontconfig_destination_dir,
+            # only used by TEMPLATE_MINIMAL and IN_MEMORY, other modes keep the cache dirs of their source file
+            fontconfig_cache_dir=pathlib.Path(fontconfig_cache_dir) if fontconfig_cache_dir is not None else None,
         )
 
-        # configure environment variables
-        self._configure_environment(result_path=result_path, force_reinitialize=force_reinitialize)
+        if mode == FontconfigMode.IN_MEMORY:
+            # the configuration is already current, only Pango's cached fonts need to be dropped
+            if force_reinitialize:
+                self._reset_pango_font_map(fontconfig_backend=True)
+        else:
+            # configure environment variables
+            self._configure_environment(result_path=result_path, force_reinitialize=force_reinitialize)
 
         return result_path
@@ -0,0 +1,166 @@
+# Copyright 2025- Pavel Stepachev
+# SPDX-License-Identifier: Apache-2.0
+
+"""
+Process-wide handle to the fontconfig C library.
+
+Finding the library is slow on some hosts (`ctypes.util.find_library` spawns subprocesses), so it is
+looked up once per process and library path. The handle has the prototypes of the fontconfig
+functions used by this project declared, so pointers and booleans are passed and returned correctly.
+Functions that older fontconfig versions lack are optional: get them with `fontconfig_function`, which
+raises a RuntimeError naming the version needed only when they are used.
+Set `FONTCONFIG_LIBRARY` (or pass `library_path`) to skip the lookup and load a specific library.
+"""
+
+from __future__ import annotations
+
+import ctypes
+import logging
+import os
+import pathlib
+import platform
+import sys
+from ctypes.util import find_library
+from functools import cache
+
+FONTCONFIG_LIBRARY_ENV = "FONTCONFIG_LIBRARY"
+
+# function name: (argtypes, restype), FcBool is an int and FcConfig* an opaque pointer
+FONTCONFIG_PROTOTYPES: dict[str, tuple[list[type], type | None]] = {
+    "FcGetVersion": ([], ctypes.c_int),
+    "FcInitReinitialize": ([], ctypes.c_int),
+    "FcConfigCreate": ([], ctypes.c_void_p),
+    "FcConfigDestroy": ([ctypes.c_void_p], None),
+    "FcConfigSetCurrent": ([ctypes.c_void_p], ctypes.c_int),
+    "FcConfigBuildFonts": ([ctypes.c_void_p], ctypes.c_int),
+    "FcConfigAppFontAddDir": ([ctypes.c_void_p, ctypes.c_char_p], ctypes.c_int),
+    "FcConfigAppFontAddFile": ([ctypes.c_void_p, ctypes.c_char_p], ctypes.c_int),
+    "FcConfigParseAndLoad": ([ctypes.c_void_p, ctypes.c_char_p, ctypes.c_int], ctypes.c_int),
+    "FcDirCacheUnlink": ([ctypes.c_char_p, ctypes.c_void_p], ctypes.c_int),
+}
+
+# function name: (argtypes, restype, first fontconfig version having it), declared if the library has them
+FONTCONFIG_OPTIONAL_PROTOTYPES: dict[str, tuple[list[type], type | None, int]] = {
+    "FcConfigParseAndLoadFromMemory": ([ctypes.c_void_p, ctypes.c_char_p, ctypes.c_int], ctypes.c_int, 21200),
+}
+
+# First version (2.13.1) supporting <remap-dir>, which caches fonts under another path than their directory's
+FONTCONFIG_REMAP_DIR_VERSION = 21301
+
+logger = logging.getLogger(__name__)
+
+
+def _candidate_names() -> list[str]:
+    darwin_names = ["libfontconfig.1.dylib", "fontconfig.dylib"]
+    linux_names = ["libfontconfig.so.1", "libfontconfig.so"]
+    # Order matters: try detected-platform names first, then others as a fallback.
+    if platform.system() == "Linux":
+        return [*linux_names, *darwin_names, "fontconfig"]
+    return [*darwin_names, *linux_names, "fontconfig"]
+
+
+def _search_fontconfig() -> tuple[ctypes.CDLL, str]:
+    """Finds and loads the fontconfig C library using multiple strategies."""
+    # Strategy 1: Try common names and let the dynamic linker find them, which needs no subprocess
+    potential_names = _candidate_names()
+    for name in potential_names:
+        try:
+            logger.debug("Attempting to load '%s' with dynamic linker", name)
+            return ctypes.CDLL(name), name
+        except (OSError, TypeError):
+            logger.debug("Dynamic linker failed to find and load '%s'", name)
+
+    # Strategy 2: Use ctypes.util.find_library
+    lib_path = find_library("fontconfig")
+    if lib_path:
+        try:
+            logger.debug("Found fontconfig via find_library: %s. Attempting to load.", lib_path)
+            return ctypes.CDLL(lib_path), lib_path
+        except (OSError, TypeError) as e:
+            logger.warning("find_library found '%s' but ctypes could not load it: %s", lib_path, e)
+
+    # Strategy 3: Manually search common directories (e.g., Homebrew, venv)
+    search_dirs: list[pathlib.Path] = [
+        pathlib.Path("/opt/homebrew/lib"),  # Homebrew on Apple Silicon
+        pathlib.Path("/usr/local/lib"),  # Homebrew on Intel, other custom installs
+        pathlib.Path("/usr/lib64"),  # Standard Linux
+        pathlib.Path("/usr/lib"),  # Standard Linux
+        pathlib.Path(sys.prefix) / "lib",  # Python venv/conda env
+    ]
+    for directory in search_dirs:
+        if not directory.is_dir():
+            continue
+        for name in potential_names:
+            candidate_path = directory / name
+            if candidate_path.is_file():
+                try:
+                    return ctypes.CDLL(str(candidate_path)), str(candidate_path)
+                except (OSError, TypeError) as e:
+                    logger.warning("Found candidate '%s' but failed to load: %s", candidate_path, e)
+
+    msg = (
+        "Could not find and load the fontconfig C library. Please ensure fontconfig "
+        "is installed and accessible, or set FONTCONFIG_LIBRARY to its path. Searched standard paths, "
+        "Homebrew paths, and Python virtual environment paths."
+    )
+    logger.error(msg)
+    raise RuntimeError(msg)
+
+
+@cache
+def _load_fontconfig(library_path: str | None) -> tuple[ctypes.CDLL, str]:
+    if library_path is None:
+        fontconfig, lib_path = _search_fontconfig()
+    else:
+        try:
+            fontconfig, lib_path = ctypes.CDLL(library_path), library_path
+        except OSError as e:
+            msg = f"Could not load the fontconfig C library from '{library_path}': {e}"
+            logger.exception(msg)
+            raise RuntimeError(msg) from e
+
+    for name, (argtypes, restype) in FONTCONFIG_PROTOTYPES.items():
+        function = getattr(fontconfig, name)
+        function.argtypes = argtypes
+        function.restype = restype
+    for name, (argtypes, restype, _) in FONTCONFIG_OPTIONAL_PROTOTYPES.items():
+        if not hasattr(fontconfig, name):
+            logger.debug("fontconfig library at '%s' has no %s", lib_path, name)
+            continue
+        function = getattr(fontconfig, name)
+        function.argtypes = argtypes
+        function.restype = restype
+
+    logger.debug("Loaded fontconfig library from: %s", lib_path)
+    return fontconfig, lib_path
+
+
+def _version_string(version: int) -> str:
+    return f"{version // 10000}.{version // 100 % 100}.{version % 100}"
+
+
+def fontconfig_function(fontconfig: ctypes.CDLL, name: str) -> ctypes._CFuncPtr:
+    """
+    Returns an optional function (see `FONTCONFIG_OPTIONAL_PROTOTYPES`) of a library from `load_fontconfig`.
+    Raises RuntimeError if the library is too old to have it.
+    """
+    if not hasattr(fontconfig, name):
+        required = FONTCONFIG_OPTIONAL_PROTOTYPES[name][2]
+        msg = (
+            f"fontconfig {_version_string(fontconfig.FcGetVersion())} has no {name}, "
+            f"fontconfig >= {_version_string(required)} is required."
+        )
+        logger.error(msg)
+        raise RuntimeError(msg)
+    return getattr(fontconfig, name)
+
+
+def load_fontconfig(library_path: str | os.PathLike | None = None) -> tuple[ctypes.CDLL, str]:
+    """
+    Returns the fontconfig C library of this process, and the path it was loaded from.
+    The library is `library_path`, else `$FONTCONFIG_LIBRARY`, else found by searching the usual places.
+    Raises RuntimeError if the library cannot be loaded.
+    """
+    if library_path is None:
+        library_path = os.environ.get(FONTCONFIG_LIBRARY_ENV) or None
+    return _load_fontconfig(os.fspath(library_path) if library_path is not None else None)
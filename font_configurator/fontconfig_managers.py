@@ -3,14 +3,15 @@
 
 from __future__ import annotations
 
+import hashlib
 import logging
-import shutil
 from abc import ABC, abstractmethod
 from enum import StrEnum, unique
 from typing import TYPE_CHECKING, ClassVar
 
 from lxml import etree
 
+from font_configurator.atomic_files import write_file_atomically
 from font_configurator.fontconfig_templates import (
     DARWIN_FONTCONFIG_REMOVE_SYSTEM_FONTS_PATTERNS,
     DARWIN_FONTCONFIG_TEMPLATE_CONFIG_MINIMAL,
@@ -35,6 +36,7 @@ class FontconfigMode(StrEnum):
     SYSTEM_EXTENDED = "system_extended"  # use system fontconfig with custom font directory
     SYSTEM_ISOLATED = "system_isolated"  # use system fontconfig with custom font directory and no system fonts
     TEMPLATE_MINIMAL = "template_minimal"  # use template (minimal) fontconfig only with custom font directory
+    IN_MEMORY = "in_memory"  # build a fontconfig configuration in memory only with custom font directory (no files)
 
 
 class BaseFontconfigManager(ABC):
@@ -49,10 +51,40 @@ class BaseFontconfigManager(ABC):
         self.logger.debug("Parsing XML fontconfig file: %s", fontconfig_path)
         return etree.parse(str(fontconfig_path))
 
+    def _serialize_xml_config(self, tree: etree._ElementTree) -> bytes:
+        etree.indent(tree, space="\t")
+        return etree.tostring(tree, encoding="UTF-8", xml_declaration=True, pretty_print=True)
+
+    def _write_file_atomically(self, file_path: pathlib.Path, content: bytes) -> None:
+        # readers (e.g. other processes loading the same config) never see a partially written file
+        if file_path.is_file() and file_path.read_bytes() == content:
+            self.logger.debug("Identical fontconfig file already exists, not rewriting: %s", file_path)
+            return
+
+        write_file_atomically(file_path, content)
+
     def _write_xml_config_file(self, fontconfig_path: pathlib.Path, tree: etree._ElementTree) -> None:
         self.logger.debug("Writing XML fontconfig file to: %s", fontconfig_path)
-        etree.indent(tree, space="\t")
-        tree.write(str(fontconfig_path), encoding="utf-8", xml_declaration=True, pretty_print=True)
+        self._write_file_atomically(file_path=fontconfig_path, content=self._serialize_xml_config(tree=tree))
+
+    def _content_addressed_path(self, output_dir: pathlib.Path, mode: FontconfigMode, content: bytes) -> pathlib.Path:
+        digest = hashlib.sha256(content).hexdigest()[:16]
+        return output_dir.joinpath(f"{mode}-{digest}{self.fontconfig_extension}").resolve()
+
+    def _write_content_addressed_config(
+        self, output_dir: pathlib.Path, mode: FontconfigMode, content: bytes
+    ) -> pathlib.Path:
+        """Write a fontconfig file named by its content, so that identical configurations share one file.
+
+        Many processes setting up the same fonts at once (e.g. DataLoader workers) then write the file
+        at most once, and never overwrite a file that another process is reading.
+        """
+        result_path = self._content_addressed_path(output_dir=output_dir, mode=mode, content=content)
+        if result_path.is_file():
+            self.logger.debug("Fontconfig file already exists: %s", result_path)
+        else:
+            self._write_file_atomically(file_path=result_path, content=content)
+        return result_path
 
     def _validate_conf_file_existence(self, file_path: pathlib.Path) -> None:
         if not file_path.is_file() or file_path.suffix != self.fontconfig_extension:
@@ -88,12 +120,11 @@ class BaseFontconfigManager(ABC):
         self._validate_conf_file_existence(file_path=fontconfig_source_path)
 
         fontconfig_destination_dir.mkdir(parents=True, exist_ok=True)
-        result_path = (
-            fontconfig_destination_dir.joinpath(FontconfigMode.SYSTEM_COPY)
-            .with_suffix(self.fontconfig_extension)
-            .resolve()
+        result_path = self._write_content_addressed_config(
+            output_dir=fontconfig_destination_dir,
+            mode=FontconfigMode.SYSTEM_COPY,
+            content=fontconfig_source_path.read_bytes(),
         )
-        shutil.copy(fontconfig_source_path, result_path)
         self.logger.debug("Fontconfig copied to: %s", result_path)
         return result_path
 
@@ -111,7 +142,11 @@ class BaseFontconfigManager(ABC):
 
     @abstractmethod
     def create_fontconfig_from_template(
-        self, font_dir: pathlib.Path, fontconfig_output_dir: pathlib.Path, mode: FontconfigMode
+        self,
+        font_dir: pathlib.Path,
+        fontconfig_output_dir: pathlib.Path,
+        mode: FontconfigMode,
+        cache_dir: pathlib.Path | None = None,
     ) -> pathlib.Path: ...
 
 
@@ -170,12 +205,11 @@ class DarwinFontconfigManager(BaseFontconfigManager):
 
         tree = self._parse_xml_config_file(fontconfig_path=fontconfig_path)
         tree = self._insert_font_dir(tree=tree, font_dir=font_dir)
-        result_path = (
-            fontconfig_path.parent.joinpath(FontconfigMode.SYSTEM_EXTENDED)
-            .with_suffix(self.fontconfig_extension)
-            .resolve()
+        result_path = self._write_content_addressed_config(
+            output_dir=fontconfig_path.parent,
+            mode=FontconfigMode.SYSTEM_EXTENDED,
+            content=self._serialize_xml_config(tree=tree),
         )
-        self._write_xml_config_file(fontconfig_path=result_path, tree=tree)
         self.logger.debug("New fontconfig created at: %s", result_path)
         return result_path
 
@@ -192,17 +226,20 @@ class DarwinFontconfigManager(BaseFontconfigManager):
         tree = self._remove_system_fonts(tree=tree)
         tree = self._insert_font_dir(tree=tree, font_dir=font_dir)
 
-        result_path = (
-            fontconfig_path.parent.joinpath(FontconfigMode.SYSTEM_ISOLATED)
-            .with_suffix(self.fontconfig_extension)
-            .resolve()
+        result_path = self._write_content_addressed_config(
+            output_dir=fontconfig_path.parent,
+            mode=FontconfigMode.SYSTEM_ISOLATED,
+            content=self._serialize_xml_config(tree=tree),
         )
-        self._write_xml_config_file(fontconfig_path=result_path, tree=tree)
         self.logger.debug("New fontconfig created at: %s", result_path)
         return result_path
 
     def create_fontconfig_from_template(
-        self, font_dir: pathlib.Path, fontconfig_output_dir: pathlib.Path, mode: FontconfigMode
+        self,
+        font_dir: pathlib.Path,
+        fontconfig_output_dir: pathlib.Path,
+        mode: FontconfigMode,
+        cache_dir: pathlib.Path | None = None,
     ) -> pathlib.Path:
         """Create fontconfig file from a predefined template."""
         font_dir = font_dir.resolve()
@@ -223,11 +260,16 @@ class DarwinFontconfigManager(BaseFontconfigManager):
 
         # Parse the string content into an lxml element
         root = etree.fromstring(config_content.encode("utf-8"))
+        if cache_dir is not None:
+            # Persistent cache, so that processes read the scanned fonts instead of scanning them again
+            cache_dir_element = etree.SubElement(root, "cachedir")
+            cache_dir_element.text = str(cache_dir.resolve())
         tree = etree.ElementTree(root)
 
         fontconfig_output_dir.mkdir(parents=True, exist_ok=True)
-        result_path = fontconfig_output_dir.joinpath(mode).with_suffix(self.fontconfig_extension).resolve()
-        self._write_xml_config_file(fontconfig_path=result_path, tree=tree)
+        result_path = self._write_content_addressed_config(
+            output_dir=fontconfig_output_dir, mode=mode, content=self._serialize_xml_config(tree=tree)
+        )
         self.logger.debug("Fontconfig created at: %s", result_path)
         return result_path
 
@@ -287,12 +329,11 @@ class LinuxFontconfigManager(BaseFontconfigManager):
 
         tree = self._parse_xml_config_file(fontconfig_path=fontconfig_path)
         tree = self._insert_font_dir(tree=tree, font_dir=font_dir)
-        result_path = (
-            fontconfig_path.parent.joinpath(FontconfigMode.SYSTEM_EXTENDED)
-            .with_suffix(self.fontconfig_extension)
-            .resolve()
+        result_path = self._write_content_addressed_config(
+            output_dir=fontconfig_path.parent,
+            mode=FontconfigMode.SYSTEM_EXTENDED,
+            content=self._serialize_xml_config(tree=tree),
         )
-        self._write_xml_config_file(fontconfig_path=result_path, tree=tree)
         self.logger.debug("New fontconfig created at: %s", result_path)
         return result_path
 
@@ -309,17 +350,20 @@ class LinuxFontconfigManager(BaseFontconfigManager):
         tree = self._remove_system_fonts(tree=tree)
         tree = self._insert_font_dir(tree=tree, font_dir=font_dir)
 
-        result_path = (
-            fontconfig_path.parent.joinpath(FontconfigMode.SYSTEM_ISOLATED)
-            .with_suffix(self.fontconfig_extension)
-            .resolve()
+        result_path = self._write_content_addressed_config(
+            output_dir=fontconfig_path.parent,
+            mode=FontconfigMode.SYSTEM_ISOLATED,
+            content=self._serialize_xml_config(tree=tree),
         )
-        self._write_xml_config_file(fontconfig_path=result_path, tree=tree)
         self.logger.debug("New fontconfig created at: %s", result_path)
         return result_path
 
     def create_fontconfig_from_template(
-        self, font_dir: pathlib.Path, fontconfig_output_dir: pathlib.Path, mode: FontconfigMode
+        self,
+        font_dir: pathlib.Path,
+        fontconfig_output_dir: pathlib.Path,
+        mode: FontconfigMode,
+        cache_dir: pathlib.Path | None = None,
     ) -> pathlib.Path:
         """Create fontconfig file from a predefined template."""
         font_dir = font_dir.resolve()
@@ -340,10 +384,15 @@ class LinuxFontconfigManager(BaseFontconfigManager):
 
         # Parse the string content into an lxml element
         root = etree.fromstring(config_content.encode("utf-8"))
+        if cache_dir is not None:
+            # Persistent cache, so that processes read the scanned fonts instead of scanning them again
+            cache_dir_element = etree.SubElement(root, "cachedir")
+            cache_dir_element.text = str(cache_dir.resolve())
         tree = etree.ElementTree(root)
 
         fontconfig_output_dir.mkdir(parents=True, exist_ok=True)
-        result_path = fontconfig_output_dir.joinpath(mode).with_suffix(self.fontconfig_extension).resolve()
-        self._write_xml_config_file(fontconfig_path=result_path, tree=tree)
+        result_path = self._write_content_addressed_config(
+            output_dir=fontconfig_output_dir, mode=mode, content=self._serialize_xml_config(tree=tree)
+        )
         self.logger.debug("Fontconfig created at: %s", result_path)
         return result_path
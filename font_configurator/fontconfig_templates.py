@@ -1,7 +1,10 @@
 # Copyright 2025- Pavel Stepachev
 # SPDX-License-Identifier: Apache-2.0
 
+import os
+from collections.abc import Iterable
 from string import Template
+from xml.sax.saxutils import escape
 
 # --- DARWIN (MacOS) ---
 DARWIN_FONTCONFIG_TEMPLATE_CONFIG_MINIMAL = Template("""<?xml version="1.0"?>
@@ -26,3 +29,25 @@ LINUX_FONTCONFIG_TEMPLATE_CONFIG_MINIMAL = Template("""<?xml version="1.0"?>
 
 LINUX_FONTCONFIG_TEMPLATE_INSERT_FONT_DIR = Template("\t<dir>$font_dir</dir>\n")
 LINUX_FONTCONFIG_REMOVE_SYSTEM_FONTS_PATTERNS = ("/usr/share/fonts", "/usr/local/share/fonts", "~/.fonts")
+
+
+# --- FONT SELECTION (all platforms) ---
+def font_selection_xml(font_paths: Iterable[str]) -> str:
+    """`<dir>` elements for the directories of `font_paths`, each with `<selectfont>` rules rejecting its other
+    font files (e.g. the other fonts of a font store), one element per line.
+
+    Fontconfig matches the rules against the paths of the files it scans, so the paths must be written the same
+    way as their directories.
+    """
+    font_dirs: dict[str, list[str]] = {}
+    for path in font_paths:
+        font_dirs.setdefault(os.path.dirname(path), []).append(path)
+
+    elements = []
+    for font_dir, paths in font_dirs.items():
+        accepted = "".join(f"<acceptfont><glob>{escape(path)}</glob></acceptfont>" for path in paths)
+        elements.append(f"<dir>{escape(font_dir)}</dir>")
+        elements.append(
+            f"<selectfont><rejectfont><glob>{escape(font_dir)}/*</glob></rejectfont>{accepted}</selectfont>"
+        )
+    return "\n".join(elements)
@@ -1,2 +1,18 @@
-from .config import FontConfig  # noqa: F401
+import importlib
+
 from .download_fonts import download_fonts  # noqa: F401
+
+# Imported on first use, as FontConfig imports transformers
+_LAZY_ATTRIBUTES = {"FontConfig": "font_download.config"}
+
+
+def __getattr__(name: str):
+    if name not in _LAZY_ATTRIBUTES:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(_LAZY_ATTRIBUTES[name]), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__() -> list[str]:
+    return sorted([*globals(), *_LAZY_ATTRIBUTES])
@@ -0,0 +1,214 @@
+"""
+Font bundles, to render on machines that cannot download fonts (e.g. air-gapped clusters).
+
+A bundle holds copies of the fonts of a font directory, and their prebuilt fontconfig cache:
+
+    <bundle>/
+        bundle.json                         hash of the font sources
+        config/<sources hash>/              fonts, sources.json, coverage.json and fonts.conf
+        fontconfig_cache/<sources hash>/    fontconfig cache of the fonts
+
+A bundle directory is used in place, wherever it is copied to. Fontconfig caches the fonts under a fixed
+path (`<remap-dir>`) instead of the path of the bundle, so the prebuilt cache stays valid as long as the
+modification time of the font directory is kept (e.g. `cp -a`, `rsync -a`, or an archive), and no font is
+scanned. A bundle can also be a single tar archive, which is extracted once into the font cache.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+import shutil
+import tarfile
+import tempfile
+from pathlib import Path
+from xml.sax.saxutils import escape, quoteattr
+
+from font_configurator.atomic_files import create_temp_dir, create_temp_file, file_lock, write_file_atomically
+from font_configurator.fontconfig_library import FONTCONFIG_REMAP_DIR_VERSION, fontconfig_function, load_fontconfig
+from font_download.coverage import FONT_SELECTION_FILE, font_files
+from font_download.download_fonts import (
+    _record_use,
+    font_bundles_dir,
+    uses_font_store,
+)
+
+BUNDLE_INFO_FILE = "bundle.json"
+
+
+def fontconfig_cache_alias(sources_hash: str) -> str:
+    """Path that fontconfig caches the fonts of a bundle under, wherever the bundle is."""
+    return f"/font_download/bundle/{sources_hash}"
+
+
+def bundle_fontconfig_cache(font_dir: str | Path) -> tuple[Path, str] | None:
+    """Fontconfig cache directory and cache alias of the font directory of a bundle, None if it is not in a bundle."""
+    font_dir = Path(font_dir)
+    bundle_dir = font_dir.parent.parent
+    if not (bundle_dir / BUNDLE_INFO_FILE).is_file():
+        return None
+    return bundle_dir / "fontconfig_cache" / font_dir.name, fontconfig_cache_alias(font_dir.name)
+
+
+def _build_fontconfig_cache(font_dir: Path, cache_dir: Path, cache_alias: str) -> bool:
+    """Scan the fonts of a bundle once, so that fontconfig writes their cache under the cache alias."""
+    try:
+        fontconfig, _ = load_fontconfig()
+    except RuntimeError:
+        logging.debug("fontconfig library not found, not prebuilding the fontconfig cache of the bundle")
+        return False
+    if fontconfig.FcGetVersion() < FONTCONFIG_REMAP_DIR_VERSION:
+        logging.warning("fontconfig is too old to cache fonts under another path, the bundle has no fontconfig cache")
+        return False
+
+    config_xml = (
+        f"<fontconfig><cachedir>{escape(str(cache_dir))}</cachedir>"
+        f"<remap-dir as-path={quoteattr(cache_alias)}>{escape(str(font_dir))}</remap-dir></fontconfig>"
+    )
+    config = fontconfig.FcConfigCreate()
+    try:
+        return bool(
+            fontconfig_function(fontconfig, "FcConfigParseAndLoadFromMemory")(config, config_xml.encode("utf-8"), 1)
+            and fontconfig.FcConfigBuildFonts(config)
+        )
+    finally:
+        fontconfig.FcConfigDestroy(config)
+
+
+def create_bundle_fontconfig_xml(font_dir: Path) -> None:
+    """Create fontconfig XML file pointing to the font directory of a bundle, wherever the bundle is."""
+    xml_content = """<?xml version="1.0"?>
+<!DOCTYPE fontconfig SYSTEM "urn:fontconfig:fonts.dtd">
+<fontconfig>
+    <dir prefix="relative">.</dir>
+</fontconfig>
+"""
+    write_file_atomically(font_dir / "fonts.conf", xml_content)
+
+
+def _write_bundle(font_dir: Path, bundle_dir: Path) -> None:
+    sources_hash = font_dir.name
+    bundled_font_dir = bundle_dir / "config" / sources_hash
+    bundled_font_dir.mkdir(parents=True)
+    for path in font_dir.iterdir():
+        # The fonts.conf of the font directory points at the font directory itself (or the font store)
+        if path.name in ("fonts.conf", FONT_SELECTION_FILE) or path.name.startswith("."):
+            continue
+        # Fonts are symlinks into the font store, copied as files
+        shutil.copyfile(path, bundled_font_dir / path.name)
+    if uses_font_store(font_dir):
+        # The fonts are selected in the font store, and bundled like linked ones
+        for name, font_path in font_files(font_dir).items():
+            shutil.copyfile(font_path, bundled_font_dir / name)
+    create_bundle_fontconfig_xml(bundled_font_dir)
+
+    # Fontconfig checks its cache against the modification time of the font directory, kept in whole seconds,
+    # which every way of copying the bundle (including tar) preserves
+    mtime = int(bundled_font_dir.stat().st_mtime)
+    os.utime(bundled_font_dir, (mtime, mtime))
+    cache_dir = bundle_dir / "fontconfig_cache" / sources_hash
+    cache_dir.mkdir(parents=True)
+    _build_fontconfig_cache(bundled_font_dir, cache_dir, fontconfig_cache_alias(sources_hash))
+
+    # Written last, as it marks the bundle as complete
+    write_file_atomically(bundle_dir / BUNDLE_INFO_FILE, json.dumps({"sources_hash": sources_hash}))
+
+
+def export_font_bundle(font_dir: str | Path, bundle_path: str | Path, archive: bool = False) -> Path:
+    """Bundle the fonts of a font directory created by `download_fonts` (or of another bundle).
+
+    Args:
+        font_dir: Font directory to bundle
+        bundle_path: Directory to write the bundle to (replacing a bundle already there), or with `archive`,
+            the tar file to write
+        archive: Write a single, uncompressed tar file instead of a directory
+
+    Returns:
+        Path to the bundle
+    """
+    font_dir = Path(font_dir).resolve()
+    bundle_path = Path(bundle_path).resolve()
+    if font_dir.is_relative_to(bundle_path):
+        raise ValueError(f"Cannot bundle the fonts of {font_dir} into the bundle they are loaded from.")
+    bundle_path.parent.mkdir(parents=True, exist_ok=True)
+
+    if archive:
+        with tempfile.TemporaryDirectory(dir=bundle_path.parent) as temp_dir:
+            _write_bundle(font_dir, Path(temp_dir))
+            temp_archive = create_temp_file(bundle_path.parent, f".{bundle_path.name}.")
+            try:
+                with tarfile.open(temp_archive, "w") as tar:
+                    for path in sorted(Path(temp_dir).iterdir()):
+                        tar.add(path, arcname=path.name)
+                os.replace(temp_archive, bundle_path)
+            except BaseException:
+                temp_archive.unlink(missing_ok=True)
+                raise
+        return bundle_path
+
+    if (bundle_path / BUNDLE_INFO_FILE).exists():
+        shutil.rmtree(bundle_path)
+    elif bundle_path.exists() and any(bundle_path.iterdir()):
+        raise FileExistsError(f"{bundle_path} is not empty, and not a font bundle.")
+    _write_bundle(font_dir, bundle_path)
+    return bundle_path
+
+
+def _extract_bundle(archive_path: Path) -> Path:
+    """Extract a bundle archive into the font cache, once per set of fonts, and return the bundle directory."""
+    with tarfile.open(archive_path) as tar:
+        try:
+            sources_hash = json.load(tar.extractfile(BUNDLE_INFO_FILE))["sources_hash"]
+        except KeyError as e:
+            raise ValueError(f"{archive_path} is not a font bundle.") from e
+
+        bundles_dir = font_bundles_dir()
+        bundle_dir = bundles_dir / sources_hash
+        if (bundle_dir / BUNDLE_INFO_FILE).exists():
+            return bundle_dir
+
+        bundles_dir.mkdir(parents=True, exist_ok=True)
+        with file_lock(bundles_dir / f"{sources_hash}.lock"):
+            # Extracted by another process while this one waited for the lock
+            if (bundle_dir / BUNDLE_INFO_FILE).exists():
+                return bundle_dir
+            logging.info(f"Extracting font bundle {archive_path}...")
+            temp_dir = create_temp_dir(bundles_dir, f".{sources_hash}.")
+            try:
+                if hasattr(tarfile, "data_filter"):
+                    tar.extractall(temp_dir, filter="data")
+                else:  # Python without extraction filters
+                    tar.extractall(temp_dir)
+                # An incomplete bundle of an interrupted extraction (without bundle.json) is replaced
+                shutil.rmtree(bundle_dir, ignore_errors=True)
+                os.replace(temp_dir, bundle_dir)
+            except BaseException:
+                shutil.rmtree(temp_dir, ignore_errors=True)
+                raise
+    return bundle_dir
+
+
+def load_font_bundle(bundle_path: str | Path) -> Path:
+    """Font directory of a bundle, used in place (a bundle archive is extracted into the font cache first)."""
+    bundle_path = Path(bundle_path)
+    if not bundle_path.exists():
+        raise FileNotFoundError(f"Font bundle {bundle_path} not found.")
+    if bundle_path.is_dir():
+        bundle_dir = bundle_path
+    else:
+        bundle_dir = _extract_bundle(bundle_path)
+        _record_use(bundle_dir)
+
+    info_path = bundle_dir / BUNDLE_INFO_FILE
+    if not info_path.is_file():
+        raise ValueError(f"{bundle_path} is not a font bundle.")
+    sources_hash = json.loads(info_path.read_text(encoding="utf-8"))["sources_hash"]
+    return bundle_dir / "config" / sources_hash
+
+
+def resolve_bundle_path(bundle: str | None, pretrained_model_name_or_path: str | os.PathLike) -> str | None:
+    """Path of the bundle of a configuration loaded from a directory, where relative paths are relative to it."""
+    if bundle is None or not os.path.isdir(pretrained_model_name_or_path):
+        return bundle
+    return str(Path(pretrained_model_name_or_path) / bundle)
@@ -0,0 +1,395 @@
+"""Disk usage and garbage collection of the font cache.
+
+The font cache only grows: every distinct list of sources creates a config directory (with a fontconfig
+cache), and fonts stay in the store after the last config directory using them is gone. `download_fonts`
+records when each config directory was last used, so the least recently used ones, and the fonts no
+config directory uses, can be evicted until the cache fits a byte budget. Processes rendering with a config
+directory hold it with `hold_font_dir`, and it is not evicted until they exit:
+
+    python -m font_download.cache_manager usage
+    python -m font_download.cache_manager gc --max-bytes 2G
+"""
+
+from __future__ import annotations
+
+import argparse
+import importlib
+import json
+import os
+import shutil
+import sys
+import time
+from collections import Counter, defaultdict
+from collections.abc import Callable
+from contextlib import ExitStack
+from dataclasses import asdict, dataclass, field
+from datetime import datetime
+from pathlib import Path
+
+from font_download.bundle import BUNDLE_INFO_FILE
+from font_download.download_fonts import (
+    LAST_USED_FILE,
+    _gc_lock,
+    _hash_index,
+    config_font_paths,
+    fetched_font_paths,
+    font_bundles_dir,
+    fontconfig_cache_dir,
+    uses_font_store,
+)
+
+try:
+    import fcntl
+except ImportError:  # Windows: directories in use are only protected by `min_age`
+    fcntl = None
+
+# Config directories and fonts used (or created) more recently are never evicted, as processes may be about to
+# use them: the config directory a `download_fonts` call just returned, before it is held
+DEFAULT_MIN_AGE = 3600
+
+_SIZE_UNITS = {"": 1, "K": 1 << 10, "M": 1 << 20, "G": 1 << 30, "T": 1 << 40}
+
+# The module, as `font_download.download_fonts` is also the name of the function
+_download_fonts_module = importlib.import_module("font_download.download_fonts")
+
+
+def _cache_dir() -> Path:
+    return _download_fonts_module.FONT_DOWNLOAD_CACHE_DIR
+
+
+def _tree_bytes(path: Path) -> int:
+    """Bytes of the files under `path`, not following symlinks."""
+    if not path.exists():
+        return 0
+    if not path.is_dir() or path.is_symlink():
+        return path.lstat().st_size
+    return sum(entry.lstat().st_size for entry in path.rglob("*") if not entry.is_dir() or entry.is_symlink())
+
+
+def _eviction_unit(font_dir: Path) -> Path:
+    """The directory evicted with a font directory: its bundle, or the config directory itself."""
+    bundle_dir = font_dir.parent.parent
+    return bundle_dir if (bundle_dir / BUNDLE_INFO_FILE).is_file() else font_dir
+
+
+def hold_font_dir(font_dir: str | os.PathLike) -> int | None:
+    """Keep a font directory from being evicted for as long as this process lives (or closes the returned file
+    descriptor), by holding a shared lock on it.
+
+    None where files cannot be locked, for directories outside the cache (e.g. a font bundle saved with a
+    processor), which are never evicted, and if the cache cannot be written to (e.g. a read-only cache).
+    """
+    unit = _eviction_unit(Path(font_dir))
+    if fcntl is None or not unit.resolve().is_relative_to(_cache_dir().resolve()):
+        return None
+    try:
+        # Under the lock of the garbage collection, so that the directory is not being evicted meanwhile
+        with _gc_lock(shared=True):
+            fd = os.open(unit, os.O_RDONLY)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_SH)
+            except OSError:
+                os.close(fd)
+                raise
+    except OSError:  # read-only cache
+        return None
+    return fd
+
+
+def _lock_unused(directory: Path, stack: ExitStack) -> bool:
+    """Lock a directory no process holds (see `hold_font_dir`) until `stack` exits, False if one does."""
+    if fcntl is None:
+        return True
+    try:
+        fd = os.open(directory, os.O_RDONLY)
+    except FileNotFoundError:
+        return True
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        os.close(fd)
+        return False
+    stack.callback(os.close, fd)
+    return True
+
+
+def _last_used(directory: Path) -> float:
+    last_used_path = directory / LAST_USED_FILE
+    # Directories created before last use was recorded were last used when they were last changed
+    return (last_used_path if last_used_path.exists() else directory).stat().st_mtime
+
+
+@dataclass(slots=True)
+class ConfigUsage:
+    """A config directory, or a font bundle extracted into the cache."""
+
+    path: Path
+    last_used: float
+    """Unix time of the last `download_fonts` call (or load of the bundle) that used it."""
+    bytes: int
+    """Bytes of its own files and its fontconfig cache, without the fonts of the store it uses."""
+    fonts: list[str] = field(default_factory=list)
+    """SHA-256 of the fonts of the store it uses."""
+    fontconfig_cache: Path | None = None
+    """Its fontconfig cache, unless it is inside the directory."""
+
+
+@dataclass(slots=True)
+class FontUsage:
+    """A font of the store."""
+
+    sha256: str
+    bytes: int
+    stored: float
+    """Unix time the font was downloaded."""
+    used_by: list[str] = field(default_factory=list)
+    """Names of the config directories using it."""
+
+
+@dataclass(slots=True)
+class CacheUsage:
+    """Disk usage of the font cache."""
+
+    configs: list[ConfigUsage]
+    fonts: list[FontUsage]
+    other_bytes: int
+    """Bytes of everything else: the hash index, URL records, locks, the fontconfig cache of the font store,
+    and orphaned fontconfig caches."""
+
+    @property
+    def total_bytes(self) -> int:
+        return sum(config.bytes for config in self.configs) + sum(font.bytes for font in self.fonts) + self.other_bytes
+
+    def summary(self) -> dict:
+        return {
+            "total_bytes": self.total_bytes,
+            "configs": len(self.configs),
+            "config_bytes": sum(config.bytes for config in self.configs),
+            "fonts": len(self.fonts),
+            "font_bytes": sum(font.bytes for font in self.fonts),
+            "unused_fonts": sum(1 for font in self.fonts if not font.used_by),
+            "unused_font_bytes": sum(font.bytes for font in self.fonts if not font.used_by),
+        }
+
+
+@dataclass(slots=True)
+class GarbageCollection:
+    """Result of `collect_garbage`."""
+
+    evicted_configs: list[Path]
+    evicted_fonts: list[Path]
+    bytes_before: int
+    bytes_after: int
+
+
+def _config_usages(config_base_dir: Path, objects_dir: Path) -> list[ConfigUsage]:
+    configs = []
+    for config_dir in sorted(config_base_dir.iterdir()) if config_base_dir.is_dir() else []:
+        # Hidden directories are being written, files are locks
+        if not config_dir.is_dir() or config_dir.name.startswith("."):
+            continue
+        # Fonts a lazy font set fetched for it are used by it as well
+        font_paths = dict.fromkeys(config_font_paths(config_dir) + fetched_font_paths(config_dir))
+        # The fontconfig cache of the font store is shared by the config directories selecting fonts in it
+        cache = None if uses_font_store(config_dir) else fontconfig_cache_dir(config_dir)
+        configs.append(
+            ConfigUsage(
+                path=config_dir,
+                last_used=_last_used(config_dir),
+                bytes=_tree_bytes(config_dir) + (_tree_bytes(cache) if cache is not None else 0),
+                fonts=[font_path.name for font_path in font_paths if font_path.parent == objects_dir],
+                fontconfig_cache=cache,
+            )
+        )
+    return configs
+
+
+def _bundle_usages(bundles_dir: Path) -> list[ConfigUsage]:
+    return [
+        ConfigUsage(path=bundle_dir, last_used=_last_used(bundle_dir), bytes=_tree_bytes(bundle_dir))
+        for bundle_dir in (sorted(bundles_dir.iterdir()) if bundles_dir.is_dir() else [])
+        if bundle_dir.is_dir() and not bundle_dir.name.startswith(".")
+    ]
+
+
+def cache_usage() -> CacheUsage:
+    """Disk usage of every config directory, extracted bundle and font of the cache."""
+    cache_dir = _cache_dir()
+    objects_dir = cache_dir / "fonts" / "objects"
+    configs = _config_usages(cache_dir / "config", objects_dir) + _bundle_usages(font_bundles_dir())
+
+    used_by = defaultdict(list)
+    for config in configs:
+        for sha256 in config.fonts:
+            used_by[sha256].append(config.path.name)
+    fonts = []
+    # Hidden files are downloads in progress
+    for object_path in sorted(objects_dir.iterdir()) if objects_dir.is_dir() else []:
+        if not object_path.name.startswith("."):
+            stat = object_path.stat()
+            fonts.append(FontUsage(object_path.name, stat.st_size, stat.st_mtime, used_by=used_by[object_path.name]))
+
+    other_bytes = _tree_bytes(cache_dir) - sum(config.bytes for config in configs) - sum(font.bytes for font in fonts)
+    return CacheUsage(configs=configs, fonts=fonts, other_bytes=other_bytes)
+
+
+def _remove_config(config: ConfigUsage) -> None:
+    # Incomplete first, so that it is never used half-removed
+    (config.path / "sources.json").unlink(missing_ok=True)
+    (config.path / "bundle.json").unlink(missing_ok=True)
+    shutil.rmtree(config.path, ignore_errors=True)
+    if config.fontconfig_cache is not None:
+        shutil.rmtree(config.fontconfig_cache, ignore_errors=True)
+    config.path.with_name(f"{config.path.name}.lock").unlink(missing_ok=True)
+
+
+def _remove_fonts(fonts_cache_dir: Path, sha256s: set[str]) -> None:
+    # The URL records of the fonts, their locks and the validators of their downloads
+    urls_dir = fonts_cache_dir / "urls"
+    for url_path in urls_dir.iterdir() if urls_dir.is_dir() else []:
+        if url_path.suffix or url_path.name.startswith("."):
+            continue
+        if url_path.read_text(encoding="utf-8") in sha256s:
+            url_path.unlink(missing_ok=True)
+            url_path.with_suffix(".lock").unlink(missing_ok=True)
+            url_path.with_suffix(".validators").unlink(missing_ok=True)
+
+    object_paths = [fonts_cache_dir / "objects" / sha256 for sha256 in sha256s]
+    for object_path in object_paths:
+        object_path.unlink(missing_ok=True)
+    _hash_index(fonts_cache_dir).forget(object_paths)
+
+
+def _plan_eviction(
+    usage: CacheUsage, max_bytes: int, min_age: float, lock_unused: Callable[[Path], bool] = lambda path: True
+) -> tuple[list[ConfigUsage], list[FontUsage], int]:
+    """Config directories and fonts to evict for the cache to fit `max_bytes`, and its size after eviction.
+
+    Config directories are only evicted if `lock_unused` locks them, i.e. no process holds them.
+    """
+    total_bytes = usage.total_bytes
+    now = time.time()
+    fonts = {font.sha256: font for font in usage.fonts}
+    references = Counter(sha256 for config in usage.configs for sha256 in config.fonts)
+    evicted_configs, evicted_fonts = [], {}
+
+    for font in sorted(usage.fonts, key=lambda font: font.stored):
+        if total_bytes <= max_bytes:
+            break
+        if not references[font.sha256] and now - font.stored >= min_age:
+            evicted_fonts[font.sha256] = font
+            total_bytes -= font.bytes
+
+    for config in sorted(usage.configs, key=lambda config: config.last_used):
+        if total_bytes <= max_bytes:
+            break
+        if now - config.last_used < min_age or not lock_unused(config.path):
+            continue
+        evicted_configs.append(config)
+        total_bytes -= config.bytes
+        # Fonts only used by evicted config directories go with them, however recently they were stored
+        references.subtract(config.fonts)
+        for sha256 in config.fonts:
+            if not references[sha256] and sha256 in fonts and sha256 not in evicted_fonts:
+                evicted_fonts[sha256] = fonts[sha256]
+                total_bytes -= fonts[sha256].bytes
+
+    return evicted_configs, list(evicted_fonts.values()), total_bytes
+
+
+def collect_garbage(max_bytes: int, min_age: float = DEFAULT_MIN_AGE, dry_run: bool = False) -> GarbageCollection:
+    """Evict from the font cache until it fits `max_bytes`: first the fonts no config directory uses, then the
+    least recently used config directories (and extracted bundles), with the fonts only they used.
+
+    Config directories held by a process (see `hold_font_dir`), used less than `min_age` seconds ago, and fonts
+    stored less than `min_age` seconds ago, are kept, even over the budget. Fonts and config directories are not
+    created while the cache is collected (see `_gc_lock`), and a config directory is marked incomplete before it
+    is removed, so concurrent `download_fonts` calls are safe.
+    With `dry_run`, reports what would be evicted without removing anything.
+    """
+    fonts_cache_dir = _cache_dir() / "fonts"
+    with _gc_lock(), ExitStack() as stack:
+        usage = cache_usage()
+        evicted_configs, evicted_fonts, bytes_after = _plan_eviction(
+            usage, max_bytes, min_age, lock_unused=lambda path: _lock_unused(path, stack)
+        )
+        if not dry_run:
+            for config in evicted_configs:
+                _remove_config(config)
+            if evicted_fonts:
+                _remove_fonts(fonts_cache_dir, {font.sha256 for font in evicted_fonts})
+
+    return GarbageCollection(
+        evicted_configs=[config.path for config in evicted_configs],
+        evicted_fonts=[fonts_cache_dir / "objects" / font.sha256 for font in evicted_fonts],
+        bytes_before=usage.total_bytes,
+        bytes_after=bytes_after,
+    )
+
+
+def parse_size(size: str) -> int:
+    """Bytes of a size like "500M" or "2G" (powers of 1024), or a plain number of bytes."""
+    size = size.strip().upper().removesuffix("B").removesuffix("I")
+    unit = size[-1] if size and size[-1] in _SIZE_UNITS else ""
+    return int(float(size.removesuffix(unit)) * _SIZE_UNITS[unit])
+
+
+def _format_size(num_bytes: int) -> str:
+    for unit in ("B", "KiB", "MiB", "GiB"):
+        if abs(num_bytes) < 1024:
+            return f"{num_bytes:.0f} {unit}" if unit == "B" else f"{num_bytes:.1f} {unit}"
+        num_bytes /= 1024
+    return f"{num_bytes:.1f} TiB"
+
+
+def _print_usage(usage: CacheUsage, show_fonts: bool) -> None:
+    font_bytes = {font.sha256: font.bytes for font in usage.fonts}
+    print(f"{'last used':<20} {'own':>10} {'fonts':>10}  config")
+    for config in sorted(usage.configs, key=lambda config: config.last_used, reverse=True):
+        last_used = datetime.fromtimestamp(config.last_used).isoformat(sep=" ", timespec="seconds")
+        fonts_size = _format_size(sum(font_bytes.get(sha256, 0) for sha256 in config.fonts))
+        print(f"{last_used:<20} {_format_size(config.bytes):>10} {fonts_size:>10}  {config.path}")
+    if show_fonts:
+        print(f"\n{'size':>10} {'used by':>8}  font")
+        for font in sorted(usage.fonts, key=lambda font: font.bytes, reverse=True):
+            print(f"{_format_size(font.bytes):>10} {len(font.used_by):>8}  {font.sha256}")
+    summary = usage.summary()
+    print(
+        f"\n{_format_size(summary['total_bytes'])} in {summary['configs']} configs and {summary['fonts']} fonts "
+        f"({summary['unused_fonts']} unused, {_format_size(summary['unused_font_bytes'])})"
+    )
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    usage_parser = subparsers.add_parser("usage", help="Report the disk usage per config directory and font")
+    usage_parser.add_argument("--fonts", action="store_true", help="Also list every font of the store")
+    usage_parser.add_argument("--json", action="store_true", help="Print the usage as JSON")
+    gc_parser = subparsers.add_parser("gc", help="Evict least recently used config directories and unused fonts")
+    gc_parser.add_argument("--max-bytes", type=parse_size, required=True, help='Budget, e.g. "2G"')
+    gc_parser.add_argument("--min-age", type=float, default=DEFAULT_MIN_AGE, help="Keep what was used recently (s)")
+    gc_parser.add_argument("--dry-run", action="store_true", help="Only report what would be evicted")
+    args = parser.parse_args()
+
+    if args.command == "usage":
+        usage = cache_usage()
+        if args.json:
+            print(json.dumps({**asdict(usage), "summary": usage.summary()}, indent=2, default=str))
+        else:
+            _print_usage(usage, show_fonts=args.fonts)
+        return 0
+
+    result = collect_garbage(args.max_bytes, min_age=args.min_age, dry_run=args.dry_run)
+    for path in [*result.evicted_configs, *result.evicted_fonts]:
+        print(f"{'Would evict' if args.dry_run else 'Evicted'} {path}")
+    print(
+        f"{_format_size(result.bytes_before)} -> {_format_size(result.bytes_after)} "
+        f"(budget {_format_size(args.max_bytes)})",
+        file=sys.stderr,
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
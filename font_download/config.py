@@ -1,26 +1,143 @@
+import copy
+import json
+import os
+import weakref
+from collections.abc import Iterable
+from pathlib import Path
+
 from transformers import AutoConfig, PretrainedConfig
 
+from font_download.bundle import export_font_bundle, load_font_bundle, resolve_bundle_path
+from font_download.coverage import CoverageIndex, CoverageReport, TextCoverage, load_coverage_index
 from font_download.download_fonts import download_fonts
 from font_download.fonts import FontSource, FontsSources
+from font_download.lazy_fonts import LazyFontSet, split_core_sources
+
+# Names of the font bundle saved next to a configuration, as a directory or an archive
+FONT_BUNDLE_NAME = "fonts"
+FONT_BUNDLE_ARCHIVE_NAME = "fonts.tar"
+
+# Coverage index of every configuration (by id), with the settings it was loaded for. Kept outside the
+# configuration, whose attributes are all serialized and compared.
+_coverage_indexes: dict[int, tuple[str, CoverageIndex]] = {}
 
 
 class FontConfig(PretrainedConfig):
     model_type = "font_config"
 
-    def __init__(self, sources: FontsSources | None = None, **kwargs) -> None:
+    def __init__(
+        self,
+        sources: FontsSources | None = None,
+        lazy: bool = False,
+        core_families: list[str] | None = None,
+        bundle: str | None = None,
+        link_fonts: bool = True,
+        **kwargs,
+    ) -> None:
+        """
+        Args:
+            sources: Fonts to render with.
+            lazy: Download only the fonts of `core_families` up front, and the others when text needs them
+                (see `font_download.lazy_fonts`).
+            core_families: Font families downloaded up front in lazy mode, by default `DEFAULT_CORE_FAMILIES`.
+            bundle: Font bundle (a directory or an archive, see `font_download.bundle`) to load the fonts from
+                instead of downloading them. Relative to the directory the configuration is loaded from.
+            link_fonts: Symlink the fonts into their font directory, or else select them in the shared font store
+                (see `download_fonts`), which is faster for many different font lists.
+        """
         super().__init__(**kwargs)
 
         if isinstance(sources, list) and any(not isinstance(s, dict) for s in sources):
             sources = [s.to_dict() for s in sources]
 
         self.sources = sources
+        self.lazy = lazy
+        self.core_families = core_families
+        self.bundle = bundle
+        self.link_fonts = link_fonts
 
-    def get_font_dir(self):
-        sources = self.sources
+    @classmethod
+    def get_config_dict(cls, pretrained_model_name_or_path: str | os.PathLike, **kwargs):
+        config_dict, kwargs = super().get_config_dict(pretrained_model_name_or_path, **kwargs)
+        if config_dict.get("bundle") is not None:
+            config_dict["bundle"] = resolve_bundle_path(config_dict["bundle"], pretrained_model_name_or_path)
+        return config_dict, kwargs
+
+    def _font_sources(self) -> list[FontSource]:
         # Convert list of dicts to list of FontSource objects if needed
-        if isinstance(sources, list) and all(isinstance(s, dict) for s in sources):
-            sources = [FontSource(url=s["url"], name=s["name"]) for s in sources]
-        return download_fonts(sources)
+        return [FontSource.from_dict(s) if isinstance(s, dict) else s for s in self.sources]
+
+    def get_font_dir(self):
+        if self.bundle is not None:
+            return load_font_bundle(self.bundle)
+        sources = self._font_sources()
+        if self.lazy:
+            sources, _ = split_core_sources(sources, self.core_families)
+        return download_fonts(sources, link_fonts=self.link_fonts)
+
+    def _all_fonts_dir(self) -> Path:
+        """Font directory of all the fonts, those a lazy font set downloads when text needs them too."""
+        if self.lazy and self.bundle is None:
+            return download_fonts(self._font_sources(), link_fonts=self.link_fonts)
+        return self.get_font_dir()
+
+    def bundled(self, save_directory: str | os.PathLike, archive: bool = False) -> "FontConfig":
+        """
+        Bundles all fonts (of a lazy font set too) into `save_directory`, with their prebuilt fontconfig cache,
+        and returns a copy of this configuration that loads them from there instead of downloading them.
+        """
+        font_dir = self._all_fonts_dir()
+        bundle_name = FONT_BUNDLE_ARCHIVE_NAME if archive else FONT_BUNDLE_NAME
+        export_font_bundle(font_dir, Path(save_directory) / bundle_name, archive=archive)
+
+        config = copy.deepcopy(self)
+        config.lazy = False
+        config.bundle = bundle_name
+        return config
+
+    def save_pretrained(
+        self,
+        save_directory: str | os.PathLike,
+        push_to_hub: bool = False,
+        bundle_fonts: bool = False,
+        archive: bool = False,
+        **kwargs,
+    ):
+        """
+        Saves the configuration. With `bundle_fonts`, the fonts are saved next to it, as a directory or with
+        `archive` a single tar file, so that it loads without downloading anything (e.g. on air-gapped machines).
+        """
+        config = self.bundled(save_directory, archive=archive) if bundle_fonts else self
+        return super(FontConfig, config).save_pretrained(save_directory, push_to_hub=push_to_hub, **kwargs)
+
+    def lazy_font_set(self, on_fetch=None) -> LazyFontSet:
+        """The fonts of this configuration, of which only the core fonts are downloaded up front."""
+        return LazyFontSet(
+            self.sources, core_families=self.core_families, on_fetch=on_fetch, link_fonts=self.link_fonts
+        )
+
+    def coverage_index(self) -> CoverageIndex:
+        """
+        Coverage of all the fonts, loaded once per configuration (and again if its fonts are set differently).
+        In lazy mode, this is the coverage of every font the lazy font set may fetch, which are all downloaded
+        to read it.
+        """
+        settings = json.dumps([self.sources, self.lazy, self.core_families, self.bundle, self.link_fonts], default=str)
+        cached = _coverage_indexes.get(id(self))
+        if cached is None or cached[0] != settings:
+            if cached is None:
+                weakref.finalize(self, _coverage_indexes.pop, id(self), None)
+            cached = settings, load_coverage_index(self._all_fonts_dir())
+            _coverage_indexes[id(self)] = cached
+        return cached[1]
+
+    def coverage(self, text: str) -> TextCoverage:
+        """Which characters of `text` have a glyph in any of the fonts, without rendering it."""
+        return self.coverage_index().coverage(text)
+
+    def coverage_report(self, texts: Iterable[str]) -> CoverageReport:
+        """Coverage of a whole corpus, e.g. to filter out texts that would render as tofu."""
+        return self.coverage_index().report(texts)
 
 
 AutoConfig.register(FontConfig.model_type, FontConfig)
@@ -0,0 +1,383 @@
+"""Code point coverage of downloaded fonts, read from their `cmap` tables.
+
+Every font directory created by `download_fonts` holds a `coverage.json` next to `sources.json`,
+mapping each font name to the sorted, inclusive code point ranges it has glyphs for.
+The index answers whether a text can be rendered without tofu, without rendering it.
+It records the hash of the `sources.json` it was built with, and is built again once the fonts
+of the directory change (e.g. after `download_fonts(revalidate=True)`).
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import struct
+import sys
+import unicodedata
+from collections import Counter
+from collections.abc import Iterable, Sequence
+from dataclasses import dataclass
+from functools import cache
+from pathlib import Path
+
+import numpy as np
+
+from font_configurator.atomic_files import write_file_atomically
+from font_download.fonts import FONT_FILE_SUFFIXES
+
+COVERAGE_FILE_NAME = "coverage.json"
+COVERAGE_VERSION = 1
+# Paths of the fonts (by name) of a font directory that selects its fonts in the font store, instead of holding them
+FONT_SELECTION_FILE = "selected_fonts.json"
+
+# (platform ID, encoding ID) of cmap subtables that map Unicode code points. Platform 0 is Unicode,
+# platform 3 is Windows with encoding 1 (BMP) or 10 (full repertoire). Symbol encodings are skipped.
+_UNICODE_ENCODINGS = {(3, 1), (3, 10)}
+
+
+def _merge_ranges(ranges: np.ndarray) -> np.ndarray:
+    """Sort and merge overlapping or adjacent inclusive (start, end) ranges."""
+    if len(ranges) == 0:
+        return np.empty((0, 2), dtype=np.int64)
+    ranges = ranges[np.argsort(ranges[:, 0], kind="stable")]
+    ends = np.maximum.accumulate(ranges[:, 1])
+    # A range starts a new group if it begins after everything before it ended
+    new_group = np.empty(len(ranges), dtype=bool)
+    new_group[0] = True
+    new_group[1:] = ranges[1:, 0] > ends[:-1] + 1
+    group_starts = np.flatnonzero(new_group)
+    group_ends = np.append(group_starts[1:], len(ranges)) - 1
+    return np.stack([ranges[group_starts, 0], ends[group_ends]], axis=1)
+
+
+def _codepoints_to_ranges(codepoints: np.ndarray) -> np.ndarray:
+    if len(codepoints) == 0:
+        return np.empty((0, 2), dtype=np.int64)
+    codepoints = np.unique(codepoints)
+    breaks = np.flatnonzero(np.diff(codepoints) != 1)
+    starts = np.append(codepoints[0], codepoints[breaks + 1])
+    ends = np.append(codepoints[breaks], codepoints[-1])
+    return np.stack([starts, ends], axis=1).astype(np.int64)
+
+
+def _parse_format_4(data: bytes, offset: int) -> np.ndarray:
+    seg_count = struct.unpack_from(">H", data, offset + 6)[0] // 2
+    ends_offset = offset + 14
+    starts_offset = ends_offset + 2 * seg_count + 2
+    deltas_offset = starts_offset + 2 * seg_count
+    range_offsets_offset = deltas_offset + 2 * seg_count
+    end_codes = np.frombuffer(data, dtype=">u2", count=seg_count, offset=ends_offset).astype(np.int64)
+    start_codes = np.frombuffer(data, dtype=">u2", count=seg_count, offset=starts_offset).astype(np.int64)
+    deltas = np.frombuffer(data, dtype=">u2", count=seg_count, offset=deltas_offset).astype(np.int64)
+    range_offsets = np.frombuffer(data, dtype=">u2", count=seg_count, offset=range_offsets_offset).astype(np.int64)
+
+    codepoints = []
+    for i in range(seg_count):
+        start, end = start_codes[i], min(end_codes[i], 0xFFFE)
+        if start > end:
+            continue
+        segment = np.arange(start, end + 1, dtype=np.int64)
+        if range_offsets[i] == 0:
+            glyphs = (segment + deltas[i]) & 0xFFFF
+        else:
+            # idRangeOffset is relative to its own position in the idRangeOffset array
+            addresses = range_offsets_offset + 2 * i + range_offsets[i] + 2 * (segment - start)
+            addresses = addresses[addresses + 2 <= len(data)]
+            segment = segment[: len(addresses)]
+            raw = np.frombuffer(data, dtype=np.uint8)
+            glyphs = (raw[addresses].astype(np.int64) << 8) | raw[addresses + 1]
+            glyphs = np.where(glyphs != 0, (glyphs + deltas[i]) & 0xFFFF, 0)
+        codepoints.append(segment[glyphs != 0])
+    return _codepoints_to_ranges(np.concatenate(codepoints) if codepoints else np.empty(0, dtype=np.int64))
+
+
+def _parse_format_12_13(data: bytes, offset: int, fmt: int) -> np.ndarray:
+    num_groups = struct.unpack_from(">I", data, offset + 12)[0]
+    groups = np.frombuffer(data, dtype=">u4", count=3 * num_groups, offset=offset + 16).reshape(-1, 3)
+    groups = groups.astype(np.int64)
+    if fmt == 13:
+        # Format 13 maps every code point of a group to the same glyph, so glyph 0 means no coverage
+        groups = groups[groups[:, 2] != 0]
+    else:
+        # Only the first code point of a group can map to glyph 0
+        groups[:, 0] += groups[:, 2] == 0
+    groups = groups[groups[:, 0] <= groups[:, 1]]
+    return _merge_ranges(groups[:, :2])
+
+
+def _parse_format_6(data: bytes, offset: int) -> np.ndarray:
+    first_code, entry_count = struct.unpack_from(">HH", data, offset + 6)
+    glyphs = np.frombuffer(data, dtype=">u2", count=entry_count, offset=offset + 10)
+    return _codepoints_to_ranges(np.flatnonzero(glyphs) + first_code)
+
+
+def _parse_format_0(data: bytes, offset: int) -> np.ndarray:
+    glyphs = np.frombuffer(data, dtype=np.uint8, count=256, offset=offset + 6)
+    return _codepoints_to_ranges(np.flatnonzero(glyphs))
+
+
+def _parse_cmap(data: bytes, cmap_offset: int) -> np.ndarray:
+    num_tables = struct.unpack_from(">H", data, cmap_offset + 2)[0]
+    subtable_offsets = set()
+    for i in range(num_tables):
+        platform_id, encoding_id, offset = struct.unpack_from(">HHI", data, cmap_offset + 4 + 8 * i)
+        if platform_id == 0 or (platform_id, encoding_id) in _UNICODE_ENCODINGS:
+            subtable_offsets.add(cmap_offset + offset)
+
+    ranges = [np.empty((0, 2), dtype=np.int64)]
+    for offset in sorted(subtable_offsets):
+        fmt = struct.unpack_from(">H", data, offset)[0]
+        if fmt == 4:
+            ranges.append(_parse_format_4(data, offset))
+        elif fmt in (12, 13):
+            ranges.append(_parse_format_12_13(data, offset, fmt))
+        elif fmt == 6:
+            ranges.append(_parse_format_6(data, offset))
+        elif fmt == 0:
+            ranges.append(_parse_format_0(data, offset))
+        # Format 14 holds variation sequences, other formats are for legacy multi-byte encodings
+    return _merge_ranges(np.concatenate(ranges))
+
+
+def _find_table(data: bytes, font_offset: int, tag: bytes) -> int | None:
+    num_tables = struct.unpack_from(">H", data, font_offset + 4)[0]
+    for i in range(num_tables):
+        record_offset = font_offset + 12 + 16 * i
+        if data[record_offset : record_offset + 4] == tag:
+            return struct.unpack_from(">I", data, record_offset + 8)[0]
+    return None
+
+
+def read_font_coverage(font_path: str | Path) -> np.ndarray:
+    """Code point ranges a TrueType/OpenType font (or collection) has glyphs for.
+
+    Returns:
+        Sorted, merged, inclusive ranges as an (N, 2) int64 array
+
+    Raises:
+        ValueError: If the file is not a font or has no cmap table
+    """
+    data = Path(font_path).read_bytes()
+    if data[:4] == b"ttcf":
+        num_fonts = struct.unpack_from(">I", data, 8)[0]
+        font_offsets = struct.unpack_from(f">{num_fonts}I", data, 12)
+    elif data[:4] in (b"\x00\x01\x00\x00", b"OTTO", b"true"):
+        font_offsets = (0,)
+    else:
+        raise ValueError(f"Not a TrueType/OpenType font: {font_path}")
+
+    ranges = []
+    try:
+        for font_offset in font_offsets:
+            cmap_offset = _find_table(data, font_offset, b"cmap")
+            if cmap_offset is not None:
+                ranges.append(_parse_cmap(data, cmap_offset))
+    except (struct.error, ValueError) as e:
+        raise ValueError(f"Malformed cmap table in {font_path}: {e}") from e
+    if not ranges:
+        raise ValueError(f"Font has no cmap table: {font_path}")
+    return _merge_ranges(np.concatenate(ranges))
+
+
+def font_files(font_dir: Path) -> dict[str, Path]:
+    """Font files of a font directory by name: the files it holds, or those it selects in the font store."""
+    selection_path = font_dir / FONT_SELECTION_FILE
+    if selection_path.exists():
+        selection = json.loads(selection_path.read_text(encoding="utf-8"))
+        return {name: Path(path) for name, path in sorted(selection.items())}
+    return {path.name: path for path in sorted(font_dir.iterdir()) if path.suffix.lower() in FONT_FILE_SUFFIXES}
+
+
+def _sources_sha256(font_dir: Path) -> str | None:
+    """SHA-256 of the `sources.json` of a font directory, which changes whenever its fonts do."""
+    try:
+        return hashlib.sha256((font_dir / "sources.json").read_bytes()).hexdigest()
+    except FileNotFoundError:
+        return None
+
+
+def _read_coverage(font_dir: Path, sources_sha256: str | None) -> dict:
+    fonts = {}
+    for name, font_path in font_files(font_dir).items():
+        try:
+            ranges = read_font_coverage(font_path)
+        except (OSError, ValueError) as e:
+            logging.warning(f"Could not read font coverage: {e}")
+            ranges = np.empty((0, 2), dtype=np.int64)
+        fonts[name] = ranges.ravel().tolist()
+
+    return {"version": COVERAGE_VERSION, "sources_sha256": sources_sha256, "fonts": fonts}
+
+
+def build_coverage_index(font_dir: Path, sources_sha256: str | None = None) -> Path:
+    """Read the coverage of every font of `font_dir` and write it to `coverage.json`.
+
+    Files that cannot be parsed are logged and recorded with empty coverage.
+
+    Args:
+        font_dir: Font directory
+        sources_sha256: SHA-256 of the `sources.json` the fonts are listed in, by default that of the
+            `sources.json` in the font directory (which is written last, when a font directory is created)
+    """
+    if sources_sha256 is None:
+        sources_sha256 = _sources_sha256(font_dir)
+    coverage_path = font_dir / COVERAGE_FILE_NAME
+    content = _read_coverage(font_dir, sources_sha256)
+    write_file_atomically(coverage_path, json.dumps(content, separators=(",", ":")))
+    return coverage_path
+
+
+@cache
+def ignorable_table() -> np.ndarray:
+    """Code points that need no glyph: control and format characters, separators and variation selectors."""
+    table = np.zeros(sys.maxunicode + 1, dtype=bool)
+    for codepoint in range(sys.maxunicode + 1):
+        if unicodedata.category(chr(codepoint)) in ("Cc", "Cf", "Zl", "Zp"):
+            table[codepoint] = True
+    table[0xFE00:0xFE10] = True
+    table[0xE0100:0xE01F0] = True
+    return table
+
+
+def text_codepoints(text: str) -> np.ndarray:
+    return np.frombuffer(text.encode("utf-32-le", errors="surrogatepass"), dtype=np.uint32)
+
+
+@dataclass(slots=True)
+class TextCoverage:
+    """Coverage of one text. Characters that need no glyph (e.g. control characters) are ignored."""
+
+    ratio: float
+    """Fraction of the characters that some font has a glyph for (1.0 for texts without characters)."""
+    missing: str
+    """Distinct characters no font has a glyph for, in order of appearance."""
+
+    @property
+    def is_renderable(self) -> bool:
+        return not self.missing
+
+
+@dataclass(slots=True)
+class CoverageReport:
+    """Coverage of a corpus, one entry per text."""
+
+    ratios: np.ndarray
+    """Fraction of covered characters per text, float64."""
+    renderable: np.ndarray
+    """Whether every character of the text is covered, bool."""
+    missing: Counter
+    """Occurrences of every uncovered character across the corpus."""
+
+    def summary(self) -> dict:
+        return {
+            "texts": len(self.ratios),
+            "renderable": int(self.renderable.sum()),
+            "mean_ratio": float(self.ratios.mean()) if len(self.ratios) else 1.0,
+            "most_common_missing": self.missing.most_common(20),
+        }
+
+
+class CoverageIndex:
+    """Per-font code point ranges, and a lookup table of their union."""
+
+    def __init__(self, fonts: dict[str, np.ndarray]):
+        self.fonts = fonts
+        self.covered = np.zeros(sys.maxunicode + 1, dtype=bool)
+        for ranges in fonts.values():
+            for start, end in ranges:
+                self.covered[start : end + 1] = True
+
+    @classmethod
+    def load(cls, font_dir: Path) -> CoverageIndex:
+        """Load `coverage.json` from a font directory, building it first if it is missing or outdated."""
+        coverage_path = font_dir / COVERAGE_FILE_NAME
+        content = json.loads(coverage_path.read_text(encoding="utf-8")) if coverage_path.exists() else {}
+        sources_sha256 = _sources_sha256(font_dir)
+        if content.get("version") != COVERAGE_VERSION or content.get("sources_sha256") != sources_sha256:
+            try:
+                build_coverage_index(font_dir, sources_sha256)
+                content = json.loads(coverage_path.read_text(encoding="utf-8"))
+            except PermissionError:  # read-only font directory, e.g. a shared font bundle
+                content = _read_coverage(font_dir, sources_sha256)
+        fonts = {name: np.asarray(flat, dtype=np.int64).reshape(-1, 2) for name, flat in content["fonts"].items()}
+        return cls(fonts)
+
+    def fonts_for(self, char: str) -> list[str]:
+        """Names of the fonts that have a glyph for `char`."""
+        codepoint = ord(char)
+        names = []
+        for name, ranges in self.fonts.items():
+            i = np.searchsorted(ranges[:, 0], codepoint, side="right") - 1
+            if i >= 0 and ranges[i, 1] >= codepoint:
+                names.append(name)
+        return names
+
+    def sample_text(self, font_name: str, length: int = 16, rng: np.random.Generator | None = None) -> str:
+        """Random text of up to `length` visible characters that the font has glyphs for."""
+        ranges = self.fonts[font_name]
+        if len(ranges) == 0:
+            return ""
+        rng = rng or np.random.default_rng(0)
+        sizes = ranges[:, 1] - ranges[:, 0] + 1
+        ends = np.cumsum(sizes)
+        # oversample, as some covered code points are not visible characters (e.g. controls, spaces)
+        offsets = rng.integers(0, ends[-1], size=length * 4)
+        range_ids = np.searchsorted(ends, offsets, side="right")
+        codepoints = ranges[range_ids, 0] + offsets - (ends[range_ids] - sizes[range_ids])
+        characters = [chr(codepoint) for codepoint in codepoints.tolist()]
+        return "".join([char for char in characters if unicodedata.category(char)[0] in "LNPS"][:length])
+
+    def coverage(self, text: str) -> TextCoverage:
+        codepoints = text_codepoints(text)
+        relevant = ~ignorable_table()[codepoints]
+        covered = self.covered[codepoints]
+        total = int(relevant.sum())
+        missing = codepoints[relevant & ~covered]
+        ratio = 1.0 if total == 0 else (total - len(missing)) / total
+        return TextCoverage(ratio=ratio, missing="".join(dict.fromkeys(map(chr, missing.tolist()))))
+
+    def report(self, texts: Sequence[str] | Iterable[str]) -> CoverageReport:
+        """Coverage of many texts at once, vectorized over all their characters."""
+        texts = list(texts)
+        lengths = np.fromiter((len(text) for text in texts), dtype=np.int64, count=len(texts))
+        codepoints = text_codepoints("".join(texts))
+        text_ids = np.repeat(np.arange(len(texts)), lengths)
+
+        relevant = ~ignorable_table()[codepoints]
+        missing = relevant & ~self.covered[codepoints]
+        totals = np.bincount(text_ids, weights=relevant, minlength=len(texts))
+        missing_counts = np.bincount(text_ids, weights=missing, minlength=len(texts))
+
+        ratios = np.ones(len(texts), dtype=np.float64)
+        np.divide(totals - missing_counts, totals, out=ratios, where=totals > 0)
+        missing_chars, counts = np.unique(codepoints[missing], return_counts=True)
+        return CoverageReport(
+            ratios=ratios,
+            renderable=missing_counts == 0,
+            missing=Counter(dict(zip(map(chr, missing_chars.tolist()), counts.tolist(), strict=True))),
+        )
+
+
+# Coverage index of each font directory, with the (inode, mtime_ns) of the sources.json it was loaded with
+_coverage_indexes: dict[Path, tuple[tuple[int, int] | None, CoverageIndex]] = {}
+
+
+def _sources_key(font_dir: Path) -> tuple[int, int] | None:
+    try:
+        stat = os.stat(font_dir / "sources.json")
+    except FileNotFoundError:
+        return None
+    return stat.st_ino, stat.st_mtime_ns
+
+
+def load_coverage_index(font_dir: Path) -> CoverageIndex:
+    """Cached `CoverageIndex.load`, loaded again once the fonts of the directory changed: `sources.json` is
+    replaced whenever they do."""
+    key = _sources_key(font_dir)
+    cached = _coverage_indexes.get(font_dir)
+    if cached is None or cached[0] != key:
+        cached = key, CoverageIndex.load(font_dir)
+        _coverage_indexes[font_dir] = cached
+    return cached[1]
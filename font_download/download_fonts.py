@@ -1,94 +1,624 @@
+from __future__ import annotations
+
 import concurrent.futures
 import hashlib
 import json
 import logging
 import os
+import textwrap
+import threading
+from collections.abc import Iterable
 from pathlib import Path
-from urllib.request import urlretrieve
+from typing import TYPE_CHECKING
+from xml.sax.saxutils import escape
 
 from platformdirs import user_cache_dir
 
-from font_download.fonts import FontEntity, FontsSources
+from font_configurator.atomic_files import create_temp_file, file_lock, write_file_atomically
+from font_configurator.fontconfig_library import load_fontconfig
+from font_configurator.fontconfig_templates import font_selection_xml
+from font_download.coverage import FONT_SELECTION_FILE, build_coverage_index, font_files
+from font_download.fonts import FontEntity, FontsSources, compute_file_sha256, expand_font_sources
+from font_download.hash_index import HashIndex
+
+if TYPE_CHECKING:
+    from font_download.downloader import FontDownloader
 
 FONT_DOWNLOAD_CACHE_DIR = Path(user_cache_dir("font_download"))
+# Touched whenever a config directory is used, for the garbage collection of the cache
+LAST_USED_FILE = "last_used"
+# Fonts fetched into the store for a config directory after it was created (by a lazy font set), which the
+# garbage collection of the cache counts as used by it
+FETCHED_FONTS_FILE = "fetched_fonts.json"
+
+# Shared by the downloads of this process, created on first use (importing requests is not free)
+_downloader: FontDownloader | None = None
+_downloader_lock = threading.Lock()
+# Hash index of the font store, by fonts cache directory
+_hash_indexes: dict[Path, HashIndex] = {}
+
+
+def default_downloader() -> FontDownloader:
+    """The pooled downloader of this process."""
+    global _downloader
+    with _downloader_lock:
+        if _downloader is None:
+            from font_download.downloader import FontDownloader
+
+            _downloader = FontDownloader()
+        return _downloader
+
 
+def _hash_index(fonts_cache_dir: Path) -> HashIndex:
+    with _downloader_lock:
+        if fonts_cache_dir not in _hash_indexes:
+            _hash_indexes[fonts_cache_dir] = HashIndex(fonts_cache_dir / "hash_index.json")
+        return _hash_indexes[fonts_cache_dir]
 
-def _compute_sources_hash(sources: FontsSources) -> str:
-    """Compute unique hash from sorted source URLs."""
-    urls = sorted(source.url for source in sources)
-    combined = "\n".join(urls).encode("utf-8")
+
+def _reset_after_fork() -> None:
+    # Pooled connections (and their TLS state) must not be shared with the parent, nor locks held by its threads
+    global _downloader, _downloader_lock
+    _downloader = None
+    _downloader_lock = threading.Lock()
+    _hash_indexes.clear()
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def _compute_sources_hash(sources: FontsSources, link_fonts: bool = True) -> str:
+    """Compute unique hash from sorted source URLs, and the layout of the config directory."""
+    lines = sorted(source.url for source in sources)
+    if not link_fonts:
+        # A config directory selecting its fonts in the store is never handed out for linked fonts, or the reverse
+        lines.append("layout:font_store")
+    combined = "\n".join(lines).encode("utf-8")
     return hashlib.sha256(combined).hexdigest()[:16]
 
 
-def create_fontconfig_xml(config_dir: Path) -> None:
-    """Create fontconfig XML file pointing to the config directory."""
+def _pinned_fonts_match(sources: FontsSources, config_dir: Path) -> bool:
+    """Whether a complete config directory holds the fonts that sources with an expected SHA-256 pin."""
+    pinned = {source.url: source.sha256 for source in sources if source.sha256 is not None}
+    if not pinned:
+        return True
+    recorded = {font["url"]: font["sha256"] for font in json.loads((config_dir / "sources.json").read_text())}
+    return all(recorded.get(url) == sha256 for url, sha256 in pinned.items())
+
+
+def _changed_local_fonts(sources: FontsSources, config_dir: Path) -> list[Path]:
+    """Local fonts that are missing, or were modified in place, since a complete config directory was created.
+
+    Only fonts whose `(size, mtime_ns, inode)` changed since they were last hashed are read again (see
+    `font_download.hash_index`), so checking unchanged fonts costs a `stat` each.
+    """
+    local = [source for source in sources if source.local_path() is not None]
+    if not local:
+        return []
+    recorded = {font["url"]: font["sha256"] for font in json.loads((config_dir / "sources.json").read_text())}
+    hash_index = _hash_index(FONT_DOWNLOAD_CACHE_DIR / "fonts")
+    changed = []
+    for source in local:
+        font_path = source.local_path().resolve()
+        if not font_path.is_file() or hash_index.sha256(font_path) != recorded.get(source.url):
+            changed.append(font_path)
+    hash_index.save()
+    return changed
+
+
+def _url_key(url: str) -> str:
+    return hashlib.sha256(url.encode("utf-8")).hexdigest()
+
+
+def _symlink_atomically(target: Path, link: Path) -> None:
+    """Point `link` at `target`, replacing whatever is there (e.g. a broken symlink) in one rename."""
+    temp_link = link.with_name(f".{link.name}.{os.getpid()}.tmp")
+    temp_link.unlink(missing_ok=True)
+    temp_link.symlink_to(target)
+    os.replace(temp_link, link)
+
+
+def _gc_lock(shared: bool = False):
+    """Lock against the garbage collection of the cache, held shared while fonts and config directories are
+    created, and exclusively by the garbage collection."""
+    FONT_DOWNLOAD_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    return file_lock(FONT_DOWNLOAD_CACHE_DIR / "gc.lock", shared=shared)
+
+
+def _record_use(directory: Path) -> None:
+    """Record that a config directory (or font bundle) was used now, for the garbage collection of the cache."""
+    try:
+        # Only creating the file changes the directory, and with it the fontconfig cache of a config directory
+        (directory / LAST_USED_FILE).touch()
+    except OSError:  # read-only cache
+        pass
+
+
+def _download_to_store(
+    url: str,
+    objects_dir: Path,
+    downloader: FontDownloader,
+    hash_index: HashIndex,
+    expected_sha256: str | None = None,
+    validators: dict[str, str] | None = None,
+) -> tuple[str | None, dict[str, str]]:
+    """Stream a font into the content-addressed store, hashing it on the way, and return its SHA-256 and the
+    validators of the response. With the validators of a previous download, the download is conditional, and
+    None is returned if the font did not change since.
+
+    The font is written to a temporary file and only renamed to `objects/<sha256>` once it is complete and
+    verified, so an interrupted or corrupted download never leaves a font in the store.
+    """
+    temp_path = create_temp_file(objects_dir, ".download-")
+    try:
+        if hasattr(downloader, "download_validated"):
+            sha256, validators = downloader.download_validated(url, temp_path, validators)
+        else:  # A downloader without validators, e.g. a custom one
+            sha256, validators = downloader.download(url, temp_path), {}
+        if sha256 is None:
+            temp_path.unlink()
+            return None, validators
+        if expected_sha256 is not None and sha256 != expected_sha256:
+            raise ValueError(f"SHA-256 mismatch for {url}: expected {expected_sha256}, downloaded {sha256}")
+
+        object_path = objects_dir / sha256
+        if object_path.exists():
+            # Same content under another URL (or downloaded concurrently): stored once
+            temp_path.unlink()
+        else:
+            os.replace(temp_path, object_path)
+            hash_index.record(object_path, sha256)
+    except BaseException:
+        temp_path.unlink(missing_ok=True)
+        raise
+    return sha256, validators
+
+
+def fontconfig_cache_dir(config_dir: Path) -> Path:
+    """Directory of the fontconfig caches of a config directory, under the font cache."""
+    return FONT_DOWNLOAD_CACHE_DIR / "fontconfig_cache" / config_dir.name
+
+
+def font_store_dir() -> Path:
+    """Directory of the content-addressed font store (`<sha256>` files), under the font cache."""
+    return FONT_DOWNLOAD_CACHE_DIR / "fonts" / "objects"
+
+
+def fontconfig_store_cache_dir() -> Path:
+    """Directory of the fontconfig cache of the font store, shared by the config directories selecting fonts in it."""
+    return FONT_DOWNLOAD_CACHE_DIR / "fontconfig_cache" / "store"
+
+
+def uses_font_store(config_dir: Path) -> bool:
+    """Whether a config directory selects its fonts in the font store (`download_fonts(link_fonts=False)`),
+    instead of holding symlinks to them."""
+    return (config_dir / FONT_SELECTION_FILE).exists()
+
+
+def config_font_paths(config_dir: Path) -> list[Path]:
+    """Paths of the fonts of a config directory, as stored in the font store."""
+    if uses_font_store(config_dir):
+        return list(font_files(config_dir).values())
+    return [Path(os.readlink(path)) for path in config_dir.iterdir() if path.is_symlink()]
+
+
+def fetched_font_paths(config_dir: Path) -> list[Path]:
+    """Paths of the fonts fetched for a config directory after it was created (see `fetch_fonts`)."""
+    try:
+        return [Path(path) for path in json.loads((config_dir / FETCHED_FONTS_FILE).read_text(encoding="utf-8"))]
+    except (OSError, ValueError):
+        return []
+
+
+def _record_fetched_fonts(config_dir: Path, font_paths: list[Path]) -> None:
+    try:
+        with file_lock(config_dir.with_name(f"{config_dir.name}.lock")):
+            fetched = dict.fromkeys(map(str, fetched_font_paths(config_dir))) | dict.fromkeys(map(str, font_paths))
+            write_file_atomically(config_dir / FETCHED_FONTS_FILE, json.dumps(list(fetched)))
+    except OSError:  # read-only cache
+        pass
+
+
+def font_bundles_dir() -> Path:
+    """Directory that font bundle archives are extracted to, under the font cache."""
+    return FONT_DOWNLOAD_CACHE_DIR / "bundles"
+
+
+def create_fontconfig_xml(config_dir: Path, cache_dir: Path | None = None) -> None:
+    """Create fontconfig XML file pointing to the config directory, and optionally its cache directory."""
+    cache_dir_line = f"\n    <cachedir>{escape(str(cache_dir))}</cachedir>" if cache_dir is not None else ""
+    xml_content = f"""<?xml version="1.0"?>
+<!DOCTYPE fontconfig SYSTEM "urn:fontconfig:fonts.dtd">
+<fontconfig>
+    <dir>{escape(str(config_dir))}</dir>{cache_dir_line}
+</fontconfig>
+"""
+    write_file_atomically(config_dir / "fonts.conf", xml_content)
+
+
+def create_store_fontconfig_xml(config_dir: Path, font_paths: list[Path], cache_dir: Path) -> None:
+    """Create fontconfig XML file pointing to the directories of the fonts (the font store, or local font
+    directories), restricted to the fonts of the config directory."""
+    selection_xml = textwrap.indent(font_selection_xml(str(path) for path in font_paths), " " * 4)
     xml_content = f"""<?xml version="1.0"?>
 <!DOCTYPE fontconfig SYSTEM "urn:fontconfig:fonts.dtd">
 <fontconfig>
-    <dir>{config_dir}</dir>
+    <cachedir>{escape(str(cache_dir))}</cachedir>
+{selection_xml}
 </fontconfig>
 """
-    (config_dir / "fonts.conf").write_text(xml_content, encoding="utf-8")
+    write_file_atomically(config_dir / "fonts.conf", xml_content)
+
 
+def build_fontconfig_cache(config_dir: Path, stale_font_dirs: Iterable[Path] = ()) -> bool:
+    """Scan the fonts of a config directory once, so that fontconfig writes its cache to the `<cachedir>`.
+
+    Processes using the config directory then read the cache instead of parsing every font file.
+    The caches of `stale_font_dirs` (e.g. directories of fonts modified in place) are removed first, so that
+    they are scanned again. Returns False (and builds nothing) if the fontconfig library is not available.
+    """
+    try:
+        fontconfig, _ = load_fontconfig()
+    except RuntimeError:
+        logging.debug("fontconfig library not found, not prebuilding the fontconfig cache")
+        return False
 
-def download_fonts(sources: FontsSources, max_workers: int | None = None) -> Path:
+    config = fontconfig.FcConfigCreate()
+    try:
+        fonts_conf = os.fsencode(config_dir / "fonts.conf")
+        if not fontconfig.FcConfigParseAndLoad(config, fonts_conf, 1):
+            return False
+        for font_dir in stale_font_dirs:
+            fontconfig.FcDirCacheUnlink(os.fsencode(font_dir), config)
+        return bool(fontconfig.FcConfigBuildFonts(config))
+    finally:
+        fontconfig.FcConfigDestroy(config)
+
+
+def download_fonts(
+    sources: FontsSources,
+    max_workers: int | None = None,
+    downloader: FontDownloader | None = None,
+    link_fonts: bool = True,
+    revalidate: bool = False,
+) -> Path:
     """Download fonts and create a fontconfig configuration directory.
 
     Steps:
-    1. Downloads fonts to FONTDOWNLOAD_CACHE_DIR/"fonts" (validates SHA256)
+    1. Downloads fonts to the content-addressed store FONTDOWNLOAD_CACHE_DIR/"fonts"/"objects"/<sha256>,
+       hashing them while they stream (and verifying them against `FontSource.sha256` when given)
     2. Creates unique config dir based on hash of sources
-    3. Writes sources.json with font metadata
-    4. Symlinks fonts from cache to config dir
-    5. Creates fonts.conf fontconfig XML
+    3. Symlinks fonts from cache to config dir
+    4. Writes coverage.json with the code points every font covers, and last_used, touched on every call
+       (see `font_download.cache_manager`)
+    5. Creates fonts.conf fontconfig XML, with a cache dir under FONTDOWNLOAD_CACHE_DIR/"fontconfig_cache"
+    6. Prebuilds the fontconfig cache
+    7. Writes sources.json with font metadata
+
+    Local fonts (a path or `file://` URL of a font file, or of a directory of fonts, expanded into its font files)
+    are used in place instead of step 1: hashed (once, see `font_download.hash_index`) and verified, but never
+    copied into the store, and without a thread pool. Symlinks (or fontconfig rules) point at them directly.
+    Every call checks them through the hash index: a config directory whose local fonts were modified in place
+    is created again, with their coverage and fontconfig cache.
+
+    Without `link_fonts`, step 3 is replaced by writing selected_fonts.json with the paths of the fonts in the store,
+    and fonts.conf points at the store itself, restricted to these fonts by `<selectfont>` rules. Creating a config
+    directory then writes the same few files whatever the number of fonts, and all such config directories share
+    one fontconfig cache of the store (under FONTDOWNLOAD_CACHE_DIR/"fontconfig_cache"/"store"), rebuilt once
+    whenever fonts are added to (or evicted from) the store.
 
     Args:
         sources: List of FontSource objects to download
-        max_workers: Maximum parallel downloads
+        max_workers: Maximum parallel downloads (each host is further limited by the downloader)
+        downloader: Downloader to use, by default a pooled one shared by the process
+        link_fonts: Symlink the fonts into the config directory, or else select them in the font store.
+            Either way has its own config directory.
+        revalidate: Ask the servers whether the fonts changed since they were downloaded, with conditional
+            requests in parallel (see `FontDownloader.download_validated`), and download again only those that
+            did. A config directory whose fonts changed is created again (processes that already loaded its fonts
+            keep using the old ones). Fonts with an expected SHA-256 are never revalidated.
+
+    Concurrent calls, from any process, are single-flight: one creates the config directory (and downloads each
+    font) while holding a file lock, the others wait for the lock and reuse the result.
 
     Returns:
         Path to config directory
     """
+    sources = expand_font_sources(sources)
     fonts_cache_dir = FONT_DOWNLOAD_CACHE_DIR / "fonts"
-    fonts_cache_dir.mkdir(parents=True, exist_ok=True)
+    # Font files by SHA-256, and the SHA-256 of the font at each URL (by hash of the URL)
+    (fonts_cache_dir / "objects").mkdir(parents=True, exist_ok=True)
+    (fonts_cache_dir / "urls").mkdir(parents=True, exist_ok=True)
 
     config_base_dir = FONT_DOWNLOAD_CACHE_DIR / "config"
-    config_hash = _compute_sources_hash(sources)
+    config_hash = _compute_sources_hash(sources, link_fonts)
     config_dir = config_base_dir / config_hash
 
     # Return existing config if valid
-    if (config_dir / "sources.json").exists():
+    if (
+        (config_dir / "sources.json").exists()
+        and not revalidate
+        and _pinned_fonts_match(sources, config_dir)
+        and not _changed_local_fonts(sources, config_dir)
+    ):
+        _record_use(config_dir)
         return config_dir
 
-    config_dir.mkdir(parents=True, exist_ok=True)
+    config_base_dir.mkdir(parents=True, exist_ok=True)
+    downloader = downloader or default_downloader()
+    with _gc_lock(shared=True), file_lock(config_base_dir / f"{config_hash}.lock"):
+        # Created by another process while this one waited for the lock (or before, when revalidating)
+        changed_local_fonts = []
+        if (config_dir / "sources.json").exists():
+            changed_local_fonts = _changed_local_fonts(sources, config_dir)
+            if not _pinned_fonts_match(sources, config_dir):
+                logging.info(f"{config_dir} holds other fonts than the SHA-256 of the sources pin")
+                changed = True
+            elif changed_local_fonts:
+                logging.info(
+                    f"Local fonts changed since {config_dir} was created: {', '.join(map(str, changed_local_fonts))}"
+                )
+                changed = True
+            else:
+                changed = revalidate and _revalidate_config_dir(
+                    sources, config_dir, fonts_cache_dir, max_workers, downloader
+                )
+            if not changed:
+                _record_use(config_dir)
+                return config_dir
+            # Created again from the fonts now in the store, which were just revalidated
+            (config_dir / "sources.json").unlink()
+            revalidate = False
+        config_dir.mkdir(parents=True, exist_ok=True)
+        # Fontconfig only scans a directory again once its modification time changed, which editing a font does not
+        stale_font_dirs = [config_dir] if link_fonts else [font_path.parent for font_path in changed_local_fonts]
+        _create_config_dir(
+            sources, config_dir, fonts_cache_dir, max_workers, downloader, link_fonts, revalidate, stale_font_dirs
+        )
+
+    return config_dir
+
+
+def _revalidate_config_dir(
+    sources: list, config_dir: Path, fonts_cache_dir: Path, max_workers: int | None, downloader: FontDownloader
+) -> bool:
+    """Revalidate the fonts of a config directory in parallel, downloading those that changed.
+
+    Returns whether any font is not the one the config directory was created with.
+    """
+
+    def revalidate_task(source):
+        return _download_font(source, fonts_cache_dir, downloader, revalidate=True)[1]
+
+    sha256s = _map_sources(revalidate_task, sources, max_workers)
+    _hash_index(fonts_cache_dir).save()
+
+    recorded = {font["url"]: font["sha256"] for font in json.loads((config_dir / "sources.json").read_text())}
+    changed = [
+        source.name for source, sha256 in zip(sources, sha256s, strict=True) if recorded.get(source.url) != sha256
+    ]
+    if changed:
+        logging.info(f"Fonts changed since {config_dir} was created: {', '.join(changed)}")
+    return bool(changed)
+
+
+def _local_font(source, fonts_cache_dir: Path) -> tuple[Path, str]:
+    """Path and SHA-256 of a font on this machine, used in place: neither downloaded nor copied into the store."""
+    font_path = source.local_path().resolve()
+    if not font_path.is_file():
+        raise FileNotFoundError(f"Font {source.url} not found.")
+    # Only fonts changed since they were last hashed are read again
+    sha256 = _hash_index(fonts_cache_dir).sha256(font_path)
+    if source.sha256 is not None and sha256 != source.sha256:
+        raise ValueError(f"SHA-256 mismatch for {source.url}: expected {source.sha256}, found {sha256}")
+    return font_path, sha256
+
+
+def _store_font(
+    source, url_path: Path, objects_dir: Path, downloader: FontDownloader, hash_index: HashIndex, stored: str | None
+) -> str:
+    """Download a font into the store, conditionally if a version of it is `stored`, and record its SHA-256 and
+    the validators of the response for its URL. Returns its SHA-256. Called with the lock of the URL held."""
+    validators_path = url_path.with_suffix(".validators")
+    validators = None
+    if stored is None:
+        logging.info(f"Downloading {source.name}...")
+    elif validators_path.exists():
+        validators = json.loads(validators_path.read_text(encoding="utf-8"))
+    else:
+        logging.info(f"Downloading {source.name} again, it was stored without validators to revalidate it...")
+
+    sha256, new_validators = _download_to_store(
+        source.url, objects_dir, downloader, hash_index, expected_sha256=source.sha256, validators=validators
+    )
+    if sha256 is None:  # Not modified
+        sha256 = stored
+    elif sha256 != stored:
+        write_file_atomically(url_path, sha256)
+    if new_validators and new_validators != validators:
+        write_file_atomically(validators_path, json.dumps(new_validators))
+    return sha256
+
+
+def _download_font(
+    source, fonts_cache_dir: Path, downloader: FontDownloader, revalidate: bool = False
+) -> tuple[Path, str]:
+    """Path and SHA-256 of the font in the store, downloading it if it is not there yet (or corrupted).
+
+    With `revalidate`, a stored font is downloaded again if it changed on the server since, which a conditional
+    request with the validators of its last download (`urls/<hash of URL>.validators`) tells without a body.
+    """
+    if source.local_path() is not None:
+        return _local_font(source, fonts_cache_dir)
+    objects_dir = fonts_cache_dir / "objects"
+    url_path = fonts_cache_dir / "urls" / _url_key(source.url)
+    hash_index = _hash_index(fonts_cache_dir)
+    # Fonts with an expected SHA-256 cannot change
+    revalidate = revalidate and source.sha256 is None
 
+    def stored_sha256() -> str | None:
+        sha256 = source.sha256 or (url_path.read_text(encoding="utf-8") if url_path.exists() else None)
+        if sha256 is None or not (objects_dir / sha256).exists():
+            return None
+        # Only fonts changed since they were last hashed are read again
+        if hash_index.sha256(objects_dir / sha256) != sha256:
+            logging.warning(f"Stored font {objects_dir / sha256} is corrupted, downloading it again")
+            (objects_dir / sha256).unlink(missing_ok=True)
+            return None
+        return sha256
+
+    sha256 = stored_sha256()
+    if sha256 is not None and not revalidate:
+        return objects_dir / sha256, sha256
+
+    # The same font can be part of several config directories created at the same time
+    with file_lock(url_path.with_suffix(".lock")):
+        sha256 = stored_sha256()
+        if sha256 is None or revalidate:
+            sha256 = _store_font(source, url_path, objects_dir, downloader, hash_index, stored=sha256)
+    return objects_dir / sha256, sha256
+
+
+def fetch_fonts(
+    sources: FontsSources,
+    max_workers: int | None = None,
+    downloader: FontDownloader | None = None,
+    used_by: Path | None = None,
+) -> list[Path]:
+    """Download fonts into the font store only, without a config directory, and return their paths
+    (the paths of local fonts, which are used in place).
+
+    With `used_by`, the fonts are recorded as used by that config directory, so that the garbage collection
+    of the cache keeps them as long as it keeps the directory.
+    """
+    fonts_cache_dir = FONT_DOWNLOAD_CACHE_DIR / "fonts"
+    (fonts_cache_dir / "objects").mkdir(parents=True, exist_ok=True)
+    (fonts_cache_dir / "urls").mkdir(parents=True, exist_ok=True)
+    downloader = downloader or default_downloader()
+
+    def download_font_task(source):
+        return _download_font(source, fonts_cache_dir, downloader)[0]
+
+    with _gc_lock(shared=True):
+        font_paths = _map_sources(download_font_task, sources, max_workers)
+        if used_by is not None:
+            _record_fetched_fonts(Path(used_by), font_paths)
+    _hash_index(fonts_cache_dir).save()
+    return font_paths
+
+
+def _map_sources(task, sources: list, max_workers: int | None) -> list:
+    """Results of `task` for every source, downloading in parallel, while local fonts are used in this thread."""
+    results = {}
+    remote = []
+    for index, source in enumerate(sources):
+        if source.local_path() is not None:
+            results[index] = task(source)
+        else:
+            remote.append(index)
+    if remote:
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers or os.cpu_count()) as executor:
+            results.update(zip(remote, executor.map(task, (sources[index] for index in remote)), strict=True))
+    return [results[index] for index in range(len(sources))]
+
+
+def _create_config_dir(
+    sources: FontsSources,
+    config_dir: Path,
+    fonts_cache_dir: Path,
+    max_workers: int | None,
+    downloader: FontDownloader,
+    link_fonts: bool = True,
+    revalidate: bool = False,
+    stale_font_dirs: Iterable[Path] = (),
+) -> None:
     def download_font_task(source):
         """Download font and return metadata."""
-        font_path = fonts_cache_dir / source.name
+        font_path, sha256 = _download_font(source, fonts_cache_dir, downloader, revalidate)
+        if link_fonts:
+            # Replaces existing symlinks, e.g. broken ones of a previous, interrupted run
+            _symlink_atomically(font_path, config_dir / source.name)
+        return FontEntity(name=source.name, url=source.url, file_path=font_path, sha256=sha256)
 
-        # Download if doesn't exist
-        if not font_path.exists():
-            logging.info(f"Downloading {source.name}...")
-            urlretrieve(source.url, font_path)
+    font_metadata = _map_sources(download_font_task, sources, max_workers)
+    _hash_index(fonts_cache_dir).save()
+    if link_fonts:
+        # Left by a previous, interrupted run selecting the fonts instead
+        (config_dir / FONT_SELECTION_FILE).unlink(missing_ok=True)
+    else:
+        selection = {font.name: str(font.file_path) for font in font_metadata}
+        write_file_atomically(config_dir / FONT_SELECTION_FILE, json.dumps(selection, indent=2))
 
-        # Create symlink in config dir
-        symlink_path = config_dir / source.name
-        # Remove existing symlink if it exists (handles broken symlinks)
-        if symlink_path.is_symlink() or symlink_path.exists():
-            symlink_path.unlink(missing_ok=True)
-        symlink_path.symlink_to(font_path)
+    # Write coverage.json, and the last use before the fontconfig cache, which is checked against the directory.
+    # The coverage records the sources.json it belongs to, which is only written once the directory is complete.
+    sources_json = json.dumps([font.to_dict() for font in font_metadata], indent=2)
+    build_coverage_index(config_dir, hashlib.sha256(sources_json.encode("utf-8")).hexdigest())
+    _record_use(config_dir)
 
-        return FontEntity(name=source.name, url=source.url, file_path=font_path)
+    # Create fontconfig XML, and scan the fonts once into its cache. The cache of the store is only scanned again
+    # if fonts were added to the store since it was last scanned.
+    if link_fonts:
+        cache_dir = fontconfig_cache_dir(config_dir)
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        create_fontconfig_xml(config_dir, cache_dir=cache_dir)
+    else:
+        cache_dir = fontconfig_store_cache_dir()
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        create_store_fontconfig_xml(config_dir, [font.file_path for font in font_metadata], cache_dir)
+    build_fontconfig_cache(config_dir, stale_font_dirs)
 
-    # Download in parallel
-    max_workers = max_workers or os.cpu_count()
-    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
-        font_metadata = list(executor.map(download_font_task, sources))
+    # Write sources.json last, as it marks the config directory as complete
+    write_file_atomically(config_dir / "sources.json", sources_json)
 
-    # Write sources.json
-    font_metadata = [font.to_dict() for font in font_metadata]
-    (config_dir / "sources.json").write_text(json.dumps(font_metadata, indent=2), encoding="utf-8")
 
-    # Create fontconfig XML
-    create_fontconfig_xml(config_dir)
+def audit_font_store() -> list[Path]:
+    """Hash every stored font again, regardless of the hash index, to find fonts corrupted on disk.
 
-    return config_dir
+    Corrupted fonts are removed, and the config directories using them marked incomplete (their sources.json
+    removed), so that the next `download_fonts` call downloads the fonts again.
+
+    Returns:
+        Paths of the corrupted fonts
+    """
+    fonts_cache_dir = FONT_DOWNLOAD_CACHE_DIR / "fonts"
+    objects_dir = fonts_cache_dir / "objects"
+    if not objects_dir.is_dir():
+        return []
+
+    hash_index = _hash_index(fonts_cache_dir)
+    corrupted = []
+    # Hidden files are downloads in progress
+    for object_path in sorted(path for path in objects_dir.iterdir() if not path.name.startswith(".")):
+        sha256 = compute_file_sha256(object_path)
+        if sha256 == object_path.name:
+            hash_index.record(object_path, sha256)
+        else:
+            logging.error(f"Stored font {object_path} is corrupted (its SHA-256 is {sha256})")
+            corrupted.append(object_path)
+    hash_index.save()
+
+    if corrupted:
+        _invalidate_config_dirs({str(path) for path in corrupted})
+        for object_path in corrupted:
+            object_path.unlink(missing_ok=True)
+    return corrupted
+
+
+def _invalidate_config_dirs(font_paths: set[str]) -> None:
+    config_base_dir = FONT_DOWNLOAD_CACHE_DIR / "config"
+    if not config_base_dir.is_dir():
+        return
+    for config_dir in config_base_dir.iterdir():
+        if not config_dir.is_dir():
+            continue
+        if any(str(path) in font_paths for path in config_font_paths(config_dir)):
+            with file_lock(config_base_dir / f"{config_dir.name}.lock"):
+                (config_dir / "sources.json").unlink(missing_ok=True)
+
+
+def audit_font_store_in_background() -> concurrent.futures.Future[list[Path]]:
+    """Run `audit_font_store` in a background thread, e.g. periodically in a long-running service."""
+    executor = concurrent.futures.ThreadPoolExecutor(max_workers=1, thread_name_prefix="font-store-audit")
+    future = executor.submit(audit_font_store)
+    executor.shutdown(wait=False)
+    return future
@@ -0,0 +1,147 @@
+"""
+Pooled HTTP downloads of font files.
+
+Font sets are many files from the same host (e.g. 155 Noto fonts from GitHub). A `FontDownloader` reuses
+kept-alive connections from a pool, limits how many downloads run against each host at once, streams
+every file to disk in chunks while hashing it, and retries failed downloads with exponential backoff.
+Retries are made in one place, `FontDownloader.download_validated`, whatever failed: the connection, the
+response status or the body (the connection pool itself never retries, so attempts do not multiply).
+
+Downloads also return the validators of the response (its `ETag` and `Last-Modified` headers), with which
+a later request is conditional: the server answers `304 Not Modified`, without a body, if the file did not change.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import logging
+import threading
+import time
+from pathlib import Path
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import InvalidHeader
+from urllib3.util.retry import Retry
+
+logger = logging.getLogger(__name__)
+
+# Responses worth retrying: rate limiting and transient server errors
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+# Validator name: (response header, header of the conditional request)
+VALIDATOR_HEADERS = {"etag": ("ETag", "If-None-Match"), "last_modified": ("Last-Modified", "If-Modified-Since")}
+
+
+class FontDownloader:
+    """Downloads fonts over a pooled `requests.Session`, safe to share between threads."""
+
+    def __init__(
+        self,
+        max_connections_per_host: int = 8,
+        retries: int = 3,
+        backoff_factor: float = 0.5,
+        timeout: float = 60,
+        chunk_size: int = 1 << 20,
+    ) -> None:
+        self.max_connections_per_host = max_connections_per_host
+        self.retries = retries
+        self.backoff_factor = backoff_factor
+        self.timeout = timeout
+        self.chunk_size = chunk_size
+
+        # No retries in urllib3: download_validated retries every kind of failure, including those mid-body
+        adapter = HTTPAdapter(pool_maxsize=max_connections_per_host, max_retries=0)
+        self.session = requests.Session()
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        self._host_semaphores: dict[str, threading.BoundedSemaphore] = {}
+        self._host_semaphores_lock = threading.Lock()
+
+    def _host_semaphore(self, url: str) -> threading.BoundedSemaphore:
+        host = urlsplit(url).netloc
+        with self._host_semaphores_lock:
+            if host not in self._host_semaphores:
+                self._host_semaphores[host] = threading.BoundedSemaphore(self.max_connections_per_host)
+            return self._host_semaphores[host]
+
+    def download(self, url: str, path: str | Path) -> str:
+        """
+        Streams `url` into the file at `path` (overwriting it) and returns the SHA-256 of its content.
+        Connection errors, timeouts, responses with a status of `RETRY_STATUSES` and downloads interrupted
+        mid-body are retried (from scratch) up to `retries` times, after an exponential backoff or the
+        `Retry-After` of the response.
+        """
+        sha256, _ = self.download_validated(url, path)
+        return sha256
+
+    def download_validated(
+        self, url: str, path: str | Path, validators: dict[str, str] | None = None
+    ) -> tuple[str | None, dict[str, str]]:
+        """
+        Like `download`, also returning the validators of the response (see `VALIDATOR_HEADERS`).
+        With the validators of a previous download, the request is conditional: if the file did not change,
+        None is returned (with the given validators, updated by the 304 response) and `path` is empty.
+        """
+        attempt = 0
+        while True:
+            try:
+                return self._download_once(url, path, validators)
+            except (
+                requests.ConnectionError,
+                requests.Timeout,
+                requests.exceptions.ChunkedEncodingError,
+                requests.HTTPError,
+            ) as e:
+                delay = self._retry_delay(e, attempt)
+                if delay is None:
+                    raise
+                logger.warning("Downloading %s failed (%s), retrying in %.1fs", url, e, delay)
+                time.sleep(delay)
+                attempt += 1
+
+    def _retry_delay(self, error: requests.RequestException, attempt: int) -> float | None:
+        """Seconds to wait before retrying a failed attempt, or None if it is not retried."""
+        if attempt == self.retries:
+            return None
+        delay = self.backoff_factor * 2**attempt
+        if isinstance(error, requests.HTTPError):
+            if error.response is None or error.response.status_code not in RETRY_STATUSES:
+                return None
+            retry_after = error.response.headers.get("Retry-After")
+            if retry_after is not None:
+                try:
+                    delay = max(delay, Retry().parse_retry_after(retry_after))
+                except InvalidHeader:
+                    logger.debug("Ignoring invalid Retry-After header: %s", retry_after)
+        return delay
+
+    def _download_once(
+        self, url: str, path: str | Path, validators: dict[str, str] | None
+    ) -> tuple[str | None, dict[str, str]]:
+        validators = validators or {}
+        headers = {VALIDATOR_HEADERS[name][1]: value for name, value in validators.items()}
+        digest = hashlib.sha256()
+        with (
+            self._host_semaphore(url),
+            self.session.get(url, headers=headers, stream=True, timeout=self.timeout) as response,
+            open(path, "wb") as f,
+        ):
+            response.raise_for_status()
+            response_validators = {
+                name: response.headers[header]
+                for name, (header, _) in VALIDATOR_HEADERS.items()
+                if header in response.headers
+            }
+            if response.status_code == 304:
+                # Validators a 304 response leaves out are still valid
+                return None, {**validators, **response_validators}
+            for chunk in response.iter_content(chunk_size=self.chunk_size):
+                digest.update(chunk)
+                f.write(chunk)
+        return digest.hexdigest(), response_validators
+
+    def close(self) -> None:
+        self.session.close()
@@ -4,6 +4,9 @@ from dataclasses import asdict, dataclass
 from pathlib import Path
 from urllib.parse import unquote, urlparse
 
+# Suffixes of the font files taken from font directories
+FONT_FILE_SUFFIXES = (".ttf", ".otf", ".ttc", ".otc")
+
 
 def compute_file_sha256(file_path: str | Path) -> str:
     with open(file_path, "rb", buffering=0) as f:
@@ -12,28 +15,66 @@ def compute_file_sha256(file_path: str | Path) -> str:
 
 @dataclass(slots=True)
 class FontSource:
-    """Represents a font to be downloaded, as provided by the user."""
+    """Represents a font to be downloaded, as provided by the user, optionally with its expected SHA-256.
+
+    The URL can also be a local path or a `file://` URL (e.g. on a shared, read-only file system), of a font
+    file or of a directory of fonts. Local fonts are used in place, never copied.
+    """
 
     url: str
     name: str = "placeholder_name"
+    sha256: str | None = None
 
     def __post_init__(self) -> None:
         self.prepare_name()
 
+    @classmethod
+    def from_dict(cls, source: dict) -> "FontSource":
+        return cls(url=source["url"], name=source.get("name", "placeholder_name"), sha256=source.get("sha256"))
+
     def prepare_name(self) -> str:
         parsed_url = urlparse(self.url)
         self.name = Path(unquote(parsed_url.path)).name
         return self.name
 
+    def local_path(self) -> Path | None:
+        """Path of a font (or font directory) on this machine, None for a font to download."""
+        parsed_url = urlparse(self.url)
+        if parsed_url.scheme == "file":
+            return Path(unquote(parsed_url.path))
+        # A single letter is the drive of a Windows path
+        if parsed_url.scheme == "" or len(parsed_url.scheme) == 1:
+            return Path(self.url)
+        return None
+
     def to_dict(self) -> dict:
-        return asdict(self)
+        source = asdict(self)
+        if self.sha256 is None:
+            del source["sha256"]
+        return source
 
 
-FontSourceDict = dict[str, str]
+FontSourceDict = dict[str, str | None]
 
 FontsSources = list[FontSource] | list[FontSourceDict]
 
 
+def expand_font_sources(sources: FontsSources) -> list[FontSource]:
+    """Sources as `FontSource` objects, with local font directories replaced by a source per font file in them."""
+    expanded = []
+    for source in sources:
+        source = FontSource.from_dict(source) if isinstance(source, dict) else source
+        local_path = source.local_path()
+        if local_path is None or not local_path.is_dir():
+            expanded.append(source)
+            continue
+        for font_path in sorted(local_path.iterdir()):
+            if font_path.suffix.lower() in FONT_FILE_SUFFIXES and font_path.is_file():
+                url = font_path.absolute().as_uri() if source.url.startswith("file:") else str(font_path)
+                expanded.append(FontSource(url=url))
+    return expanded
+
+
 @dataclass(slots=True)
 class FontEntity:
     """Represents a font's metadata in the JSON configuration file."""
@@ -48,7 +89,8 @@ class FontEntity:
         if not isinstance(self.file_path, Path):
             self.file_path = Path(self.file_path)
 
-        self.sha256 = compute_file_sha256(file_path=self.file_path)
+        if not self.sha256:
+            self.sha256 = compute_file_sha256(file_path=self.file_path)
 
     def to_dict(self) -> dict:
         return {
@@ -0,0 +1,95 @@
+"""
+Persistent index of the SHA-256 of font files.
+
+Hashing a large font (e.g. NotoColorEmoji, 10 MB) means reading all of it. The index remembers the hash of
+every file together with its `(size, mtime_ns, inode)`, so a file is only hashed again once it was modified
+or replaced. It is saved as JSON next to the files it indexes, and shared by the processes using them:
+saving merges the entries of this process into those saved by others, under a file lock.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import threading
+from collections.abc import Iterable
+from pathlib import Path
+
+from font_configurator.atomic_files import file_lock, write_file_atomically
+from font_download.fonts import compute_file_sha256
+
+
+def _file_key(path: Path) -> list[int]:
+    stat = os.stat(path)
+    return [stat.st_size, stat.st_mtime_ns, stat.st_ino]
+
+
+class HashIndex:
+    """SHA-256 of files by path, valid as long as their size, modification time and inode are unchanged."""
+
+    def __init__(self, index_path: Path) -> None:
+        self.index_path = index_path
+        self._lock = threading.Lock()
+        # path: [size, mtime_ns, inode, sha256]
+        self._entries: dict[str, list] | None = None
+        self._updated: dict[str, list] = {}
+
+    def _read_entries(self) -> dict[str, list]:
+        try:
+            return json.loads(self.index_path.read_text(encoding="utf-8"))
+        except (FileNotFoundError, ValueError):
+            return {}
+
+    def _loaded_entries(self) -> dict[str, list]:
+        if self._entries is None:
+            self._entries = self._read_entries()
+        return self._entries
+
+    def lookup(self, path: Path) -> str | None:
+        """The indexed hash of the file, or None if it is not indexed or changed since."""
+        with self._lock:
+            entry = self._loaded_entries().get(str(path))
+        if entry is None or entry[:3] != _file_key(path):
+            return None
+        return entry[3]
+
+    def record(self, path: Path, sha256: str) -> None:
+        """Index a hash computed elsewhere, e.g. while downloading the file."""
+        entry = [*_file_key(path), sha256]
+        with self._lock:
+            self._loaded_entries()[str(path)] = entry
+            self._updated[str(path)] = entry
+
+    def sha256(self, path: Path) -> str:
+        """Hash of the file, computed only if it is not indexed or changed since."""
+        sha256 = self.lookup(path)
+        if sha256 is None:
+            sha256 = compute_file_sha256(path)
+            self.record(path, sha256)
+        return sha256
+
+    def _file_lock(self):
+        # Held while the index is read, merged and written, so that no process loses the entries of another
+        return file_lock(self.index_path.with_name(f"{self.index_path.name}.lock"))
+
+    def _write_entries(self, entries: dict[str, list]) -> None:
+        write_file_atomically(self.index_path, json.dumps(entries, separators=(",", ":")))
+        self._entries = entries
+        self._updated = {}
+
+    def save(self) -> None:
+        """Write the entries recorded by this process, merged with those other processes saved meanwhile."""
+        with self._lock:
+            if not self._updated:
+                return
+            with self._file_lock():
+                self._write_entries(self._read_entries() | self._updated)
+
+    def forget(self, paths: Iterable[Path]) -> None:
+        """Remove the entries of deleted files, and save the index."""
+        forgotten = {str(path) for path in paths}
+        with self._lock, self._file_lock():
+            entries = self._read_entries() | self._updated
+            if forgotten.isdisjoint(entries):
+                return
+            self._write_entries({path: entry for path, entry in entries.items() if path not in forgotten})
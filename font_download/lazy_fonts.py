@@ -0,0 +1,147 @@
+"""
+Lazily downloaded font sets.
+
+A large font set (e.g. `FONTS_NOTO_SANS`, 155 fonts) is mostly fonts of scripts a given job never renders.
+A `LazyFontSet` downloads only its core fonts up front, into a regular font directory. Every other font is
+downloaded into the font store when a text needs it: the characters that no downloaded font covers are
+looked up in the characters each font family is designed for (`font_download.scripts`), and the first
+matching font not downloaded yet is fetched. The caller registers the fetched fonts with fontconfig.
+"""
+
+from __future__ import annotations
+
+import logging
+import threading
+from collections.abc import Callable, Iterable
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+import numpy as np
+
+from font_download.coverage import ignorable_table, load_coverage_index, read_font_coverage, text_codepoints
+from font_download.download_fonts import download_fonts, fetch_fonts
+from font_download.fonts import FontSource, FontsSources, expand_font_sources
+from font_download.scripts import family_characters, font_family
+
+if TYPE_CHECKING:
+    from font_download.downloader import FontDownloader
+
+# Font families downloaded up front by default
+DEFAULT_CORE_FAMILIES = ("NotoSans",)
+
+
+def split_core_sources(
+    sources: FontsSources, core_families: Iterable[str] | None = None
+) -> tuple[list[FontSource], list[FontSource]]:
+    """Sources of the core font families (the first source if there are none), and the other sources."""
+    sources = expand_font_sources(sources)
+    core_families = set(core_families if core_families is not None else DEFAULT_CORE_FAMILIES)
+    core = [source for source in sources if font_family(source.name) in core_families] or sources[:1]
+    return core, [source for source in sources if source not in core]
+
+
+class LazyFontSet:
+    """Core fonts in a font directory, and the other fonts of the set, downloaded when text needs them."""
+
+    def __init__(
+        self,
+        sources: FontsSources,
+        core_families: Iterable[str] | None = None,
+        on_fetch: Callable[[list[Path]], None] | None = None,
+        downloader: FontDownloader | None = None,
+        link_fonts: bool = True,
+    ) -> None:
+        """
+        Args:
+            sources: All fonts of the set.
+            core_families: Font families downloaded up front, by default `DEFAULT_CORE_FAMILIES`.
+            on_fetch: Called with the paths of newly fetched fonts (e.g. to register them with fontconfig),
+                before texts needing them are reported as covered.
+            downloader: Downloader to use, by default a pooled one shared by the process.
+            link_fonts: Symlink the core fonts into their font directory, or else select them in the font store
+                (see `download_fonts`).
+        """
+        self.core_sources, self.lazy_sources = split_core_sources(sources, core_families)
+        self.on_fetch = on_fetch
+        self.downloader = downloader
+        self.link_fonts = link_fonts
+        self.fetched: dict[str, Path] = {}
+
+        self._font_dir: Path | None = None
+        self._lock = threading.Lock()
+        # Characters that need no more fonts, checked without a lock on every render
+        self._settled: frozenset[str] = frozenset()
+        self._covered: np.ndarray | None = None
+        self._family_codepoints: list[np.ndarray] | None = None
+
+    @property
+    def font_dir(self) -> Path:
+        """Font directory of the core fonts, downloaded on first use."""
+        if self._font_dir is None:
+            self._font_dir = download_fonts(self.core_sources, downloader=self.downloader, link_fonts=self.link_fonts)
+        return self._font_dir
+
+    def _covered_table(self) -> np.ndarray:
+        if self._covered is None:
+            self._covered = load_coverage_index(self.font_dir).covered | ignorable_table()
+        return self._covered
+
+    def _add_coverage(self, font_path: Path) -> None:
+        try:
+            ranges = read_font_coverage(font_path)
+        except (OSError, ValueError) as e:
+            logging.warning(f"Could not read font coverage: {e}")
+            return
+        for start, end in ranges:
+            self._covered[start : end + 1] = True
+
+    def _candidates_table(self) -> list[np.ndarray]:
+        # Building it reads the names of all Unicode characters, so it is only built once a character is missing
+        if self._family_codepoints is None:
+            self._family_codepoints = [
+                np.sort(text_codepoints(family_characters(font_family(source.name)))) for source in self.lazy_sources
+            ]
+        return self._family_codepoints
+
+    def _next_sources(self, codepoints: np.ndarray) -> list[FontSource]:
+        """For every code point, the first font not fetched yet that is designed for it."""
+        sources = {}
+        for source, family_codepoints in zip(self.lazy_sources, self._candidates_table(), strict=True):
+            if source.name in self.fetched or len(codepoints) == 0:
+                continue
+            matches = np.isin(codepoints, family_codepoints, assume_unique=True)
+            if matches.any():
+                sources[source.name] = source
+                codepoints = codepoints[~matches]
+        return list(sources.values())
+
+    def fetch_for(self, text: str) -> list[Path]:
+        """
+        Downloads the fonts that characters of `text` need and no downloaded font covers.
+        Returns the paths of the fonts fetched by this call (usually none).
+        """
+        if self._settled.issuperset(text):
+            return []
+
+        with self._lock:
+            characters = set(text) - self._settled
+            covered = self._covered_table()
+            fetched = []
+            while True:
+                codepoints = np.unique(text_codepoints("".join(characters)))
+                sources = self._next_sources(codepoints[~covered[codepoints]])
+                if not sources:
+                    break
+                logging.info(f"Fetching fonts for missing characters: {', '.join(s.name for s in sources)}")
+                font_paths = fetch_fonts(
+                    sources, max_workers=len(sources), downloader=self.downloader, used_by=self.font_dir
+                )
+                for source, font_path in zip(sources, font_paths, strict=True):
+                    self.fetched[source.name] = font_path
+                    self._add_coverage(font_path)
+                    fetched.append(font_path)
+
+            if fetched and self.on_fetch is not None:
+                self.on_fetch(fetched)
+            self._settled = self._settled | characters
+        return fetched
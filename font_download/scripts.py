@@ -0,0 +1,114 @@
+"""Characters each font family is designed for, derived from font file names and Unicode data.
+
+This is an approximation that needs no font files: "NotoSansOldItalic-Regular.ttf" is mapped to the
+Unicode characters named "OLD ITALIC ...". Use it to generate sample text per font family.
+Characters added in Unicode versions newer than this Python's `unicodedata` are not known.
+"""
+
+from __future__ import annotations
+
+import random
+import re
+import sys
+import unicodedata
+from collections import defaultdict
+from functools import cache
+from pathlib import Path
+
+# Selectors are Unicode character name prefixes, or inclusive (start, end) code point ranges
+Selector = str | tuple[int, int]
+
+_LATIN_GREEK_CYRILLIC = ("LATIN", "GREEK", "CYRILLIC")
+_EMOJI = ((0x1F300, 0x1F64F), (0x1F680, 0x1F6FF), (0x1F900, 0x1F9FF))
+
+# Families whose characters are not named after a single script (keys are family names without "Noto"/"NotoSans")
+_FAMILY_SELECTORS: dict[str, tuple[Selector, ...]] = {
+    "": _LATIN_GREEK_CYRILLIC,
+    "Mono": _LATIN_GREEK_CYRILLIC,
+    "ColorEmoji": _EMOJI,
+    "Emoji": _EMOJI,
+    "Math": ((0x2200, 0x22FF), (0x1D400, 0x1D7FF)),
+    "Symbols": ((0x2600, 0x26FF),),
+    "Symbols2": ((0x2B00, 0x2BFF), (0x1F780, 0x1F7FF)),
+    "Music": ((0x1D100, 0x1D1FF),),
+    "SignWriting": ((0x1D800, 0x1DAAF),),
+    "JP": ("HIRAGANA", "KATAKANA", "CJK UNIFIED"),
+    "KR": ("HANGUL SYLLABLE",),
+    "SC": ("CJK UNIFIED",),
+    "TC": ("CJK UNIFIED",),
+    "HK": ("CJK UNIFIED",),
+    "AnatolianHieroglyphs": ("ANATOLIAN HIEROGLYPH",),
+    "CanadianAboriginal": ("CANADIAN SYLLABICS",),
+    "CyproMinoan": ("CYPRO-MINOAN",),
+    "EgyptianHieroglyphs": ("EGYPTIAN HIEROGLYPH",),
+    "NKo": ("NKO",),
+    "PhagsPa": ("PHAGS-PA",),
+    "TamilSupplement": ((0x11FC0, 0x11FFF),),
+    "IndicSiyaqNumbers": ("INDIC SIYAQ",),
+    "MayanNumerals": ("MAYAN NUMERAL",),
+    "SyriacEastern": ("SYRIAC",),
+}
+
+# Style variants share the characters of their base family
+_VARIANT_SUFFIXES = ("Unjoined", "Looped")
+
+_MAX_PREFIX_WORDS = 3
+
+
+def font_family(font_name: str) -> str:
+    """Family of a font file name, e.g. "NotoSansOldItalic-Regular.ttf" -> "NotoSansOldItalic"."""
+    stem = Path(font_name).stem
+    stem = stem.split("[", 1)[0]
+    return stem.split("-", 1)[0]
+
+
+def _family_selectors(family: str) -> tuple[Selector, ...]:
+    key = re.sub(r"^Noto(Sans)?", "", family)
+    for suffix in _VARIANT_SUFFIXES:
+        if key.endswith(suffix) and key != suffix:
+            key = key.removesuffix(suffix)
+    if key in _FAMILY_SELECTORS:
+        return _FAMILY_SELECTORS[key]
+    # "OldItalic" -> "OLD ITALIC", "LinearB" -> "LINEAR B"
+    return (" ".join(re.findall(r"[A-Z][a-z]*|\d+", key)).upper(),)
+
+
+@cache
+def _characters_by_name_prefix() -> dict[str, list[str]]:
+    """Visible characters indexed by the first one to three words of their Unicode name."""
+    index = defaultdict(list)
+    for codepoint in range(sys.maxunicode + 1):
+        char = chr(codepoint)
+        if unicodedata.category(char)[0] not in "LNPS":
+            continue
+        name = unicodedata.name(char, "")
+        words = name.split(" ", _MAX_PREFIX_WORDS)
+        for length in range(1, min(len(words), _MAX_PREFIX_WORDS) + 1):
+            index[" ".join(words[:length])].append(char)
+    return index
+
+
+@cache
+def family_characters(family: str) -> str:
+    """All characters the family is designed for, or an empty string if they are unknown."""
+    characters = []
+    for selector in _family_selectors(family):
+        if isinstance(selector, str):
+            characters.extend(_characters_by_name_prefix().get(selector, ()))
+        else:
+            start, end = selector
+            characters.extend(
+                chr(codepoint)
+                for codepoint in range(start, end + 1)
+                if unicodedata.category(chr(codepoint))[0] in "LNPS"
+            )
+    return "".join(dict.fromkeys(characters))
+
+
+def sample_text(family: str, length: int = 16, rng: random.Random | None = None) -> str:
+    """Random text of `length` characters the family is designed for (empty if unknown)."""
+    characters = family_characters(family)
+    if not characters:
+        return ""
+    rng = rng or random.Random(0)
+    return "".join(rng.choices(characters, k=length))
@@ -0,0 +1,145 @@
+"""Select the smallest subset of font sources that covers the characters of a corpus.
+
+Fontconfig initialization and fallback matching get slower with every font, so deployments that see
+only a few scripts are better served by a font set built for their data:
+
+    python -m font_download.selection --fonts noto_sans --corpus train.txt --output my_fonts
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+from collections.abc import Iterable
+from dataclasses import dataclass, field
+from itertools import islice
+from pathlib import Path
+
+import numpy as np
+
+from font_download.coverage import ignorable_table, load_coverage_index, text_codepoints
+from font_download.download_fonts import download_fonts
+from font_download.fonts import FontSource, FontsSources
+
+_CHUNK_TEXTS = 10_000
+
+
+def count_codepoints(texts: Iterable[str], chunk_texts: int = _CHUNK_TEXTS) -> np.ndarray:
+    """Occurrences of every code point in a stream of texts, indexed by code point.
+
+    Texts are consumed in chunks, so the corpus never has to fit in memory.
+    """
+    counts = np.zeros(sys.maxunicode + 1, dtype=np.int64)
+    texts = iter(texts)
+    while chunk := list(islice(texts, chunk_texts)):
+        counts += np.bincount(text_codepoints("".join(chunk)), minlength=len(counts))
+    return counts
+
+
+@dataclass(slots=True)
+class FontSelection:
+    """Result of `select_fonts`: the selected sources, in their original order."""
+
+    sources: list[FontSource]
+    uncovered: str = ""
+    """Characters of the corpus that no font covers."""
+    covered_by: dict[str, int] = field(default_factory=dict)
+    """Number of the corpus' distinct characters each selected font was chosen for."""
+
+    def to_font_config(self):
+        from font_download.config import FontConfig
+
+        return FontConfig(sources=self.sources)
+
+
+def _normalize_sources(sources: FontsSources) -> list[FontSource]:
+    return [FontSource.from_dict(s) if isinstance(s, dict) else s for s in sources]
+
+
+def select_fonts(sources: FontsSources, texts: Iterable[str], min_count: int = 1) -> FontSelection:
+    """Greedily select the fewest sources whose fonts cover every character of `texts`.
+
+    All sources are downloaded to read their coverage. Each step selects the font covering the most
+    still uncovered characters, preferring earlier sources on ties, which is within a logarithmic
+    factor of the optimal set cover.
+
+    Args:
+        sources: Candidate font sources, e.g. `FONTS_NOTO_SANS`
+        texts: The corpus, any iterable of strings
+        min_count: Ignore characters occurring fewer times in the corpus (e.g. noise)
+    """
+    sources = _normalize_sources(sources)
+    index = load_coverage_index(download_fonts(sources))
+
+    counts = count_codepoints(texts)
+    needed = np.flatnonzero((counts >= min_count) & ~ignorable_table())
+
+    # Coverage matrix of (font, needed code point)
+    coverage = np.zeros((len(sources), len(needed)), dtype=bool)
+    for i, source in enumerate(sources):
+        ranges = index.fonts.get(source.name)
+        if ranges is None or len(ranges) == 0:
+            continue
+        range_index = np.searchsorted(ranges[:, 0], needed, side="right") - 1
+        coverage[i] = (range_index >= 0) & (ranges[np.maximum(range_index, 0), 1] >= needed)
+
+    remaining = coverage.any(axis=0)
+    unreachable = needed[~remaining]
+    covered_by = {}
+    while remaining.any():
+        gains = (coverage & remaining).sum(axis=1)
+        best = int(np.argmax(gains))
+        covered_by[sources[best].name] = int(gains[best])
+        remaining &= ~coverage[best]
+
+    return FontSelection(
+        sources=[source for source in sources if source.name in covered_by],
+        uncovered="".join(map(chr, unreachable.tolist())),
+        covered_by=covered_by,
+    )
+
+
+def _read_lines(paths: list[str]) -> Iterable[str]:
+    for path in paths:
+        if path == "-":
+            # Not closed: stdin belongs to the interpreter, and may be read again
+            yield from sys.stdin
+        else:
+            with open(path, encoding="utf-8") as f:
+                yield from f
+
+
+def main() -> int:
+    from font_download.example_fonts.honk import FONTS_HONK
+    from font_download.example_fonts.noto_sans import FONTS_NOTO_SANS, FONTS_NOTO_SANS_BW, FONTS_NOTO_SANS_MINIMAL
+
+    font_sets = {
+        "noto_sans": FONTS_NOTO_SANS,
+        "noto_sans_bw": FONTS_NOTO_SANS_BW,
+        "noto_sans_minimal": FONTS_NOTO_SANS_MINIMAL,
+        "honk": FONTS_HONK,
+    }
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--fonts", choices=list(font_sets), default="noto_sans", help="Candidate font set")
+    parser.add_argument("--corpus", nargs="+", required=True, help="UTF-8 text files ('-' for stdin)")
+    parser.add_argument("--min-count", type=int, default=1, help="Ignore characters seen fewer times")
+    parser.add_argument("--output", type=Path, help="Save the selected FontConfig to this directory")
+    args = parser.parse_args()
+
+    selection = select_fonts(font_sets[args.fonts], _read_lines(args.corpus), min_count=args.min_count)
+
+    for name, count in selection.covered_by.items():
+        print(f"{name}: {count} characters", file=sys.stderr)
+    if selection.uncovered:
+        print(f"{len(selection.uncovered)} characters are not covered: {selection.uncovered[:100]}", file=sys.stderr)
+
+    if args.output is None:
+        print(json.dumps([source.to_dict() for source in selection.sources], indent=2))
+    else:
+        selection.to_font_config().save_pretrained(args.output)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
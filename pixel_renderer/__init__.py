@@ -1,2 +1,28 @@
-from pixel_renderer.processor import PixelRendererProcessor  # noqa: F401
-from pixel_renderer.renderer import *  # noqa: F403
+import importlib
+
+from pixel_renderer.stats import RenderStats, enable_render_stats, get_render_stats, reset_render_stats  # noqa: F401
+
+# Imported on first use: the renderer imports PyGObject and cairo, the processor also imports transformers
+_LAZY_ATTRIBUTES = {
+    "PixelRendererProcessor": "pixel_renderer.processor",
+    "PixelRendererSpec": "pixel_renderer.spec",
+    "bgra_to_rgb": "pixel_renderer.renderer",
+    "cached_font_description": "pixel_renderer.renderer",
+    "dim_to_block_size": "pixel_renderer.renderer",
+    "load_fontset": "pixel_renderer.renderer",
+    "render_signwriting": "pixel_renderer.renderer",
+    "render_text": "pixel_renderer.renderer",
+    "render_text_image": "pixel_renderer.renderer",
+}
+
+
+def __getattr__(name: str):
+    if name not in _LAZY_ATTRIBUTES:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(_LAZY_ATTRIBUTES[name]), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__() -> list[str]:
+    return sorted([*globals(), *_LAZY_ATTRIBUTES])
@@ -1,13 +1,85 @@
 from __future__ import annotations
 
+import asyncio
+import copy
+import logging
 import os
+import threading
+import weakref
+from collections.abc import Iterable
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from functools import partial
+from pathlib import Path
+from time import perf_counter
 
 from transformers import AutoProcessor, ProcessorMixin
 
 from font_configurator.font_configurator import FontConfigurator
 from font_configurator.fontconfig_managers import FontconfigMode
 from font_download import FontConfig
-from pixel_renderer.renderer import render_text, render_text_image
+from font_download.bundle import bundle_fontconfig_cache, resolve_bundle_path
+from font_download.cache_manager import hold_font_dir
+from font_download.coverage import font_files, load_coverage_index
+from font_download.download_fonts import fontconfig_cache_dir, fontconfig_store_cache_dir, uses_font_store
+from font_download.lazy_fonts import LazyFontSet
+from font_download.scripts import sample_text
+from pixel_renderer.renderer import load_fontset, render_text, render_text_image
+from pixel_renderer.spec import PixelRendererSpec
+
+logger = logging.getLogger(__name__)
+
+# (font map, fontconfig path) of every font directory initialized in this process, kept outside the processor,
+# which must stay copyable. A font map of None means the font directory was configured process-wide instead
+# (Pango's default font map).
+_font_maps: dict[os.PathLike, tuple[object, os.PathLike]] = {}
+# Processors initialized in this process, checked without a lock on every render. Copies of a processor
+# (e.g. pickled to a worker) are other objects, so they initialize on their first render too.
+_initialized_processors: weakref.WeakSet[PixelRendererProcessor] = weakref.WeakSet()
+_initialization_lock = threading.Lock()
+# Font maps inherited from the parent process. They are never used, but kept alive: freeing them could take
+# fontconfig locks that were held by parent threads, which do not exist in the child.
+_inherited_font_maps: list[dict] = []
+# Font directories being downloaded in the background, started by `__init__` and awaited on first use
+_font_dir_futures: weakref.WeakKeyDictionary[PixelRendererProcessor, Future] = weakref.WeakKeyDictionary()
+_font_download_executor: ThreadPoolExecutor | None = None
+# Lazy font sets by (core) font directory, whose fonts fetched on demand are added to the font map of the directory
+_lazy_font_sets: dict[os.PathLike, LazyFontSet] = {}
+# Font directories with a font map, held against the garbage collection of the font cache for as long as the
+# process lives. Children inherit the held file descriptors, so they are not held again after a fork.
+_held_font_dirs: dict[os.PathLike, int | None] = {}
+
+
+def _start_font_download(processor: PixelRendererProcessor) -> None:
+    global _font_download_executor
+    with _initialization_lock:
+        if _font_download_executor is None:
+            _font_download_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="pixel-renderer-fonts")
+        _font_dir_futures[processor] = _font_download_executor.submit(processor.font.get_font_dir)
+
+
+def _reset_after_fork() -> None:
+    global _initialization_lock, _font_dir_futures, _font_download_executor
+    _inherited_font_maps.append(dict(_font_maps))
+    _font_maps.clear()
+    # Fetched fonts were registered with the parent's font maps, so they are registered again with the child's
+    _lazy_font_sets.clear()
+    _initialized_processors.clear()
+    _initialization_lock = threading.Lock()
+    # The download threads do not exist in the child, so its processors get their font directories themselves
+    _font_dir_futures = weakref.WeakKeyDictionary()
+    _font_download_executor = None
+
+
+def _wait_for_font_downloads() -> None:
+    # Downloads also build the fontconfig cache, which must not be mid-way (holding fontconfig locks) in a fork
+    wait(list(_font_dir_futures.values()))
+
+
+os.register_at_fork(before=_wait_for_font_downloads, after_in_child=_reset_after_fork)
+
+
+def _register_fonts(font_map, font_paths: list) -> None:
+    FontConfigurator().add_font_files(font_map, font_paths)
 
 
 class PixelRendererProcessor(ProcessorMixin):
@@ -25,10 +97,49 @@ class PixelRendererProcessor(ProcessorMixin):
         # Don't initialize fontconfig here to avoid fork-safety issues
         self._font_dir = None
         self._fontconfig_path = None
-        self._initialized_pid = None  # Track which process initialized fontconfig
 
         if self.font is not None:
-            self._font_dir = font.get_font_dir()
+            # Downloading the fonts can take long, so it runs in the background (e.g. while model weights load)
+            _start_font_download(self)
+
+    @classmethod
+    def from_spec(cls, spec: PixelRendererSpec) -> PixelRendererProcessor:
+        """Rebuilds a processor from its spec, e.g. in a worker, using the font directory of the spec as is."""
+        processor = cls()
+        font_dir = Path(spec.font_dir)
+        processor.font = FontConfig(sources=spec.font_sources(), link_fonts=not uses_font_store(font_dir))
+        processor._font_dir = font_dir
+        return processor
+
+    @property
+    def spec(self) -> PixelRendererSpec:
+        """
+        Picklable spec of this processor, far smaller and faster to unpickle than the processor itself.
+        Waits for the fonts to be downloaded, so that workers rebuilding the processor do not download them.
+        """
+        if self.font is None:
+            raise ValueError("FontConfig must be provided to create a spec.")
+        if self.font.lazy:
+            raise ValueError("A lazy font set has no spec, as its font directory only holds the core fonts.")
+        return PixelRendererSpec.from_font_dir(self._resolve_font_dir())
+
+    def _resolve_font_dir(self) -> os.PathLike:
+        """Font directory of this processor, waiting for its download to finish if it is still running."""
+        if self._font_dir is None:
+            future = _font_dir_futures.pop(self, None)
+            self._font_dir = future.result() if future is not None else self.font.get_font_dir()
+        return self._font_dir
+
+    async def aready(self) -> None:
+        """
+        Waits until the fonts are downloaded, without blocking the event loop:
+        `await asyncio.gather(processor.aready(), load_model())`
+
+        Fontconfig is still initialized on first render, in the process that renders.
+        """
+        future = _font_dir_futures.get(self)
+        if future is not None:
+            await asyncio.wrap_future(future)
 
     def _ensure_fontconfig_initialized(self) -> None:
         """
@@ -51,28 +162,74 @@ class PixelRendererProcessor(ProcessorMixin):
 
         **When fontconfig gets initialized:**
         1. First time render_text() is called (never before)
-        2. After fork (detects PID changed, re-initializes in new process)
+        2. After fork (a fork hook forgets everything initialized in the parent)
 
         See: https://github.com/sign/pixel-renderer/issues/13
         """
+        if self in _initialized_processors:
+            return
+
         if self.font is None:
             raise ValueError("FontConfig must be provided to render text.")
 
-        current_pid = os.getpid()
+        with _initialization_lock:
+            self._resolve_font_dir()
+            # Initialize fontconfig fresh in THIS process, with a font map of its own so that processors
+            # with different fonts can render side by side without reinitializing fontconfig
+            if self._font_dir not in _font_maps:
+                if self._font_dir not in _held_font_dirs:
+                    _held_font_dirs[self._font_dir] = hold_font_dir(self._font_dir)
+                _font_maps[self._font_dir] = self._create_font_map()
+            self._fontconfig_path = _font_maps[self._font_dir][1]
+            if self.font.lazy and self._font_dir not in _lazy_font_sets:
+                font_map = _font_maps[self._font_dir][0]
+                _lazy_font_sets[self._font_dir] = self.font.lazy_font_set(on_fetch=partial(_register_fonts, font_map))
+            _initialized_processors.add(self)
 
-        # Initialize if not in this process yet
-        # Covers: first time (None) or after fork (different PID)
-        if self._initialized_pid != current_pid:
-            # Initialize fontconfig fresh in THIS process
-            font_configurator = FontConfigurator()
-            self._fontconfig_path = font_configurator.setup_font(
+    def _create_font_map(self):
+        font_configurator = FontConfigurator()
+        font_dir, selected_fonts = self._font_dir, None
+        if uses_font_store(font_dir):
+            # The fonts are selected in the font store (or local font directories), whose fontconfig cache is shared
+            # with other font directories
+            selected_fonts = font_files(font_dir).values()
+            cache_dir, cache_alias = fontconfig_store_cache_dir(), None
+        else:
+            # The fonts of a bundle come with their fontconfig cache, valid wherever the bundle is
+            cache_dir, cache_alias = bundle_fontconfig_cache(font_dir) or (fontconfig_cache_dir(font_dir), None)
+        try:
+            # download_fonts writes a fonts.conf describing the same configuration
+            font_map = font_configurator.create_font_map(
+                font_dir,
+                fontconfig_cache_dir=cache_dir,
+                fontconfig_cache_alias=cache_alias,
+                selected_fonts=selected_fonts,
+            )
+            return font_map, self._font_dir / "fonts.conf"
+        except RuntimeError as e:
+            # Fall back to configuring fontconfig for the whole process, used through Pango's default font map
+            logger.warning("Could not create a font map for %s, configuring fontconfig globally: %s", self._font_dir, e)
+            if selected_fonts is not None:
+                fontconfig_path = font_configurator.setup_font(
+                    mode=FontconfigMode.FROM_FILE,
+                    fontconfig_source_path=self._font_dir / "fonts.conf",
+                    force_reinitialize=True,
+                )
+                return None, fontconfig_path
+            fontconfig_path = font_configurator.setup_font(
                 mode=FontconfigMode.TEMPLATE_MINIMAL,
                 font_dir=self._font_dir,
                 fontconfig_destination_dir=self._font_dir,
                 force_reinitialize=True,
+                fontconfig_cache_dir=cache_dir,
             )
-            # Remember we initialized in this process
-            self._initialized_pid = current_pid
+            return None, fontconfig_path
+
+    @property
+    def font_map(self):
+        """Pango font map of this processor's fonts, or None if they are configured process-wide."""
+        self._ensure_fontconfig_initialized()
+        return _font_maps[self._font_dir][0]
 
     @property
     def fontconfig_path(self):
@@ -80,15 +237,98 @@ class PixelRendererProcessor(ProcessorMixin):
         self._ensure_fontconfig_initialized()
         return self._fontconfig_path
 
+    def _font_map_for(self, text: str):
+        """Font map to render `text` with, after fetching the fonts it needs if the font set is lazy."""
+        font_map = self.font_map
+        lazy_font_set = _lazy_font_sets.get(self._font_dir)
+        if lazy_font_set is not None:
+            lazy_font_set.fetch_for(text)
+        return font_map
+
     def render_text(self, text: str, block_size: int = 16, font_size: int = 12):
         """Render text to numpy array."""
-        self._ensure_fontconfig_initialized()
-        return render_text(text, block_size=block_size, font_size=font_size)
+        return render_text(text, block_size=block_size, font_size=font_size, font_map=self._font_map_for(text))
 
     def render_text_image(self, text: str, block_size: int = 16, font_size: int = 12):
         """Render text to PIL Image."""
+        return render_text_image(text, block_size=block_size, font_size=font_size, font_map=self._font_map_for(text))
+
+    def warmup(
+        self,
+        texts: Iterable[str] | None = None,
+        scripts: Iterable[str] | None = None,
+        font_sizes: Iterable[int] = (12,),
+        block_size: int = 16,
+    ) -> float:
+        """
+        Prepares this process for rendering, so that the first renders are as fast as the following ones:
+        initializes fontconfig, loads the fontset of every font size, and renders a sample of text.
+
+        Args:
+            texts: Texts to render, e.g. a sample of the data to render.
+            scripts: Font families (e.g. "NotoSansArabic") to render sample text of.
+                Without texts and scripts, a sample of every font of this processor is rendered.
+            font_sizes: Font sizes that will be rendered.
+            block_size: Block size that will be rendered.
+
+        Returns:
+            float: Warm-up time in seconds, which is also logged.
+        """
+        start = perf_counter()
         self._ensure_fontconfig_initialized()
-        return render_text_image(text, block_size=block_size, font_size=font_size)
+        texts = list(texts) if texts is not None else []
+        if scripts is not None:
+            texts.extend(sample_text(family) for family in scripts)
+        elif not texts:
+            coverage_index = load_coverage_index(self._font_dir)
+            texts.extend(coverage_index.sample_text(font_name) for font_name in coverage_index.fonts)
+
+        font_sizes = tuple(font_sizes)
+        for font_size in font_sizes:
+            load_fontset(font_size, font_map=self.font_map)
+        for text in filter(None, texts):
+            for font_size in font_sizes:
+                self.render_text(text, block_size=block_size, font_size=font_size)
+
+        seconds = perf_counter() - start
+        logger.info("Warmed up %s in %.3fs (%d texts, font sizes %s)", self._font_dir, seconds, len(texts), font_sizes)
+        return seconds
+
+    def worker_init_fn(self, worker_id: int) -> None:
+        """
+        Warms up a DataLoader worker before its first batch, so that startup latency stays out of the training loop:
+        `DataLoader(dataset, num_workers=8, worker_init_fn=processor.worker_init_fn)`
+        """
+        self.warmup()
+
+    def save_pretrained(
+        self,
+        save_directory: str | os.PathLike,
+        push_to_hub: bool = False,
+        bundle_fonts: bool = False,
+        archive: bool = False,
+        **kwargs,
+    ):
+        """
+        Saves the processor. With `bundle_fonts`, its fonts and their fontconfig cache are saved next to it, as
+        a directory or with `archive` a single tar file, so that it renders without downloading or scanning fonts
+        (e.g. on air-gapped machines).
+        """
+        processor = self
+        if bundle_fonts and self.font is not None:
+            processor = copy.copy(self)
+            processor.font = self.font.bundled(save_directory, archive=archive)
+        return super(PixelRendererProcessor, processor).save_pretrained(
+            save_directory, push_to_hub=push_to_hub, **kwargs
+        )
+
+    @classmethod
+    def get_processor_dict(cls, pretrained_model_name_or_path: str | os.PathLike, **kwargs):
+        processor_dict, kwargs = super().get_processor_dict(pretrained_model_name_or_path, **kwargs)
+        font = processor_dict.get("font")
+        if isinstance(font, dict) and font.get("bundle") is not None:
+            font["bundle"] = resolve_bundle_path(font["bundle"], pretrained_model_name_or_path)
+        return processor_dict, kwargs
 
     def to_dict(self, **kwargs):
         output = super().to_dict(**kwargs)
@@ -1,53 +1,87 @@
+import os
+import threading
 from functools import cache
+from time import perf_counter_ns
 
 import cairo
 import gi
 import numpy as np
 from PIL import Image
 from signwriting.formats.swu import is_swu
-from signwriting.visualizer.visualize import signwriting_to_image
-from utf8_tokenizer.control import visualize_control_tokens
+
+from pixel_renderer import stats as _stats
+from pixel_renderer.stats import RenderStats, enable_render_stats, get_render_stats, reset_render_stats  # noqa: F401
 
 gi.require_version("Pango", "1.0")
 gi.require_version("PangoCairo", "1.0")
 gi.require_foreign("cairo")
 from gi.repository import Pango, PangoCairo  # noqa: E402
 
-# Reusable measurement context - avoids creating new surface/context/layout per call
-# This provides ~10% speedup by reusing Pango layout object
-_measurement_context = None
-
-# Reusable rendering surface - avoids creating new surface per call
-# Keyed by block_size (height), provides ~10% additional speedup
-_render_surfaces = {}
+# Per-thread reusable rendering state. Cairo contexts and Pango layouts must not be shared between threads.
+# - measurement_contexts: avoids creating new surface/context/layout per call (~10% speedup),
+#   keyed by font map (None for Pango's default font map)
+# - render_surfaces: reusable surfaces keyed by block_size (height), ~10% additional speedup
+_thread_state = threading.local()
+# The C0 control characters U+0000..U+001F (including tab, newline and carriage return) and DEL (U+007F) as their
+# Control Pictures (e.g. "\n" -> "␊"). The space (U+0020) and every other character are left as is. Same as
+# `utf8_tokenizer.control.visualize_control_tokens(text, include_whitespace=True)`, whose package imports transformers
+_CONTROL_PICTURES = {code: 0x2400 + code for code in range(0x20)} | {0x7F: 0x2421}
 _MAX_RENDER_WIDTH = 1024  # Max width for reusable surface
+# Rendering state inherited from the parent process. It is never used, but kept alive: freeing its Pango
+# layouts could take fontconfig locks that were held by parent threads, which do not exist in the child.
+_inherited_thread_states: list[threading.local] = []
+
+
+def _reset_thread_state_after_fork() -> None:
+    global _thread_state
+    _inherited_thread_states.append(_thread_state)
+    _thread_state = threading.local()
+
+
+# A forked worker must not draw on the Cairo surfaces and Pango layouts copied from its parent
+os.register_at_fork(after_in_child=_reset_thread_state_after_fork)
+
 
+def _get_measurement_layout(font_map: PangoCairo.FontMap | None = None):
+    """Get or create a reusable Pango layout for text measurement with the given font map."""
+    try:
+        measurement_contexts = _thread_state.measurement_contexts
+    except AttributeError:
+        measurement_contexts = _thread_state.measurement_contexts = {}
 
-def _get_measurement_layout():
-    """Get or create a reusable Pango layout for text measurement."""
-    global _measurement_context
-    if _measurement_context is None:
-        temp_surface = cairo.ImageSurface(cairo.FORMAT_RGB24, 1, 1)
-        temp_ctx = cairo.Context(temp_surface)
-        try:
+    measurement_context = measurement_contexts.get(font_map)
+    if measurement_context is not None:
+        return measurement_context[2]
+
+    temp_surface = cairo.ImageSurface(cairo.FORMAT_RGB24, 1, 1)
+    temp_ctx = cairo.Context(temp_surface)
+    try:
+        if font_map is None:
             layout = PangoCairo.create_layout(temp_ctx)
-        except KeyError as e:
-            if "could not find foreign type Context" in str(e):
-                raise RuntimeError(
-                    "Pango/Cairo not properly installed. See https://github.com/sign/WeLT/issues/31"
-                ) from e
-            raise
-        _measurement_context = (temp_surface, temp_ctx, layout)
-    return _measurement_context[2]
+        else:
+            pango_context = font_map.create_context()
+            PangoCairo.update_context(temp_ctx, pango_context)
+            layout = Pango.Layout.new(pango_context)
+    except KeyError as e:
+        if "could not find foreign type Context" in str(e):
+            raise RuntimeError("Pango/Cairo not properly installed. See https://github.com/sign/WeLT/issues/31") from e
+        raise
+    measurement_contexts[font_map] = (temp_surface, temp_ctx, layout)
+    return layout
 
 
 def _get_render_surface(block_size: int):
     """Get or create a reusable rendering surface for the given block size."""
-    if block_size not in _render_surfaces:
+    try:
+        render_surfaces = _thread_state.render_surfaces
+    except AttributeError:
+        render_surfaces = _thread_state.render_surfaces = {}
+
+    if block_size not in render_surfaces:
         surface = cairo.ImageSurface(cairo.FORMAT_RGB24, _MAX_RENDER_WIDTH, block_size)
         context = cairo.Context(surface)
-        _render_surfaces[block_size] = (surface, context)
-    return _render_surfaces[block_size]
+        render_surfaces[block_size] = (surface, context)
+    return render_surfaces[block_size]
 
 
 def dim_to_block_size(value: int, block_size: int) -> int:
@@ -76,6 +110,8 @@ def bgra_to_rgb(bgra: np.ndarray) -> np.ndarray:
 
 
 def render_signwriting(text: str, block_size: int = 16) -> np.ndarray:
+    from signwriting.visualizer.visualize import signwriting_to_image
+
     image = signwriting_to_image(text, trust_box=False)
     width = dim_to_block_size(image.width + 10, block_size=block_size)
     height = dim_to_block_size(image.height + 10, block_size=block_size)
@@ -93,7 +129,15 @@ def cached_font_description(font_name: str, font_size: int) -> Pango.FontDescrip
     return Pango.font_description_from_string(f"{font_name} {font_size}px")
 
 
-def render_text(text: str, block_size: int = 16, font_size: int = 12) -> np.ndarray:
+def load_fontset(font_size: int = 12, font_map: PangoCairo.FontMap | None = None) -> Pango.Fontset:
+    """Loads the fonts `render_text` uses at `font_size` (with `font_map`), so that the first render does not."""
+    context = _get_measurement_layout(font_map).get_context()
+    return context.load_fontset(cached_font_description("sans", font_size), Pango.Language.get_default())
+
+
+def render_text(  # noqa: C901
+    text: str, block_size: int = 16, font_size: int = 12, font_map: PangoCairo.FontMap | None = None
+) -> np.ndarray:
     """
     Renders text in black on white background using PangoCairo.
 
@@ -101,23 +145,38 @@ def render_text(text: str, block_size: int = 16, font_size: int = 12) -> np.ndar
         text (str): The text to render on a single line
         block_size (int): Height of each line in pixels, and width scale (default: 32)
         font_size (int): Font size (default: 12)
+        font_map (PangoCairo.FontMap): Font map to render with (default: Pango's default font map),
+            e.g. from `FontConfigurator.create_font_map`
 
     Returns:
         np.ndarray: Rendered image with text
     """
+    # Per-stage timing is opt-in; when disabled each stage costs a single `is None` check
+    stats = _stats.current_stats()
+    if stats is not None:
+        t_start = t = perf_counter_ns()
+
     if is_swu(text):
-        return render_signwriting(text, block_size=block_size)
+        rendered = render_signwriting(text, block_size=block_size)
+        if stats is not None:
+            stats.lap("signwriting", t)
+            stats.lap("total", t_start)
+        return rendered
 
-    text = visualize_control_tokens(text, include_whitespace=True)
+    text = text.translate(_CONTROL_PICTURES)
+    if stats is not None:
+        t = stats.lap("preprocess", t)
 
     # Get reusable layout for text measurement (avoids creating new surface/context/layout each call)
-    layout = _get_measurement_layout()
+    layout = _get_measurement_layout(font_map)
 
     # Set font and measure text
     font_desc = cached_font_description("sans", font_size)
     layout.set_font_description(font_desc)
     layout.set_text(text, -1)
     text_width, text_height = layout.get_pixel_size()
+    if stats is not None:
+        t = stats.lap("measure", t)
 
     # Add padding and round up to nearest multiple of block_size
     width = dim_to_block_size(text_width + 10, block_size=block_size)
@@ -145,9 +204,13 @@ def render_text(text: str, block_size: int = 16, font_size: int = 12) -> np.ndar
     x = 5  # Small left padding
     y = (line_height - text_height) // 2
     context.move_to(x, y)
+    if stats is not None:
+        t = stats.lap("fill", t)
 
     # Render text
     PangoCairo.show_layout(context, layout)
+    if stats is not None:
+        t = stats.lap("show_layout", t)
 
     # Extract image data as numpy array
     data = surface.get_data()
@@ -155,9 +218,15 @@ def render_text(text: str, block_size: int = 16, font_size: int = 12) -> np.ndar
     # Slice to actual width if using reusable surface
     if surface_width > width:
         bgra = bgra[:, :width, :]
-    return bgra_to_rgb(bgra)
+    rgb = bgra_to_rgb(bgra)
+    if stats is not None:
+        stats.lap("bgra_to_rgb", t)
+        stats.lap("total", t_start)
+    return rgb
 
 
-def render_text_image(text: str, block_size: int = 16, font_size: int = 12) -> Image.Image:
-    img_array = render_text(text, block_size=block_size, font_size=font_size)
+def render_text_image(
+    text: str, block_size: int = 16, font_size: int = 12, font_map: PangoCairo.FontMap | None = None
+) -> Image.Image:
+    img_array = render_text(text, block_size=block_size, font_size=font_size, font_map=font_map)
     return Image.fromarray(img_array)
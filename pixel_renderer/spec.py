@@ -0,0 +1,62 @@
+"""
+Minimal, picklable description of a processor, to send to workers instead of the processor itself.
+
+A pickled `PixelRendererProcessor` carries its whole `FontConfig` (a transformers `PretrainedConfig`
+listing every font URL), a spec only the hash of the font sources and the font directory they were
+downloaded to, which lists them in its `sources.json`. Workers on the same machine (or sharing the
+font cache) rebuild the processor from it without downloading anything:
+`pool.map(partial(render, spec=processor.spec), texts)`, then `spec.to_processor()` in the worker.
+"""
+
+from __future__ import annotations
+
+import json
+from dataclasses import dataclass
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+from font_download.download_fonts import _compute_sources_hash
+from font_download.fonts import FontSource
+
+if TYPE_CHECKING:
+    from pixel_renderer.processor import PixelRendererProcessor
+
+
+@dataclass(frozen=True, slots=True)
+class PixelRendererSpec:
+    """Hash of the font sources (the name of their font directory) and the font directory."""
+
+    sources_hash: str
+    font_dir: str
+
+    @classmethod
+    def from_font_dir(cls, font_dir: str | Path) -> PixelRendererSpec:
+        """Spec of a font directory created by `download_fonts`."""
+        return cls(sources_hash=Path(font_dir).name, font_dir=str(font_dir))
+
+    def __reduce__(self):
+        # Positional arguments only: no field names and no slot state in the pickle
+        return PixelRendererSpec, (self.sources_hash, self.font_dir)
+
+    def font_sources(self) -> list[FontSource]:
+        """
+        Sources listed by the font directory, with all their stored fields (a font's SHA-256 becomes its expected
+        hash), checked against the hash of the spec.
+        Raises FileNotFoundError if the font directory is not complete on this machine.
+        """
+        sources_path = Path(self.font_dir) / "sources.json"
+        if not sources_path.exists():
+            raise FileNotFoundError(
+                f"Font directory {self.font_dir} is not on this machine, send the processor's FontConfig instead."
+            )
+        sources = [FontSource.from_dict(font) for font in json.loads(sources_path.read_text(encoding="utf-8"))]
+        # The spec is about the fonts, whichever way the font directory holds them
+        if self.sources_hash not in {_compute_sources_hash(sources, link_fonts) for link_fonts in (True, False)}:
+            raise ValueError(f"Font directory {self.font_dir} does not hold the fonts {self.sources_hash}.")
+        return sources
+
+    def to_processor(self) -> PixelRendererProcessor:
+        """Rebuilds the processor, reusing the font directory instead of downloading the fonts."""
+        from pixel_renderer.processor import PixelRendererProcessor
+
+        return PixelRendererProcessor.from_spec(self)
@@ -0,0 +1,187 @@
+"""Opt-in per-stage timing for the render hot path.
+
+Timing is disabled by default and costs a single ``is None`` check per stage when off.
+Enable it with ``enable_render_stats()`` or by setting ``PIXEL_RENDERER_STATS=1`` before import.
+
+Statistics are kept per process: a forked child starts from empty counters, so every
+DataLoader worker reports only its own renders. Collect ``get_render_stats()`` from each
+worker and combine them with ``RenderStats.merge``. Within a process, every rendering
+thread records into its own ``RenderStats`` without locking, and ``get_render_stats()``
+merges them.
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+from time import perf_counter_ns
+
+STAGES = ("preprocess", "signwriting", "measure", "fill", "show_layout", "bgra_to_rgb", "total")
+
+# Histogram buckets are log-linear: 4 sub-buckets per power of two (~19% resolution), up to ~9 minutes
+_SUB_BUCKET_BITS = 2
+_NUM_BUCKETS = 38 << _SUB_BUCKET_BITS
+
+
+def _bucket_index(elapsed_ns: int) -> int:
+    bits = elapsed_ns.bit_length()
+    if bits <= _SUB_BUCKET_BITS:
+        return elapsed_ns
+    sub_bucket = (elapsed_ns >> (bits - 1 - _SUB_BUCKET_BITS)) & ((1 << _SUB_BUCKET_BITS) - 1)
+    return min(((bits - _SUB_BUCKET_BITS) << _SUB_BUCKET_BITS) + sub_bucket, _NUM_BUCKETS - 1)
+
+
+def _bucket_upper_bound_ns(index: int) -> int:
+    if index < (1 << _SUB_BUCKET_BITS):
+        return index
+    bits = (index >> _SUB_BUCKET_BITS) + _SUB_BUCKET_BITS
+    sub_bucket = index & ((1 << _SUB_BUCKET_BITS) - 1)
+    return (((1 << _SUB_BUCKET_BITS) + sub_bucket + 1) << (bits - 1 - _SUB_BUCKET_BITS)) - 1
+
+
+class StageStats:
+    """Counter and latency histogram for a single render stage."""
+
+    __slots__ = ("buckets", "count", "max_ns", "total_ns")
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.total_ns = 0
+        self.max_ns = 0
+        self.buckets = [0] * _NUM_BUCKETS
+
+    def record(self, elapsed_ns: int) -> None:
+        self.count += 1
+        self.total_ns += elapsed_ns
+        if elapsed_ns > self.max_ns:
+            self.max_ns = elapsed_ns
+        self.buckets[_bucket_index(elapsed_ns)] += 1
+
+    def merge(self, other: StageStats) -> None:
+        self.count += other.count
+        self.total_ns += other.total_ns
+        self.max_ns = max(self.max_ns, other.max_ns)
+        self.buckets = [a + b for a, b in zip(self.buckets, other.buckets, strict=True)]
+
+    def percentile_ns(self, q: float) -> int:
+        """Upper bound of the histogram bucket containing the q-th percentile (0 <= q <= 100)."""
+        if self.count == 0:
+            return 0
+        rank = max(1, round(self.count * q / 100))
+        seen = 0
+        for index, bucket_count in enumerate(self.buckets):
+            seen += bucket_count
+            if seen >= rank:
+                return min(_bucket_upper_bound_ns(index), self.max_ns)
+        return self.max_ns
+
+    def to_dict(self) -> dict:
+        return {
+            "count": self.count,
+            "total_ms": self.total_ns / 1e6,
+            "mean_us": self.total_ns / self.count / 1e3 if self.count else 0.0,
+            "p50_us": self.percentile_ns(50) / 1e3,
+            "p99_us": self.percentile_ns(99) / 1e3,
+            "max_us": self.max_ns / 1e3,
+            # Sparse histogram: {bucket upper bound in ns: count}
+            "histogram_ns": {
+                _bucket_upper_bound_ns(index): bucket_count
+                for index, bucket_count in enumerate(self.buckets)
+                if bucket_count
+            },
+        }
+
+
+class RenderStats:
+    """Per-stage render counters for one process, mergeable across workers."""
+
+    __slots__ = ("pids", "stages")
+
+    def __init__(self) -> None:
+        self.pids = {os.getpid()}
+        self.stages = {stage: StageStats() for stage in STAGES}
+
+    def lap(self, stage: str, started_ns: int) -> int:
+        """Record the time elapsed since ``started_ns`` under ``stage`` and return the current time."""
+        now = perf_counter_ns()
+        self.stages[stage].record(now - started_ns)
+        return now
+
+    def copy(self) -> RenderStats:
+        return RenderStats.merge([self])
+
+    @classmethod
+    def merge(cls, stats: list[RenderStats]) -> RenderStats:
+        """Combine statistics, e.g. the snapshots collected from every DataLoader worker."""
+        merged = cls()
+        merged.pids = set()
+        for other in stats:
+            merged.pids |= other.pids
+            for stage, stage_stats in other.stages.items():
+                merged.stages[stage].merge(stage_stats)
+        return merged
+
+    def to_dict(self) -> dict:
+        return {
+            "pids": sorted(self.pids),
+            "stages": {stage: stage_stats.to_dict() for stage, stage_stats in self.stages.items()},
+        }
+
+
+# Statistics of every thread that rendered since the last reset, or None when collection is disabled
+_thread_stats: list[RenderStats] | None = [] if os.environ.get("PIXEL_RENDERER_STATS") == "1" else None
+_thread_stats_lock = threading.Lock()
+_local = threading.local()
+
+
+def current_stats() -> RenderStats | None:
+    """Statistics the calling thread records its renders into, or None when collection is disabled."""
+    registry = _thread_stats
+    if registry is None:
+        return None
+    # A reset replaces the registry, so each thread starts over with new counters on its next render
+    if getattr(_local, "registry", None) is not registry:
+        stats = RenderStats()
+        with _thread_stats_lock:
+            registry.append(stats)
+        _local.registry, _local.stats = registry, stats
+    return _local.stats
+
+
+def enable_render_stats(enabled: bool = True) -> None:
+    """Start (or stop) collecting per-stage render statistics in this process."""
+    global _thread_stats
+    with _thread_stats_lock:
+        if not enabled:
+            _thread_stats = None
+        elif _thread_stats is None:
+            _thread_stats = []
+
+
+def get_render_stats() -> RenderStats | None:
+    """Snapshot of this process's render statistics, merged across threads, or None when collection is disabled."""
+    with _thread_stats_lock:
+        if _thread_stats is None:
+            return None
+        merged = RenderStats.merge(_thread_stats)
+    merged.pids.add(os.getpid())
+    return merged
+
+
+def reset_render_stats() -> None:
+    """Clear the collected statistics, keeping collection enabled if it was."""
+    global _thread_stats
+    with _thread_stats_lock:
+        if _thread_stats is not None:
+            _thread_stats = []
+
+
+def _reset_after_fork() -> None:
+    global _thread_stats_lock
+    # The lock may have been held by another thread of the parent at fork time
+    _thread_stats_lock = threading.Lock()
+    reset_render_stats()
+
+
+# A forked worker must not report the renders its parent already counted
+os.register_at_fork(after_in_child=_reset_after_fork)
@@ -32,10 +32,14 @@ class DummyFontconfigManager(BaseFontconfigManager):
         return result_path
 
     def create_fontconfig_from_template(
-        self, font_dir: pathlib.Path, fontconfig_output_dir: pathlib.Path, mode: FontconfigMode
+        self,
+        font_dir: pathlib.Path,
+        fontconfig_output_dir: pathlib.Path,
+        mode: FontconfigMode,
+        cache_dir: pathlib.Path | None = None,
     ) -> pathlib.Path:
         result_path = fontconfig_output_dir.joinpath(f"{mode}.conf")
-        _ = font_dir  # unused in dummy
+        _ = font_dir, cache_dir  # unused in dummy
         return result_path
 
 
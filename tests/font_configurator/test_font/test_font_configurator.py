@@ -10,6 +10,7 @@ from typing import TYPE_CHECKING, Any
 
 import pytest
 
+from font_configurator import font_configurator as font_configurator_module
 from font_configurator.font_configurator import FontConfigurator
 from font_configurator.fontconfig_managers import (
     BaseFontconfigManager,
@@ -218,6 +219,62 @@ class TestFontConfigurator:
         # 2. validate the environment variables were set correctly for the platform
         self.check_env_vars(platform_case, result_path)
 
+    @pytest.mark.usefixtures("mock_platform")
+    @pytest.mark.parametrize("platform_case", PLATFORM_TEST_CASES)
+    def test_setup_font_in_memory(
+        self,
+        platform_case: PlatformTestCase,  # noqa: ARG002
+        tmp_path: pathlib.Path,
+        font_dir: pathlib.Path,
+    ) -> None:
+        """Test that IN_MEMORY mode writes no files and sets no environment variables."""
+        configurator = FontConfigurator()
+        dest_dir = tmp_path.joinpath("output")
+
+        result_path = configurator.setup_font(
+            mode=FontconfigMode.IN_MEMORY,
+            font_dir=font_dir,
+            fontconfig_destination_dir=dest_dir,
+            force_reinitialize=True,
+        )
+
+        assert result_path == font_dir.resolve()
+        assert not dest_dir.exists()
+        assert "FONTCONFIG_FILE" not in os.environ
+        assert "PANGOCAIRO_BACKEND" not in os.environ
+
+    @pytest.mark.usefixtures("mock_platform")
+    @pytest.mark.parametrize("platform_case", PLATFORM_TEST_CASES)
+    def test_setup_font_skips_reinitialization_for_active_config(
+        self,
+        platform_case: PlatformTestCase,  # noqa: ARG002
+        monkeypatch: pytest.MonkeyPatch,
+        tmp_path: pathlib.Path,
+        font_dir: pathlib.Path,
+    ) -> None:
+        """Test that fontconfig is only reinitialized when the configuration actually changes."""
+        monkeypatch.setattr(font_configurator_module, "_active_fontconfig", None)
+        configurator = FontConfigurator()
+        reinitializations = []
+        monkeypatch.setattr(
+            configurator,
+            "_reinitialize_fontconfig_cache",
+            lambda: reinitializations.append(os.environ["FONTCONFIG_FILE"]),
+        )
+        dest_dir = tmp_path.joinpath("output")
+
+        def setup(**kwargs: Any) -> pathlib.Path:
+            return configurator.setup_font(
+                mode=FontconfigMode.TEMPLATE_MINIMAL, font_dir=font_dir, fontconfig_destination_dir=dest_dir, **kwargs
+            )
+
+        first_path = setup()
+        assert setup() == first_path
+        cached_path = setup(fontconfig_cache_dir=tmp_path.joinpath("cache"))
+
+        assert cached_path != first_path
+        assert reinitializations == [str(first_path), str(cached_path)]
+
     @pytest.mark.usefixtures("mock_platform")
     @pytest.mark.parametrize("platform_case", PLATFORM_TEST_CASES)
     @pytest.mark.parametrize(
@@ -247,6 +304,12 @@ class TestFontConfigurator:
                 "requires 'font_dir'",
                 id="template_minimal_missing_font_dir",
             ),
+            pytest.param(
+                FontconfigMode.IN_MEMORY,
+                {"font_dir": None},
+                "requires 'font_dir'",
+                id="in_memory_missing_font_dir",
+            ),
             pytest.param(
                 FontconfigMode.SYSTEM_COPY,
                 {"fontconfig_destination_dir": None},
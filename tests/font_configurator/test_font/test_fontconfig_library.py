@@ -0,0 +1,89 @@
+# Copyright 2025- Pavel Stepachev
+# SPDX-License-Identifier: Apache-2.0
+
+from __future__ import annotations
+
+import ctypes
+from typing import TYPE_CHECKING
+
+import pytest
+
+from font_configurator.fontconfig_library import (
+    FONTCONFIG_LIBRARY_ENV,
+    FONTCONFIG_OPTIONAL_PROTOTYPES,
+    FONTCONFIG_PROTOTYPES,
+    fontconfig_function,
+    load_fontconfig,
+)
+
+if TYPE_CHECKING:
+    import pathlib
+
+
+@pytest.fixture
+def fontconfig_library(monkeypatch: pytest.MonkeyPatch) -> tuple[ctypes.CDLL, str]:
+    """The fontconfig library found on this system, skipping the test if there is none."""
+    monkeypatch.delenv(FONTCONFIG_LIBRARY_ENV, raising=False)
+    try:
+        return load_fontconfig()
+    except RuntimeError:
+        pytest.skip("fontconfig library is not installed")
+
+
+class TestLoadFontconfig:
+    def test_handle_is_cached(self, fontconfig_library: tuple[ctypes.CDLL, str]) -> None:
+        """Test that the library is looked up and loaded once per process."""
+        assert load_fontconfig() is fontconfig_library
+
+    def test_prototypes_are_declared(self, fontconfig_library: tuple[ctypes.CDLL, str]) -> None:
+        """Test that pointers returned by fontconfig are not truncated to C ints."""
+        fontconfig, _ = fontconfig_library
+        for name, (argtypes, restype) in FONTCONFIG_PROTOTYPES.items():
+            assert getattr(fontconfig, name).argtypes == argtypes
+            assert getattr(fontconfig, name).restype == restype
+        for name, (argtypes, restype, _) in FONTCONFIG_OPTIONAL_PROTOTYPES.items():
+            assert fontconfig_function(fontconfig, name).argtypes == argtypes
+            assert fontconfig_function(fontconfig, name).restype == restype
+
+        config = fontconfig.FcConfigCreate()
+        assert config
+        fontconfig.FcConfigDestroy(config)
+
+    def test_environment_variable_override(
+        self, fontconfig_library: tuple[ctypes.CDLL, str], monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        """Test that FONTCONFIG_LIBRARY selects the library without searching for it."""
+        _, lib_path = fontconfig_library
+        monkeypatch.setenv(FONTCONFIG_LIBRARY_ENV, lib_path)
+
+        assert load_fontconfig()[1] == lib_path
+
+    def test_argument_overrides_environment_variable(
+        self, fontconfig_library: tuple[ctypes.CDLL, str], monkeypatch: pytest.MonkeyPatch, tmp_path: pathlib.Path
+    ) -> None:
+        """Test that an explicit library path takes precedence over FONTCONFIG_LIBRARY."""
+        _, lib_path = fontconfig_library
+        monkeypatch.setenv(FONTCONFIG_LIBRARY_ENV, str(tmp_path / "missing.so"))
+
+        assert load_fontconfig(lib_path)[1] == lib_path
+
+    def test_invalid_library_path(self, tmp_path: pathlib.Path) -> None:
+        """Test that a library path that cannot be loaded raises RuntimeError."""
+        with pytest.raises(RuntimeError, match="Could not load the fontconfig C library"):
+            load_fontconfig(tmp_path / "missing.so")
+
+
+class TestFontconfigFunction:
+    def test_missing_optional_function(self) -> None:
+        """Test that a library too old for an optional function fails only when it is used, naming the version."""
+
+        class OldFontconfig:
+            """A fontconfig 2.11.1 library, without the functions added since."""
+
+            def FcGetVersion(self) -> int:  # noqa: N802
+                return 21101
+
+        with pytest.raises(
+            RuntimeError, match=r"fontconfig 2\.11\.1 has no FcConfigParseAndLoadFromMemory.*>= 2\.12\.0"
+        ):
+            fontconfig_function(OldFontconfig(), "FcConfigParseAndLoadFromMemory")
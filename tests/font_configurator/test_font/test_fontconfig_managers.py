@@ -3,6 +3,8 @@
 
 from __future__ import annotations
 
+import re
+from concurrent.futures import ThreadPoolExecutor
 from typing import TYPE_CHECKING
 
 import pytest
@@ -40,6 +42,12 @@ if TYPE_CHECKING:
     from collections.abc import Callable
 
 
+def assert_content_addressed(path: pathlib.Path, output_dir: pathlib.Path, mode: FontconfigMode) -> None:
+    """Generated fontconfig files are named `<mode>-<content hash>.conf`."""
+    assert path.parent == output_dir.resolve()
+    assert re.fullmatch(rf"{mode}-[0-9a-f]{{16}}\.conf", path.name)
+
+
 class TestSupportedPlatforms:
     """Test the SupportedPlatforms enum."""
 
@@ -58,7 +66,8 @@ class TestFontconfigMode:
         assert FontconfigMode.SYSTEM_EXTENDED.value == "system_extended"
         assert FontconfigMode.SYSTEM_ISOLATED.value == "system_isolated"
         assert FontconfigMode.TEMPLATE_MINIMAL.value == "template_minimal"
-        assert len(FontconfigMode) == 5
+        assert FontconfigMode.IN_MEMORY.value == "in_memory"
+        assert len(FontconfigMode) == 6
 
 
 class TestBaseFontconfigManager:
@@ -306,11 +315,59 @@ class TestBaseFontconfigManager:
             fontconfig_destination_dir=dest_dir,
         )
 
-        expected_path = dest_dir.joinpath(FontconfigMode.SYSTEM_COPY).with_suffix(".conf").resolve()
-        assert result == expected_path
+        assert_content_addressed(result, dest_dir, FontconfigMode.SYSTEM_COPY)
         assert result.exists()
         assert result.read_text() == fontconfig_path.read_text()
 
+    def test_identical_configs_are_written_once(
+        self,
+        linux_manager: LinuxFontconfigManager,
+        tmp_path: pathlib.Path,
+        font_dir: pathlib.Path,
+    ) -> None:
+        """Test that generating the same configuration again reuses the existing file."""
+        first_path = linux_manager.create_fontconfig_from_template(
+            font_dir=font_dir, fontconfig_output_dir=tmp_path, mode=FontconfigMode.TEMPLATE_MINIMAL
+        )
+        first_stat = first_path.stat()
+
+        second_path = linux_manager.create_fontconfig_from_template(
+            font_dir=font_dir, fontconfig_output_dir=tmp_path, mode=FontconfigMode.TEMPLATE_MINIMAL
+        )
+
+        assert second_path == first_path
+        assert second_path.stat().st_ino == first_stat.st_ino
+        assert second_path.stat().st_mtime_ns == first_stat.st_mtime_ns
+
+        other_path = linux_manager.create_fontconfig_from_template(
+            font_dir=font_dir,
+            fontconfig_output_dir=tmp_path,
+            mode=FontconfigMode.TEMPLATE_MINIMAL,
+            cache_dir=tmp_path.joinpath("cache"),
+        )
+        assert other_path != first_path
+        assert sorted(path.name for path in tmp_path.iterdir()) == sorted([first_path.name, other_path.name])
+
+    def test_concurrent_config_generation(
+        self,
+        linux_manager: LinuxFontconfigManager,
+        tmp_path: pathlib.Path,
+        font_dir: pathlib.Path,
+    ) -> None:
+        """Test that many workers generating the same configuration at once end up with one complete file."""
+
+        def create_config(_: int) -> pathlib.Path:
+            return linux_manager.create_fontconfig_from_template(
+                font_dir=font_dir, fontconfig_output_dir=tmp_path, mode=FontconfigMode.TEMPLATE_MINIMAL
+            )
+
+        with ThreadPoolExecutor(max_workers=32) as executor:
+            result_paths = set(executor.map(create_config, range(32)))
+
+        assert len(result_paths) == 1
+        assert list(tmp_path.iterdir()) == list(result_paths)  # no leftover temporary files
+        assert etree.parse(str(result_paths.pop())).getroot().tag == "fontconfig"
+
     @pytest.mark.parametrize("test_case", NON_EXISTENT_FONTCONFIG_TEST_CASES, ids=lambda tc: tc.fontconfig_path_fixture)
     def test_copy_fontconfig_file_not_exists(
         self,
@@ -458,10 +515,7 @@ class TestDarwinFontconfigManager:
 
         result_path = darwin_manager.add_font_directory(fontconfig_path=fontconfig_path, font_dir=font_dir)
 
-        expected_path = (
-            fontconfig_path.parent.joinpath(FontconfigMode.SYSTEM_EXTENDED.value).with_suffix(".conf").resolve()
-        )
-        assert result_path == expected_path
+        assert_content_addressed(result_path, fontconfig_path.parent, FontconfigMode.SYSTEM_EXTENDED)
         assert result_path.exists()
         assert result_path.is_file()
 
@@ -504,10 +558,7 @@ class TestDarwinFontconfigManager:
         )
 
         # verify the output file
-        expected_path = (
-            fontconfig_path.parent.joinpath(FontconfigMode.SYSTEM_ISOLATED.value).with_suffix(".conf").resolve()
-        )
-        assert result_path == expected_path
+        assert_content_addressed(result_path, fontconfig_path.parent, FontconfigMode.SYSTEM_ISOLATED)
         assert result_path.exists()
         assert result_path.is_file()
 
@@ -546,8 +597,7 @@ class TestDarwinFontconfigManager:
             font_dir=font_dir, fontconfig_output_dir=output_dir, mode=mode
         )
 
-        expected_path = output_dir.joinpath(mode.value).with_suffix(".conf").resolve()
-        assert result_path == expected_path
+        assert_content_addressed(result_path, output_dir, mode)
         assert result_path.exists()
         assert result_path.is_file()
         assert output_dir.exists()
@@ -560,6 +610,28 @@ class TestDarwinFontconfigManager:
         assert len(dirs) == 1
         assert dirs[0].text == str(font_dir)
 
+    def test_create_fontconfig_from_template_with_cache_dir(
+        self,
+        darwin_manager: DarwinFontconfigManager,
+        tmp_path: pathlib.Path,
+        font_dir: pathlib.Path,
+    ) -> None:
+        """Test that a cache directory is referenced by a <cachedir> element."""
+        cache_dir = tmp_path.joinpath("fontconfig_cache")
+
+        result_path = darwin_manager.create_fontconfig_from_template(
+            font_dir=font_dir,
+            fontconfig_output_dir=tmp_path.joinpath("template_output"),
+            mode=FontconfigMode.TEMPLATE_MINIMAL,
+            cache_dir=cache_dir,
+        )
+
+        tree = etree.parse(str(result_path))
+        cache_dirs = tree.findall(".//cachedir")
+        assert len(cache_dirs) == 1
+        assert cache_dirs[0].text == str(cache_dir.resolve())
+        assert tree.findall(".//dir")[0].text == str(font_dir)
+
     def test_create_fontconfig_from_template_invalid_mode(
         self,
         darwin_manager: DarwinFontconfigManager,
@@ -648,10 +720,7 @@ class TestLinuxFontconfigManager:
 
         result_path = linux_manager.add_font_directory(fontconfig_path=fontconfig_path, font_dir=font_dir)
 
-        expected_path = (
-            fontconfig_path.parent.joinpath(FontconfigMode.SYSTEM_EXTENDED.value).with_suffix(".conf").resolve()
-        )
-        assert result_path == expected_path
+        assert_content_addressed(result_path, fontconfig_path.parent, FontconfigMode.SYSTEM_EXTENDED)
         assert result_path.exists()
         assert result_path.is_file()
 
@@ -694,10 +763,7 @@ class TestLinuxFontconfigManager:
         )
 
         # verify the output file
-        expected_path = (
-            fontconfig_path.parent.joinpath(FontconfigMode.SYSTEM_ISOLATED.value).with_suffix(".conf").resolve()
-        )
-        assert result_path == expected_path
+        assert_content_addressed(result_path, fontconfig_path.parent, FontconfigMode.SYSTEM_ISOLATED)
         assert result_path.exists()
         assert result_path.is_file()
 
@@ -736,8 +802,7 @@ class TestLinuxFontconfigManager:
             font_dir=font_dir, fontconfig_output_dir=output_dir, mode=mode
         )
 
-        expected_path = output_dir.joinpath(mode.value).with_suffix(".conf").resolve()
-        assert result_path == expected_path
+        assert_content_addressed(result_path, output_dir, mode)
         assert result_path.exists()
         assert result_path.is_file()
         assert output_dir.exists()
@@ -750,6 +815,28 @@ class TestLinuxFontconfigManager:
         assert len(dirs) == 1
         assert dirs[0].text == str(font_dir)
 
+    def test_create_fontconfig_from_template_with_cache_dir(
+        self,
+        linux_manager: LinuxFontconfigManager,
+        tmp_path: pathlib.Path,
+        font_dir: pathlib.Path,
+    ) -> None:
+        """Test that a cache directory is referenced by a <cachedir> element."""
+        cache_dir = tmp_path.joinpath("fontconfig_cache")
+
+        result_path = linux_manager.create_fontconfig_from_template(
+            font_dir=font_dir,
+            fontconfig_output_dir=tmp_path.joinpath("template_output"),
+            mode=FontconfigMode.TEMPLATE_MINIMAL,
+            cache_dir=cache_dir,
+        )
+
+        tree = etree.parse(str(result_path))
+        cache_dirs = tree.findall(".//cachedir")
+        assert len(cache_dirs) == 1
+        assert cache_dirs[0].text == str(cache_dir.resolve())
+        assert tree.findall(".//dir")[0].text == str(font_dir)
+
     def test_create_fontconfig_from_template_invalid_mode(
         self,
         linux_manager: LinuxFontconfigManager,
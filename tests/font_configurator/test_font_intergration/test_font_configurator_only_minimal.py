@@ -49,13 +49,14 @@ class TestFontConfiguratorIntegration:
         output_dir.mkdir(parents=True, exist_ok=True)
         assert output_dir.is_dir()
 
-        font_configurator.setup_font(
+        expected_fontconfig_path = font_configurator.setup_font(
             mode=FontconfigMode.TEMPLATE_MINIMAL,
             font_dir=font_dir,
             fontconfig_destination_dir=output_dir,
         )
 
-        expected_fontconfig_path = output_dir.joinpath(f"{FontconfigMode.TEMPLATE_MINIMAL}").with_suffix(".conf")
+        assert expected_fontconfig_path.parent == output_dir.resolve()
+        assert expected_fontconfig_path.name.startswith(f"{FontconfigMode.TEMPLATE_MINIMAL}-")
         assert expected_fontconfig_path.exists()
         assert expected_fontconfig_path.is_file()
 
@@ -80,13 +81,14 @@ class TestFontConfiguratorIntegration:
         output_dir.mkdir(parents=True, exist_ok=True)
         assert output_dir.is_dir()
 
-        font_configurator.setup_font(
+        expected_fontconfig_path = font_configurator.setup_font(
             mode=FontconfigMode.TEMPLATE_MINIMAL,
             font_dir=font_dir,
             fontconfig_destination_dir=output_dir,
         )
 
-        expected_fontconfig_path = output_dir.joinpath(f"{FontconfigMode.TEMPLATE_MINIMAL}").with_suffix(".conf")
+        assert expected_fontconfig_path.parent == output_dir.resolve()
+        assert expected_fontconfig_path.name.startswith(f"{FontconfigMode.TEMPLATE_MINIMAL}-")
         assert expected_fontconfig_path.exists()
         assert expected_fontconfig_path.is_file()
 
@@ -135,3 +137,42 @@ class TestFontConfiguratorIntegration:
             f"Expected unknown glyphs count to be {test_case.expected_op.__name__} "
             f"{test_case.unknown_glyphs_count}, but got {unknown_glyphs_count}"
         )
+
+    @pytest.mark.parametrize("test_case", FONT_CONFIGURATOR_ONLY_MINIMAL_TEST_CASES, ids=lambda tc: tc.test_name)
+    def test_rendering_with_in_memory_fontconfig(
+        self,
+        test_case: FontConfiguratorOnlyMinimalTestCase,
+        monkeypatch: pytest.MonkeyPatch,
+        font_dir_factory: Callable[[str], pathlib.Path],
+    ) -> None:
+        """Tests rendering text with an in-memory fontconfig, without any configuration file."""
+        monkeypatch.delenv("FONTCONFIG_FILE", raising=False)
+        font_dir = font_dir_factory(test_case.font_file_name)
+
+        result_path = FontConfigurator().setup_font(mode=FontconfigMode.IN_MEMORY, font_dir=font_dir)
+
+        assert result_path == font_dir.resolve()
+        assert "FONTCONFIG_FILE" not in os.environ
+        assert not list(font_dir.glob("*.conf"))
+
+        font_map = PangoCairo.FontMap.get_default()
+        font_family_names = [family.get_name() for family in font_map.list_families()]
+        assert test_case.font_family in font_family_names, (
+            f"Font family '{test_case.font_family}' not found in available families: {font_family_names}"
+        )
+
+        cairo_surface = cairo.ImageSurface(cairo.Format.RGB24, 1024, 768)
+        cairo_context = cairo.Context(cairo_surface)
+        pango_layout = PangoCairo.create_layout(cairo_context)
+        pango_layout.set_text(test_case.text_to_render, -1)
+        font_description = Pango.FontDescription()
+        font_description.set_family(test_case.font_family)
+        font_description.set_size(18 * Pango.SCALE)
+        pango_layout.set_font_description(font_description)
+        PangoCairo.show_layout(cairo_context, pango_layout)
+
+        unknown_glyphs_count = pango_layout.get_unknown_glyphs_count()
+        assert test_case.expected_op(unknown_glyphs_count, test_case.unknown_glyphs_count), (
+            f"Expected unknown glyphs count to be {test_case.expected_op.__name__} "
+            f"{test_case.unknown_glyphs_count}, but got {unknown_glyphs_count}"
+        )
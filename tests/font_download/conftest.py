@@ -1,6 +1,13 @@
 """Shared fixtures for font_download tests."""
 
+import functools
+import hashlib
 import pathlib
+import threading
+import time
+from collections import Counter, defaultdict
+from collections.abc import Callable
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
 from unittest.mock import patch
 
 import pytest
@@ -25,16 +32,47 @@ def temp_cache_dir(tmp_path):
     return cache_dir
 
 
+class FakeDownloader:
+    """Stand-in for FontDownloader, "downloading" `content(url)` for every URL."""
+
+    def __init__(self, content: Callable[[str], bytes]) -> None:
+        self.content = content
+
+    def download(self, url: str, path) -> str:
+        content = self.content(url)
+        pathlib.Path(path).write_bytes(content)
+        return hashlib.sha256(content).hexdigest()
+
+
 @pytest.fixture
 def mock_download_setup(temp_cache_dir):
-    """Mock urlretrieve and set temporary cache directory."""
+    """Mock the downloader and set temporary cache directory."""
+    # Fake font content, unique to the URL
+    downloader = FakeDownloader(lambda url: f"font-content-{url}".encode())
+
+    with (
+        patch("font_download.download_fonts.default_downloader", return_value=downloader),
+        patch("font_download.download_fonts.FONT_DOWNLOAD_CACHE_DIR", temp_cache_dir),
+    ):
+        yield temp_cache_dir
+
+
+ASSET_FONTS_DIR = pathlib.Path(__file__).parent.parent / "font_configurator" / "test_assets" / "fonts"
+
+ASSET_FONT_SOURCES = [
+    FontSource(url="https://example.com/fonts/Honk-Regular-VariableFont_MORF,SHLN.ttf"),
+    FontSource(url="https://example.com/fonts/NotoSansCuneiform-Regular.ttf"),
+]
 
-    def fake_urlretrieve(url, filename):
-        # Create fake font file with unique content based on URL
-        pathlib.Path(filename).write_bytes(f"font-content-{url}".encode())
+
+@pytest.fixture
+def asset_fonts_download_setup(temp_cache_dir):
+    """Like mock_download_setup, but "downloads" the real fonts from the test assets by name."""
+
+    downloader = FakeDownloader(lambda url: (ASSET_FONTS_DIR / FontSource(url=url).name).read_bytes())
 
     with (
-        patch("font_download.download_fonts.urlretrieve", fake_urlretrieve),
+        patch("font_download.download_fonts.default_downloader", return_value=downloader),
         patch("font_download.download_fonts.FONT_DOWNLOAD_CACHE_DIR", temp_cache_dir),
     ):
         yield temp_cache_dir
@@ -46,3 +84,102 @@ def mock_processor_setup(mock_download_setup):
     # Mock FontConfigurator - it's not imported in processor.py anymore based on user's changes
     # So we don't need to mock it
     return mock_download_setup
+
+
+class FontServerHandler(SimpleHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive
+    etag = None
+
+    def setup(self):
+        super().setup()
+        with self.server.lock:
+            self.server.connections += 1
+
+    def do_GET(self):
+        server = self.server
+        self.etag = None
+        with server.lock:
+            server.requests[self.path] += 1
+            server.in_flight += 1
+            server.max_in_flight = max(server.max_in_flight, server.in_flight)
+            failure = server.failures[self.path].pop(0) if server.failures[self.path] else None
+        try:
+            time.sleep(server.delay)
+            if failure == "truncate":
+                # Promise more than is sent, then drop the connection
+                self.send_response(200)
+                self.send_header("Content-Length", "1000")
+                self.end_headers()
+                self.wfile.write(b"truncated")
+                self.close_connection = True
+            elif failure is not None:
+                self.send_error(failure)
+            else:
+                super().do_GET()
+        finally:
+            with server.lock:
+                server.in_flight -= 1
+
+    def send_head(self):
+        # Answers If-None-Match with the ETag of the content, before the base class answers If-Modified-Since
+        path = pathlib.Path(self.translate_path(self.path))
+        if self.server.etags and path.is_file():
+            self.etag = f'"{hashlib.sha256(path.read_bytes()).hexdigest()[:16]}"'
+            if self.headers.get("If-None-Match") == self.etag:
+                self.send_response(304)
+                self.end_headers()
+                return None
+        return super().send_head()
+
+    def send_response(self, code, message=None):
+        with self.server.lock:
+            self.server.statuses[code] += 1
+        super().send_response(code, message)
+
+    def end_headers(self):
+        if self.etag is not None:
+            self.send_header("ETag", self.etag)
+        super().end_headers()
+
+    def log_message(self, format, *args):  # noqa: A002
+        pass
+
+
+class FontServer(ThreadingHTTPServer):
+    """Local HTTP stand-in for a font host, recording requests, responses and connections, with scripted failures.
+
+    Files are served with their modification time as Last-Modified and, unless `etags` is False, an ETag,
+    and conditional requests are answered with 304 Not Modified.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, directory: pathlib.Path) -> None:
+        super().__init__(("127.0.0.1", 0), functools.partial(FontServerHandler, directory=directory))
+        self.url = f"http://127.0.0.1:{self.server_port}"
+        self.lock = threading.Lock()
+        self.requests = Counter()
+        self.statuses = Counter()
+        self.etags = True
+        self.connections = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        # path: statuses (or "truncate") to answer its next requests with
+        self.failures = defaultdict(list)
+        self.delay = 0.0
+
+
+@pytest.fixture
+def font_server(tmp_path):
+    """Local font server, serving font0.ttf, font1.ttf and font2.ttf."""
+    served_dir = tmp_path / "served"
+    served_dir.mkdir()
+    for index in range(3):
+        (served_dir / f"font{index}.ttf").write_bytes(f"font {index}".encode() * 1000)
+
+    server = FontServer(served_dir)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
@@ -0,0 +1,158 @@
+"""Tests for font_download.bundle module."""
+
+import json
+import shutil
+from unittest.mock import patch
+
+import pytest
+
+from font_download import FontConfig, download_fonts
+from font_download.bundle import (
+    BUNDLE_INFO_FILE,
+    _build_fontconfig_cache,
+    bundle_fontconfig_cache,
+    export_font_bundle,
+    load_font_bundle,
+)
+from font_download.config import FONT_BUNDLE_ARCHIVE_NAME, FONT_BUNDLE_NAME
+from tests.font_download.conftest import ASSET_FONT_SOURCES
+
+
+def fontconfig_cache_files(font_dir):
+    """Modification times of the fontconfig cache files of a bundle's font directory, to tell if it was rebuilt."""
+    cache_dir, _ = bundle_fontconfig_cache(font_dir)
+    return {path.name: path.stat().st_mtime_ns for path in cache_dir.iterdir() if ".cache-" in path.name}
+
+
+def rescan_fonts(font_dir):
+    """Load the fonts of a bundle's font directory, the way processors do, which rebuilds an invalid cache."""
+    cache_dir, cache_alias = bundle_fontconfig_cache(font_dir)
+    assert _build_fontconfig_cache(font_dir, cache_dir, cache_alias)
+
+
+@pytest.fixture
+def font_dir(asset_fonts_download_setup):
+    return download_fonts(ASSET_FONT_SOURCES)
+
+
+class TestExportFontBundle:
+    def test_bundle_layout(self, font_dir, tmp_path):
+        bundle_dir = export_font_bundle(font_dir, tmp_path / "bundle")
+
+        bundled_font_dir = bundle_dir / "config" / font_dir.name
+        assert json.loads((bundle_dir / BUNDLE_INFO_FILE).read_text()) == {"sources_hash": font_dir.name}
+        for source in ASSET_FONT_SOURCES:
+            font_path = bundled_font_dir / source.name
+            assert not font_path.is_symlink()
+            assert font_path.read_bytes() == (font_dir / source.name).read_bytes()
+        assert (bundled_font_dir / "sources.json").read_text() == (font_dir / "sources.json").read_text()
+        assert (bundled_font_dir / "coverage.json").exists()
+        assert '<dir prefix="relative">.</dir>' in (bundled_font_dir / "fonts.conf").read_text()
+        assert fontconfig_cache_files(bundled_font_dir)
+
+    def test_bundle_of_fonts_selected_in_store(self, asset_fonts_download_setup, tmp_path):
+        font_dir = download_fonts(ASSET_FONT_SOURCES, link_fonts=False)
+
+        bundled_font_dir = load_font_bundle(export_font_bundle(font_dir, tmp_path / "bundle"))
+
+        assert not (bundled_font_dir / "selected_fonts.json").exists()
+        for source in ASSET_FONT_SOURCES:
+            font_path = bundled_font_dir / source.name
+            assert font_path.is_file()
+            assert not font_path.is_symlink()
+        assert fontconfig_cache_files(bundled_font_dir)
+
+    def test_moved_bundle_uses_its_fontconfig_cache(self, font_dir, tmp_path):
+        """Test that the fontconfig cache is valid at another path, as long as modification times are kept."""
+        export_font_bundle(font_dir, tmp_path / "bundle")
+        shutil.copytree(tmp_path / "bundle", tmp_path / "moved", symlinks=True)
+        moved_font_dir = load_font_bundle(tmp_path / "moved")
+        cache_files = fontconfig_cache_files(moved_font_dir)
+
+        rescan_fonts(moved_font_dir)
+
+        assert moved_font_dir == tmp_path / "moved" / "config" / font_dir.name
+        assert fontconfig_cache_files(moved_font_dir) == cache_files
+
+    def test_archive_is_extracted_once(self, font_dir, tmp_path):
+        archive_path = export_font_bundle(font_dir, tmp_path / "fonts.tar", archive=True)
+        shutil.rmtree(font_dir)
+
+        extracted_font_dir = load_font_bundle(archive_path)
+        cache_files = fontconfig_cache_files(extracted_font_dir)
+        rescan_fonts(extracted_font_dir)
+
+        assert archive_path.is_file()
+        assert extracted_font_dir.name == font_dir.name
+        assert (extracted_font_dir / ASSET_FONT_SOURCES[0].name).is_file()
+        assert fontconfig_cache_files(extracted_font_dir) == cache_files
+        with patch("tarfile.TarFile.extractall", side_effect=AssertionError("extracted again")):
+            assert load_font_bundle(archive_path) == extracted_font_dir
+
+    def test_export_replaces_a_bundle(self, font_dir, tmp_path):
+        export_font_bundle(font_dir, tmp_path / "bundle")
+        (tmp_path / "bundle" / "stale").write_text("")
+
+        export_font_bundle(font_dir, tmp_path / "bundle")
+
+        assert not (tmp_path / "bundle" / "stale").exists()
+
+    def test_export_refuses_other_directories(self, font_dir, tmp_path):
+        (tmp_path / "other").mkdir()
+        (tmp_path / "other" / "file").write_text("")
+
+        with pytest.raises(FileExistsError):
+            export_font_bundle(font_dir, tmp_path / "other")
+
+    def test_export_into_its_own_bundle(self, font_dir, tmp_path):
+        bundled_font_dir = load_font_bundle(export_font_bundle(font_dir, tmp_path / "bundle"))
+
+        with pytest.raises(ValueError, match="loaded from"):
+            export_font_bundle(bundled_font_dir, tmp_path / "bundle")
+
+
+class TestLoadFontBundle:
+    def test_missing_bundle(self, tmp_path):
+        with pytest.raises(FileNotFoundError):
+            load_font_bundle(tmp_path / "missing")
+
+    def test_not_a_bundle(self, tmp_path):
+        with pytest.raises(ValueError, match="not a font bundle"):
+            load_font_bundle(tmp_path)
+
+    def test_download_fonts_directory_is_not_a_bundle(self, font_dir):
+        assert bundle_fontconfig_cache(font_dir) is None
+
+
+class TestFontConfigBundle:
+    @pytest.mark.parametrize("archive", [False, True])
+    def test_saved_bundle_loads_without_downloading(self, asset_fonts_download_setup, tmp_path, archive):
+        config = FontConfig(sources=ASSET_FONT_SOURCES)
+        config.save_pretrained(tmp_path / "saved", bundle_fonts=True, archive=archive)
+        shutil.copytree(tmp_path / "saved", tmp_path / "node", symlinks=True)
+        shutil.rmtree(tmp_path / "saved")
+
+        with patch("font_download.config.download_fonts", side_effect=AssertionError("fonts downloaded")):
+            loaded = FontConfig.from_pretrained(tmp_path / "node")
+            font_dir = loaded.get_font_dir()
+            coverage = loaded.coverage("Hello 𒀀")
+
+        bundle_name = FONT_BUNDLE_ARCHIVE_NAME if archive else FONT_BUNDLE_NAME
+        assert json.loads((tmp_path / "node" / "config.json").read_text())["bundle"] == bundle_name
+        assert loaded.bundle == str(tmp_path / "node" / bundle_name)
+        assert {path.name for path in font_dir.glob("*.ttf")} == {source.name for source in ASSET_FONT_SOURCES}
+        assert coverage.is_renderable
+        # Saved again without bundling, the configuration keeps loading its fonts from the bundle
+        loaded.save_pretrained(tmp_path / "plain")
+        saved_bundle = json.loads((tmp_path / "plain" / "config.json").read_text())["bundle"]
+        assert saved_bundle == str(tmp_path / "node" / bundle_name)
+
+    def test_lazy_config_bundles_all_fonts(self, asset_fonts_download_setup, tmp_path):
+        config = FontConfig(sources=ASSET_FONT_SOURCES, lazy=True, core_families=["Honk"])
+
+        bundled = config.bundled(tmp_path)
+
+        assert not bundled.lazy
+        assert len(list(load_font_bundle(tmp_path / FONT_BUNDLE_NAME).glob("*.ttf"))) == len(ASSET_FONT_SOURCES)
+        assert config.lazy
+        assert config.bundle is None
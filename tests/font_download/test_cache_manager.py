@@ -0,0 +1,272 @@
+"""Tests for font_download.cache_manager module."""
+
+import hashlib
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+
+import pytest
+
+from font_download import download_fonts
+from font_download.bundle import export_font_bundle, load_font_bundle
+from font_download.cache_manager import cache_usage, collect_garbage, hold_font_dir, main, parse_size
+from font_download.download_fonts import (
+    LAST_USED_FILE,
+    _gc_lock,
+    _hash_index,
+    fetch_fonts,
+    fontconfig_cache_dir,
+    fontconfig_store_cache_dir,
+)
+from font_download.fonts import FontSource
+
+FONT_A, FONT_B, FONT_C = (FontSource(url=f"https://example.com/fonts/font_{name}.ttf") for name in "abc")
+
+
+def font_bytes(source):
+    """Size of a font "downloaded" by mock_download_setup."""
+    return len(f"font-content-{source.url}".encode())
+
+
+def font_sha256(source):
+    return hashlib.sha256(f"font-content-{source.url}".encode()).hexdigest()
+
+
+def url_records(cache_dir):
+    return [path for path in (cache_dir / "fonts" / "urls").iterdir() if path.suffix != ".lock"]
+
+
+def set_last_used(config_dir, seconds_ago):
+    last_used = time.time() - seconds_ago
+    os.utime(config_dir / LAST_USED_FILE, (last_used, last_used))
+
+
+def age_fonts(cache_dir, seconds_ago):
+    stored = time.time() - seconds_ago
+    for object_path in (cache_dir / "fonts" / "objects").iterdir():
+        os.utime(object_path, (stored, stored))
+
+
+class TestRecordUse:
+    def test_download_fonts_records_last_use(self, mock_download_setup):
+        config_dir = download_fonts([FONT_A])
+        set_last_used(config_dir, 1000)
+        directory_mtime = config_dir.stat().st_mtime_ns
+
+        assert download_fonts([FONT_A]) == config_dir
+
+        assert time.time() - (config_dir / LAST_USED_FILE).stat().st_mtime < 100
+        # The fontconfig cache, checked against the directory, stays valid
+        assert config_dir.stat().st_mtime_ns == directory_mtime
+
+
+class TestCacheUsage:
+    def test_usage_per_config_and_font(self, mock_download_setup):
+        config_ab = download_fonts([FONT_A, FONT_B])
+        config_bc = download_fonts([FONT_B, FONT_C])
+
+        usage = cache_usage()
+
+        assert [config.path for config in usage.configs] == sorted([config_ab, config_bc])
+        fonts = {font.sha256: font for font in usage.fonts}
+        assert len(fonts) == 3
+        shared = next(font for font in usage.fonts if len(font.used_by) == 2)
+        assert shared.bytes == font_bytes(FONT_B)
+        assert sorted(shared.used_by) == sorted([config_ab.name, config_bc.name])
+        for config in usage.configs:
+            assert config.fontconfig_cache == fontconfig_cache_dir(config.path)
+            assert config.bytes > 0
+            assert len(config.fonts) == 2
+        assert usage.summary()["font_bytes"] == sum(font_bytes(source) for source in (FONT_A, FONT_B, FONT_C))
+        assert usage.summary()["unused_fonts"] == 0
+
+    def test_config_selecting_fonts_in_store(self, mock_download_setup):
+        config_dir = download_fonts([FONT_A, FONT_B], link_fonts=False)
+        set_last_used(config_dir, 7200)
+
+        [config] = cache_usage().configs
+        result = collect_garbage(max_bytes=0)
+
+        assert sorted(config.fonts) == sorted([font_sha256(FONT_A), font_sha256(FONT_B)])
+        assert config.fontconfig_cache is None
+        assert result.evicted_configs == [config_dir]
+        assert len(result.evicted_fonts) == 2
+        # Shared with the other config directories selecting fonts in the store
+        assert fontconfig_store_cache_dir().exists()
+
+    def test_empty_cache(self, mock_download_setup):
+        usage = cache_usage()
+
+        assert usage.configs == []
+        assert usage.fonts == []
+        assert usage.total_bytes == 0
+
+
+class TestCollectGarbage:
+    def test_unused_fonts_are_evicted_first(self, mock_download_setup):
+        config_dir = download_fonts([FONT_A, FONT_B])
+        [unused_path] = fetch_fonts([FONT_C])
+        age_fonts(mock_download_setup, 7200)
+        set_last_used(config_dir, 7200)
+        total_bytes = cache_usage().total_bytes
+
+        result = collect_garbage(max_bytes=total_bytes - 1)
+
+        assert result.evicted_fonts == [unused_path]
+        assert result.evicted_configs == []
+        assert result.bytes_after <= total_bytes - 1
+        assert not unused_path.exists()
+        assert (config_dir / "sources.json").exists()
+        assert len(url_records(mock_download_setup)) == 2
+        assert str(unused_path) not in json.loads((mock_download_setup / "fonts" / "hash_index.json").read_text())
+
+    def test_least_recently_used_config_is_evicted_with_its_fonts(self, mock_download_setup):
+        config_ab = download_fonts([FONT_A, FONT_B])
+        config_bc = download_fonts([FONT_B, FONT_C])
+        age_fonts(mock_download_setup, 7200)
+        set_last_used(config_ab, 7200)
+        set_last_used(config_bc, 3600 * 1.5)
+
+        result = collect_garbage(max_bytes=cache_usage().total_bytes - 1)
+
+        assert result.evicted_configs == [config_ab]
+        assert [path.name for path in result.evicted_fonts] == [font_sha256(FONT_A)]
+        assert not config_ab.exists()
+        assert not fontconfig_cache_dir(config_ab).exists()
+        assert (config_bc / "sources.json").exists()
+        assert all((config_bc / source.name).resolve().exists() for source in (FONT_B, FONT_C))
+
+        # The evicted config directory is created again on next use
+        assert download_fonts([FONT_A, FONT_B]) == config_ab
+        assert (config_ab / "sources.json").exists()
+
+    def test_recently_used_configs_and_fonts_are_kept(self, mock_download_setup):
+        config_dir = download_fonts([FONT_A])
+        fetch_fonts([FONT_B])
+
+        result = collect_garbage(max_bytes=0)
+
+        assert result.evicted_configs == []
+        assert result.evicted_fonts == []
+        assert (config_dir / "sources.json").exists()
+
+    def test_held_config_is_kept(self, mock_download_setup):
+        """Test that a config directory a process renders with is not evicted, however long ago it was used."""
+        held_dir = download_fonts([FONT_A])
+        other_dir = download_fonts([FONT_B])
+        age_fonts(mock_download_setup, 7200)
+        set_last_used(held_dir, 7200)
+        set_last_used(other_dir, 7200)
+
+        fd = hold_font_dir(held_dir)
+        try:
+            result = collect_garbage(max_bytes=0)
+        finally:
+            os.close(fd)
+
+        assert result.evicted_configs == [other_dir]
+        assert [path.name for path in result.evicted_fonts] == [font_sha256(FONT_B)]
+        assert (held_dir / "sources.json").exists()
+        assert collect_garbage(max_bytes=0).evicted_configs == [held_dir]
+
+    def test_fonts_fetched_for_config_are_used_by_it(self, mock_download_setup):
+        config_dir = download_fonts([FONT_A])
+        [fetched_path] = fetch_fonts([FONT_B], used_by=config_dir)
+        age_fonts(mock_download_setup, 7200)
+
+        usage = cache_usage()
+        result = collect_garbage(max_bytes=0)
+
+        assert sorted(usage.configs[0].fonts) == sorted([font_sha256(FONT_A), font_sha256(FONT_B)])
+        assert result.evicted_fonts == []
+        assert fetched_path.exists()
+
+    def test_dry_run(self, mock_download_setup):
+        config_dir = download_fonts([FONT_A])
+        set_last_used(config_dir, 7200)
+
+        result = collect_garbage(max_bytes=0, dry_run=True)
+
+        assert result.evicted_configs == [config_dir]
+        assert [path.name for path in result.evicted_fonts] == [font_sha256(FONT_A)]
+        assert result.bytes_after < result.bytes_before == cache_usage().total_bytes
+        assert (config_dir / "sources.json").exists()
+        assert all(path.exists() for path in result.evicted_fonts)
+
+    def test_waits_for_downloads_in_progress(self, mock_download_setup):
+        """Test that the cache is not collected while fonts or config directories are being created."""
+        config_dir = download_fonts([FONT_A])
+        set_last_used(config_dir, 7200)
+
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            with _gc_lock(shared=True):
+                future = executor.submit(collect_garbage, max_bytes=0)
+                time.sleep(0.2)
+                assert not future.done()
+                assert config_dir.exists()
+            assert future.result(timeout=10).evicted_configs == [config_dir]
+
+    def test_hash_index_of_this_process_forgets_evicted_fonts(self, mock_download_setup):
+        config_dir = download_fonts([FONT_A])
+        set_last_used(config_dir, 7200)
+
+        result = collect_garbage(max_bytes=0, min_age=0)
+
+        hash_index = _hash_index(mock_download_setup / "fonts")
+        assert str(result.evicted_fonts[0]) not in hash_index._loaded_entries()
+
+
+class TestHoldFontDir:
+    def test_held_in_cache(self, mock_download_setup):
+        config_dir = download_fonts([FONT_A])
+
+        fd = hold_font_dir(config_dir)
+
+        assert fd is not None
+        os.close(fd)
+
+    def test_read_only_cache(self, mock_download_setup):
+        """Test that a processor can render from a cache it cannot lock, only without protecting it."""
+        config_dir = download_fonts([FONT_A])
+
+        with patch("font_download.cache_manager._gc_lock", side_effect=PermissionError("read-only file system")):
+            assert hold_font_dir(config_dir) is None
+
+    def test_bundle_outside_unwritable_cache(self, mock_download_setup, tmp_path):
+        bundled_font_dir = load_font_bundle(export_font_bundle(download_fonts([FONT_A]), tmp_path / "bundle"))
+        (tmp_path / "file").touch()
+
+        # As FONT_DOWNLOAD_CACHE_DIR=/dev/null/font_download, on a node whose cache cannot be created
+        with patch("font_download.download_fonts.FONT_DOWNLOAD_CACHE_DIR", tmp_path / "file" / "font_download"):
+            assert hold_font_dir(bundled_font_dir) is None
+
+
+class TestCLI:
+    @pytest.mark.parametrize(
+        ("size", "expected"), [("1024", 1024), ("2K", 2048), ("1.5M", 1536 * 1024), ("2GiB", 2 << 30)]
+    )
+    def test_parse_size(self, size, expected):
+        assert parse_size(size) == expected
+
+    def test_usage_json(self, mock_download_setup, monkeypatch, capsys):
+        download_fonts([FONT_A])
+        monkeypatch.setattr(sys, "argv", ["cache_manager", "usage", "--json"])
+
+        assert main() == 0
+
+        usage = json.loads(capsys.readouterr().out)
+        assert usage["summary"]["configs"] == 1
+        assert usage["fonts"][0]["bytes"] == font_bytes(FONT_A)
+
+    def test_gc(self, mock_download_setup, monkeypatch, capsys):
+        config_dir = download_fonts([FONT_A])
+        set_last_used(config_dir, 7200)
+        monkeypatch.setattr(sys, "argv", ["cache_manager", "gc", "--max-bytes", "0"])
+
+        assert main() == 0
+
+        assert f"Evicted {config_dir}" in capsys.readouterr().out
+        assert not config_dir.exists()
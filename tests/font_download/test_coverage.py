@@ -0,0 +1,165 @@
+"""Tests for font_download.coverage module."""
+
+import json
+import shutil
+from unittest.mock import patch
+
+import numpy as np
+import pytest
+
+from font_download import FontConfig
+from font_download.coverage import (
+    COVERAGE_FILE_NAME,
+    CoverageIndex,
+    _merge_ranges,
+    build_coverage_index,
+    load_coverage_index,
+    read_font_coverage,
+)
+from tests.font_download.conftest import ASSET_FONT_SOURCES, ASSET_FONTS_DIR
+
+HONK = ASSET_FONTS_DIR / "Honk-Regular-VariableFont_MORF,SHLN.ttf"
+CUNEIFORM = ASSET_FONTS_DIR / "NotoSansCuneiform-Regular.ttf"
+
+
+@pytest.fixture
+def font_dir(tmp_path):
+    for font in (HONK, CUNEIFORM):
+        shutil.copy(font, tmp_path / font.name)
+    (tmp_path / "broken.ttf").write_bytes(b"not a font")
+    build_coverage_index(tmp_path)
+    return tmp_path
+
+
+class TestMergeRanges:
+    def test_merges_overlapping_and_adjacent(self):
+        ranges = np.array([[10, 12], [0, 3], [4, 5], [11, 20], [30, 30]])
+
+        assert _merge_ranges(ranges).tolist() == [[0, 5], [10, 20], [30, 30]]
+
+    def test_empty(self):
+        assert _merge_ranges(np.empty((0, 2), dtype=np.int64)).shape == (0, 2)
+
+
+class TestReadFontCoverage:
+    def test_cuneiform(self):
+        ranges = read_font_coverage(CUNEIFORM)
+
+        assert (ranges[:, 0] <= ranges[:, 1]).all()
+        assert (ranges[1:, 0] > ranges[:-1, 1] + 1).all()
+        covered = {codepoint for start, end in ranges for codepoint in range(start, end + 1)}
+        assert ord("𒀀") in covered
+        assert ord("A") in covered
+
+    def test_honk_has_no_cuneiform(self):
+        ranges = read_font_coverage(HONK)
+
+        covered = {codepoint for start, end in ranges for codepoint in range(start, end + 1)}
+        assert ord("A") in covered
+        assert ord("𒀀") not in covered
+
+    def test_not_a_font(self, tmp_path):
+        path = tmp_path / "font.ttf"
+        path.write_bytes(b"font-content")
+
+        with pytest.raises(ValueError, match="Not a TrueType/OpenType font"):
+            read_font_coverage(path)
+
+
+class TestCoverageIndex:
+    def test_index_is_written_per_font(self, font_dir):
+        content = json.loads((font_dir / COVERAGE_FILE_NAME).read_text(encoding="utf-8"))
+
+        assert set(content["fonts"]) == {HONK.name, CUNEIFORM.name, "broken.ttf"}
+        assert content["fonts"]["broken.ttf"] == []
+
+    def test_fonts_for(self, font_dir):
+        index = CoverageIndex.load(font_dir)
+
+        assert index.fonts_for("𒀀") == [CUNEIFORM.name]
+        assert set(index.fonts_for("A")) == {HONK.name, CUNEIFORM.name}
+        assert index.fonts_for("א") == []
+
+    def test_sample_text(self, font_dir):
+        index = CoverageIndex.load(font_dir)
+
+        sample = index.sample_text(CUNEIFORM.name, length=8)
+
+        assert len(sample) == 8
+        assert index.coverage(sample).is_renderable
+        assert sample == index.sample_text(CUNEIFORM.name, length=8)
+        assert index.sample_text("broken.ttf") == ""
+
+    def test_coverage(self, font_dir):
+        index = CoverageIndex.load(font_dir)
+
+        assert index.coverage("Hello 𒀀").is_renderable
+        coverage = index.coverage("ab שלום")
+        assert coverage.missing == "שלום"
+        assert coverage.ratio == pytest.approx(3 / 7)
+
+    def test_control_characters_are_ignored(self, font_dir):
+        index = CoverageIndex.load(font_dir)
+
+        assert index.coverage("a\n‍️b").ratio == 1.0
+        assert index.coverage("").ratio == 1.0
+
+    def test_report_matches_per_text_coverage(self, font_dir):
+        index = CoverageIndex.load(font_dir)
+        texts = ["Hello", "", "שלום world", "𒀀𒀁", "日本"]
+
+        report = index.report(texts)
+
+        expected = [index.coverage(text) for text in texts]
+        np.testing.assert_allclose(report.ratios, [coverage.ratio for coverage in expected])
+        assert report.renderable.tolist() == [coverage.is_renderable for coverage in expected]
+        assert report.missing["ש"] == 1
+        assert report.summary()["renderable"] == 3
+
+    def test_missing_index_is_built_on_load(self, font_dir):
+        (font_dir / COVERAGE_FILE_NAME).unlink()
+
+        index = CoverageIndex.load(font_dir)
+
+        assert (font_dir / COVERAGE_FILE_NAME).exists()
+        assert index.coverage("𒀀").is_renderable
+
+    def test_index_is_built_again_when_fonts_change(self, font_dir):
+        (font_dir / "sources.json").write_text(json.dumps([{"name": HONK.name}, {"name": CUNEIFORM.name}]))
+        assert load_coverage_index(font_dir).coverage("𒀀").is_renderable
+
+        # As when download_fonts(revalidate=True) creates the font directory again with other fonts
+        (font_dir / CUNEIFORM.name).unlink()
+        (font_dir / "sources.json").unlink()
+        (font_dir / "sources.json").write_text(json.dumps([{"name": HONK.name}]))
+
+        assert not load_coverage_index(font_dir).coverage("𒀀").is_renderable
+        assert CUNEIFORM.name not in json.loads((font_dir / COVERAGE_FILE_NAME).read_text())["fonts"]
+
+
+class TestFontConfigCoverage:
+    def test_coverage_of_downloaded_fonts(self, asset_fonts_download_setup):
+        config = FontConfig(sources=ASSET_FONT_SOURCES)
+        assert (config.get_font_dir() / COVERAGE_FILE_NAME).exists()
+
+        assert config.coverage("Hello 𒀀").is_renderable
+        assert config.coverage("Hello שלום").missing == "שלום"
+        assert config.coverage_report(["Hello", "שלום"]).renderable.tolist() == [True, False]
+
+    def test_coverage_of_lazy_fonts(self, asset_fonts_download_setup):
+        """Test that characters of fonts a lazy font set would fetch are covered, not only the core fonts'."""
+        config = FontConfig(sources=ASSET_FONT_SOURCES, lazy=True, core_families=["Honk"])
+        assert CUNEIFORM.name not in {path.name for path in config.get_font_dir().iterdir()}
+
+        assert config.coverage("Hello 𒀀").is_renderable
+
+    def test_font_dir_is_resolved_once(self, asset_fonts_download_setup):
+        config = FontConfig(sources=ASSET_FONT_SOURCES)
+        index = config.coverage_index()
+
+        with patch("font_download.config.download_fonts", side_effect=AssertionError("fonts resolved again")):
+            assert config.coverage("Hello 𒀀").is_renderable
+            assert config.coverage_index() is index
+
+        config.sources = config.sources[:1]
+        assert not config.coverage("𒀀").is_renderable
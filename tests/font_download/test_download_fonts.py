@@ -1,9 +1,34 @@
 """Tests for font_download.download_fonts module."""
 
+import ctypes
+import hashlib
+import importlib
 import json
-
-from font_download.download_fonts import _compute_sources_hash, download_fonts
+import multiprocessing
+import pathlib
+import stat
+import threading
+from collections import Counter
+from ctypes.util import find_library
+from unittest.mock import patch
+
+import pytest
+
+from font_configurator.atomic_files import FILE_MODE
+from font_download.download_fonts import (
+    _compute_sources_hash,
+    audit_font_store,
+    audit_font_store_in_background,
+    download_fonts,
+    font_store_dir,
+    fontconfig_cache_dir,
+    fontconfig_store_cache_dir,
+)
 from font_download.fonts import FontSource
+from tests.font_download.conftest import ASSET_FONT_SOURCES, ASSET_FONTS_DIR, FakeDownloader
+
+# The package exports the download_fonts function under the name of its module
+download_fonts_module = importlib.import_module("font_download.download_fonts")
 
 
 class TestComputeSourcesHash:
@@ -102,8 +127,20 @@ class TestDownloadFonts:
         assert '<?xml version="1.0"?>' in fontconfig_content
         assert 'DOCTYPE fontconfig SYSTEM "urn:fontconfig:fonts.dtd"' in fontconfig_content
         assert f"<dir>{config_dir}</dir>" in fontconfig_content
+        assert f"<cachedir>{fontconfig_cache_dir(config_dir)}</cachedir>" in fontconfig_content
         assert "<fontconfig>" in fontconfig_content
 
+    def test_fontconfig_cache_is_prebuilt(self, asset_fonts_download_setup):
+        """Test that the fontconfig cache is written under the font cache, not in the config directory."""
+        if find_library("fontconfig") is None:
+            pytest.skip("fontconfig library is not installed")
+
+        config_dir = download_fonts(ASSET_FONT_SOURCES)
+
+        cache_dir = fontconfig_cache_dir(config_dir)
+        assert cache_dir.is_relative_to(asset_fonts_download_setup)
+        assert list(cache_dir.glob("*.cache-*"))
+
     def test_reuses_existing_config(self, mock_download_setup, font_sources):
         """Test that same sources return existing config."""
         # First download
@@ -120,32 +157,95 @@ class TestDownloadFonts:
         assert mtime1 == mtime2
 
     def test_fonts_are_symlinked(self, mock_download_setup, font_sources):
-        """Test that fonts are symlinked from central cache."""
+        """Test that fonts are symlinked from the content-addressed store."""
         config_dir = download_fonts(font_sources)
 
         font_symlink = config_dir / "font1.ttf"
-        fonts_cache = mock_download_setup / "fonts" / "font1.ttf"
+        content = f"font-content-{font_sources[0].url}".encode()
+        stored_font = mock_download_setup / "fonts" / "objects" / hashlib.sha256(content).hexdigest()
 
         assert font_symlink.is_symlink()
-        assert fonts_cache.exists()
-        assert font_symlink.resolve() == fonts_cache.resolve()
+        assert stored_font.read_bytes() == content
+        assert font_symlink.resolve() == stored_font.resolve()
 
     def test_reuses_cached_fonts(self, mock_download_setup, font_sources):
-        """Test that already cached fonts are not re-downloaded."""
-        # Pre-create a font in cache
-        fonts_cache = mock_download_setup / "fonts"
-        fonts_cache.mkdir(parents=True, exist_ok=True)
-        existing_font = fonts_cache / "font1.ttf"
-        existing_font.write_bytes(b"existing-font-data")
-        original_content = existing_font.read_bytes()
+        """Test that already stored fonts are not re-downloaded, for another config directory too."""
+        download_fonts(font_sources)
 
-        # Download fonts
-        config_dir = download_fonts(font_sources)
+        config_dir = download_fonts(font_sources[:1], downloader=FakeDownloader(lambda url: pytest.fail(url)))
 
-        # Font should not have been overwritten
-        assert existing_font.read_bytes() == original_content
         assert (config_dir / "font1.ttf").exists()
 
+    def test_identical_fonts_are_stored_once(self, mock_download_setup):
+        """Test that the same font at different URLs and names is stored once."""
+        sources = [FontSource(url="https://example.com/a.ttf"), FontSource(url="https://mirror.example.com/b.ttf")]
+
+        config_dir = download_fonts(sources, downloader=FakeDownloader(lambda url: b"same font"))
+
+        assert (config_dir / "a.ttf").resolve() == (config_dir / "b.ttf").resolve()
+        assert len(list((mock_download_setup / "fonts" / "objects").iterdir())) == 1
+
+    def test_expected_sha256_is_verified(self, mock_download_setup):
+        """Test that a font not matching its expected SHA-256 is rejected, and not stored."""
+        source = FontSource(url="https://example.com/font1.ttf", sha256="0" * 64)
+
+        with pytest.raises(ValueError, match="SHA-256 mismatch"):
+            download_fonts([source])
+
+        assert list((mock_download_setup / "fonts" / "objects").iterdir()) == []
+
+    def test_expected_sha256_skips_lookup_and_download(self, mock_download_setup):
+        """Test that a font whose expected SHA-256 is in the store is used without downloading it."""
+        content = b"font-content-https://example.com/font1.ttf"
+        sha256 = hashlib.sha256(content).hexdigest()
+        download_fonts([FontSource(url="https://example.com/font1.ttf")])
+
+        source = FontSource(url="https://example.com/renamed.ttf", sha256=sha256)
+        config_dir = download_fonts([source], downloader=FakeDownloader(lambda url: pytest.fail(url)))
+
+        assert (config_dir / "renamed.ttf").read_bytes() == content
+
+    def test_pinned_sha256_is_checked_against_existing_config(self, mock_download_setup):
+        """Test that a config directory holding other fonts than the pinned ones is created again."""
+        config_dir = download_fonts([FontSource(url="https://example.com/font1.ttf")])
+        pinned = FontSource(url="https://example.com/font1.ttf", sha256=hashlib.sha256(b"new font").hexdigest())
+
+        assert download_fonts([pinned], downloader=FakeDownloader(lambda url: b"new font")) == config_dir
+
+        assert (config_dir / "font1.ttf").read_bytes() == b"new font"
+        assert json.loads((config_dir / "sources.json").read_text())[0]["sha256"] == pinned.sha256
+
+    def test_cache_files_are_readable_by_others(self, mock_download_setup, font_sources):
+        """Test that atomically written files get the permissions of regular files, not those of temporary ones."""
+        config_dir = download_fonts(font_sources)
+
+        written = [
+            config_dir / "sources.json",
+            config_dir / "fonts.conf",
+            config_dir / "coverage.json",
+            mock_download_setup / "fonts" / "hash_index.json",
+            *font_store_dir().iterdir(),
+        ]
+        for path in written:
+            assert stat.S_IMODE(path.stat().st_mode) == FILE_MODE, path
+
+    def test_interrupted_download_is_not_stored(self, mock_download_setup, font_sources):
+        """Test that a download failing mid-stream leaves no truncated font to be trusted later."""
+
+        class BrokenDownloader:
+            def download(self, url, path):
+                pathlib.Path(path).write_bytes(b"trunc")
+                raise ConnectionResetError("connection lost")
+
+        with pytest.raises(ConnectionResetError):
+            download_fonts(font_sources, downloader=BrokenDownloader())
+
+        assert list((mock_download_setup / "fonts" / "objects").iterdir()) == []
+        assert [path for path in (mock_download_setup / "fonts" / "urls").iterdir() if path.suffix != ".lock"] == []
+
+        config_dir = download_fonts(font_sources)
+        assert (config_dir / "font1.ttf").read_bytes() == f"font-content-{font_sources[0].url}".encode()
+
     def test_different_sources_different_configs(self, mock_download_setup):
         """Test that different sources create different config dirs."""
         sources1 = [FontSource(url="https://example.com/font1.ttf")]
@@ -241,3 +341,287 @@ class TestDownloadFonts:
         assert (config_dir / "sources.json").exists()
         assert (config_dir / "font1.ttf").exists()  # Now it should exist and be valid
         assert (config_dir / "font1.ttf").is_symlink()
+
+
+def _download_in_process(cache_dir, urls, barrier, results):
+    download_fonts_module.FONT_DOWNLOAD_CACHE_DIR = cache_dir
+    barrier.wait()
+    config_dir = download_fonts([FontSource(url=url) for url in urls])
+    results.put(json.loads((config_dir / "sources.json").read_text()))
+
+
+class TestFontStoreIntegrity:
+    """Test that stored fonts are verified without re-reading unchanged files."""
+
+    def test_stored_fonts_are_not_hashed_again(self, mock_download_setup, font_sources):
+        download_fonts(font_sources)
+
+        with patch("font_download.hash_index.compute_file_sha256", side_effect=AssertionError("hashed again")):
+            config_dir = download_fonts(font_sources[:1])
+
+        assert (config_dir / "font1.ttf").exists()
+
+    def test_corrupted_font_is_downloaded_again(self, mock_download_setup, font_sources):
+        config_dir = download_fonts(font_sources)
+        (config_dir / "font1.ttf").resolve().write_bytes(b"corrupted")
+
+        other_config_dir = download_fonts(font_sources[:1])
+
+        assert (other_config_dir / "font1.ttf").read_bytes() == f"font-content-{font_sources[0].url}".encode()
+
+    def test_audit_finds_and_repairs_corrupted_fonts(self, mock_download_setup, font_sources):
+        config_dir = download_fonts(font_sources)
+        corrupted_font = (config_dir / "font1.ttf").resolve()
+        corrupted_font.write_bytes(b"corrupted")
+
+        assert audit_font_store_in_background().result(timeout=60) == [corrupted_font]
+        assert not (config_dir / "sources.json").exists()
+
+        assert download_fonts(font_sources) == config_dir
+        assert (config_dir / "font1.ttf").read_bytes() == f"font-content-{font_sources[0].url}".encode()
+        assert audit_font_store() == []
+
+
+def fontconfig_font_values(fonts_conf, element):
+    """Values of a string element (e.g. b"family") of the fonts that fontconfig loads with a fonts.conf."""
+    from font_configurator.fontconfig_library import load_fontconfig
+
+    class FcFontSet(ctypes.Structure):
+        _fields_ = [("nfont", ctypes.c_int), ("sfont", ctypes.c_int), ("fonts", ctypes.POINTER(ctypes.c_void_p))]
+
+    fontconfig, _ = load_fontconfig()
+    fontconfig.FcConfigGetFonts.argtypes = [ctypes.c_void_p, ctypes.c_int]
+    fontconfig.FcConfigGetFonts.restype = ctypes.POINTER(FcFontSet)
+    fontconfig.FcPatternGetString.argtypes = [ctypes.c_void_p, ctypes.c_char_p, ctypes.c_int, ctypes.c_void_p]
+    config = fontconfig.FcConfigCreate()
+    try:
+        assert fontconfig.FcConfigParseAndLoad(config, bytes(fonts_conf), 1)
+        assert fontconfig.FcConfigBuildFonts(config)
+        font_set = fontconfig.FcConfigGetFonts(config, 0).contents  # FcSetSystem
+        values = set()
+        for i in range(font_set.nfont):
+            value = ctypes.c_char_p()
+            fontconfig.FcPatternGetString(font_set.fonts[i], element, 0, ctypes.byref(value))
+            values.add(value.value.decode())
+        return values
+    finally:
+        fontconfig.FcConfigDestroy(config)
+
+
+def fontconfig_font_files(fonts_conf):
+    """Font files that fontconfig loads with a fonts.conf."""
+    return {pathlib.Path(file) for file in fontconfig_font_values(fonts_conf, b"file")}
+
+
+class TestFontStoreSelection:
+    """Test config directories that select their fonts in the font store (link_fonts=False)."""
+
+    def test_config_dir_selects_fonts_in_store(self, mock_download_setup, font_sources):
+        config_dir = download_fonts(font_sources, link_fonts=False)
+
+        selection = json.loads((config_dir / "selected_fonts.json").read_text())
+        assert set(selection) == {source.name for source in font_sources}
+        assert not any(path.is_symlink() for path in config_dir.iterdir())
+        fonts_conf = (config_dir / "fonts.conf").read_text()
+        assert f"<dir>{font_store_dir()}</dir>" in fonts_conf
+        assert f"<cachedir>{fontconfig_store_cache_dir()}</cachedir>" in fonts_conf
+        assert f"<rejectfont><glob>{font_store_dir()}/*</glob></rejectfont>" in fonts_conf
+        for path in selection.values():
+            assert pathlib.Path(path).parent == font_store_dir()
+            assert f"<acceptfont><glob>{path}</glob></acceptfont>" in fonts_conf
+        assert set(json.loads((config_dir / "coverage.json").read_text())["fonts"]) == set(selection)
+        assert (config_dir / "sources.json").exists()
+
+    def test_fontconfig_loads_only_selected_fonts(self, asset_fonts_download_setup):
+        """Test that config directories share the fontconfig cache of the store, but each sees only its fonts."""
+        if find_library("fontconfig") is None:
+            pytest.skip("fontconfig library is not installed")
+
+        config_dirs = [download_fonts([source], link_fonts=False) for source in ASSET_FONT_SOURCES]
+
+        for config_dir in config_dirs:
+            [font_path] = json.loads((config_dir / "selected_fonts.json").read_text()).values()
+            assert fontconfig_font_files(config_dir / "fonts.conf") == {pathlib.Path(font_path)}
+        assert len(list(fontconfig_store_cache_dir().glob("*.cache-*"))) == 1
+        assert not fontconfig_cache_dir(config_dirs[0]).exists()
+
+    def test_each_layout_has_its_own_config_dir(self, mock_download_setup, font_sources):
+        linked_dir = download_fonts(font_sources)
+        selecting_dir = download_fonts(font_sources, link_fonts=False)
+
+        assert selecting_dir != linked_dir
+        assert not (linked_dir / "selected_fonts.json").exists()
+        assert (selecting_dir / "selected_fonts.json").exists()
+        assert download_fonts(font_sources) == linked_dir
+
+    def test_audit_invalidates_selecting_config_dirs(self, mock_download_setup, font_sources):
+        config_dir = download_fonts(font_sources, link_fonts=False)
+        corrupted_font = font_store_dir() / json.loads((config_dir / "sources.json").read_text())[0]["sha256"]
+        corrupted_font.write_bytes(b"corrupted")
+
+        assert audit_font_store() == [corrupted_font]
+
+        assert not (config_dir / "sources.json").exists()
+
+
+class TestLocalFontSources:
+    """Test fonts on this machine (paths, file:// URLs and font directories), used in place."""
+
+    def test_local_font_is_linked_in_place(self, mock_download_setup, tmp_path):
+        font_path = tmp_path / "local.ttf"
+        font_path.write_bytes(b"local font")
+
+        with patch("concurrent.futures.ThreadPoolExecutor", side_effect=AssertionError("thread pool used")):
+            config_dir = download_fonts([FontSource(url=str(font_path))])
+
+        assert (config_dir / "local.ttf").readlink() == font_path
+        [metadata] = json.loads((config_dir / "sources.json").read_text())
+        assert metadata["sha256"] == hashlib.sha256(b"local font").hexdigest()
+        assert not any((mock_download_setup / "fonts" / "objects").iterdir())
+        assert str(font_path) in json.loads((mock_download_setup / "fonts" / "hash_index.json").read_text())
+
+    def test_font_directory_url(self, mock_download_setup):
+        config_dir = download_fonts([FontSource(url=ASSET_FONTS_DIR.as_uri())])
+
+        for source in ASSET_FONT_SOURCES:
+            assert (config_dir / source.name).resolve() == (ASSET_FONTS_DIR / source.name).resolve()
+        assert set(json.loads((config_dir / "coverage.json").read_text())["fonts"]) == {
+            source.name for source in ASSET_FONT_SOURCES
+        }
+
+    def test_local_font_is_verified(self, mock_download_setup, tmp_path):
+        font_path = tmp_path / "local.ttf"
+        font_path.write_bytes(b"local font")
+
+        with pytest.raises(ValueError, match="SHA-256 mismatch"):
+            download_fonts([FontSource(url=str(font_path), sha256="0" * 64)])
+
+    def test_missing_local_font(self, mock_download_setup, tmp_path):
+        with pytest.raises(FileNotFoundError):
+            download_fonts([FontSource(url=str(tmp_path / "missing.ttf"))])
+
+    @pytest.mark.parametrize("link_fonts", [True, False])
+    def test_local_font_modified_in_place(self, mock_download_setup, tmp_path, link_fonts):
+        """Test that a config directory is created again when one of its local fonts is edited in place."""
+        honk, cuneiform = ((ASSET_FONTS_DIR / source.name).read_bytes() for source in ASSET_FONT_SOURCES)
+        font_path = tmp_path / "local.ttf"
+        font_path.write_bytes(honk)
+        sources = [FontSource(url=str(font_path))]
+        config_dir = download_fonts(sources, link_fonts=link_fonts)
+        coverage = (config_dir / "coverage.json").read_text()
+        has_fontconfig = find_library("fontconfig") is not None
+        families = fontconfig_font_values(config_dir / "fonts.conf", b"family") if has_fontconfig else None
+
+        with open(font_path, "r+b") as font_file:  # Same inode
+            font_file.truncate()
+            font_file.write(cuneiform)
+
+        assert download_fonts(sources, link_fonts=link_fonts) == config_dir
+        [metadata] = json.loads((config_dir / "sources.json").read_text())
+        assert metadata["sha256"] == hashlib.sha256(cuneiform).hexdigest()
+        assert (config_dir / "coverage.json").read_text() != coverage
+        if has_fontconfig:
+            assert fontconfig_font_values(config_dir / "fonts.conf", b"family") not in (set(), families)
+
+    def test_local_and_downloaded_fonts_selected_by_fontconfig(self, asset_fonts_download_setup):
+        if find_library("fontconfig") is None:
+            pytest.skip("fontconfig library is not installed")
+        honk, cuneiform = ASSET_FONT_SOURCES
+        local_cuneiform = FontSource(url=str(ASSET_FONTS_DIR / cuneiform.name))
+
+        config_dir = download_fonts([honk, local_cuneiform], link_fonts=False)
+
+        selection = json.loads((config_dir / "selected_fonts.json").read_text())
+        assert pathlib.Path(selection[honk.name]).parent == font_store_dir()
+        assert selection[cuneiform.name] == str((ASSET_FONTS_DIR / cuneiform.name).resolve())
+        assert fontconfig_font_files(config_dir / "fonts.conf") == {pathlib.Path(path) for path in selection.values()}
+
+
+class TestRevalidation:
+    """Test download_fonts(revalidate=True) against a local font server."""
+
+    @pytest.fixture
+    def sources(self, font_server, temp_cache_dir, monkeypatch):
+        monkeypatch.setattr(download_fonts_module, "FONT_DOWNLOAD_CACHE_DIR", temp_cache_dir)
+        return [FontSource(url=f"{font_server.url}/font{index}.ttf") for index in range(3)]
+
+    def test_config_is_trusted_without_revalidation(self, font_server, sources):
+        download_fonts(sources)
+
+        download_fonts(sources)
+
+        assert font_server.statuses == {200: 3}
+
+    def test_unchanged_fonts_are_revalidated_without_downloading(self, font_server, sources):
+        config_dir = download_fonts(sources)
+        sources_json = (config_dir / "sources.json").read_text()
+
+        assert download_fonts(sources, revalidate=True) == config_dir
+
+        assert font_server.statuses == {200: 3, 304: 3}
+        assert (config_dir / "sources.json").read_text() == sources_json
+
+    def test_changed_font_is_downloaded_and_config_recreated(self, font_server, sources, tmp_path):
+        config_dir = download_fonts(sources)
+        (tmp_path / "served" / "font1.ttf").write_bytes(b"new font 1")
+
+        assert download_fonts(sources, revalidate=True) == config_dir
+
+        assert font_server.statuses == {200: 4, 304: 2}
+        assert (config_dir / "font1.ttf").read_bytes() == b"new font 1"
+        [font1] = [
+            font for font in json.loads((config_dir / "sources.json").read_text()) if font["name"] == "font1.ttf"
+        ]
+        assert font1["sha256"] == hashlib.sha256(b"new font 1").hexdigest()
+        # The old version stays in the store, for processes still using it, until garbage collected
+        assert len(list(font_store_dir().iterdir())) == 4
+
+    def test_pinned_fonts_are_not_revalidated(self, font_server, sources):
+        download_fonts(sources)
+        pinned = [FontSource(url=sources[0].url, sha256=hashlib.sha256(b"font 0" * 1000).hexdigest())]
+
+        download_fonts(pinned, revalidate=True)
+
+        assert font_server.statuses == {200: 3}
+
+
+class TestConcurrentDownloadFonts:
+    """Test download_fonts called by many processes at once, on a cold cache."""
+
+    def test_concurrent_processes_download_once(self, font_server, temp_cache_dir):
+        """Test that 32 processes get the same complete config, with every font downloaded once."""
+        urls = [f"{font_server.url}/font{index}.ttf" for index in range(3)]
+
+        context = multiprocessing.get_context("spawn")
+        barrier = context.Barrier(32)
+        results = context.Queue()
+        processes = [
+            context.Process(target=_download_in_process, args=(temp_cache_dir, urls, barrier, results))
+            for _ in range(32)
+        ]
+        for process in processes:
+            process.start()
+        sources = [results.get(timeout=120) for _ in processes]
+        for process in processes:
+            process.join(timeout=60)
+
+        assert all(process.exitcode == 0 for process in processes)
+        assert all(result == sources[0] for result in sources)
+        assert font_server.requests == Counter({f"/font{index}.ttf": 1 for index in range(3)})
+        assert len(list((temp_cache_dir / "fonts" / "objects").iterdir())) == 3
+
+    def test_threads_share_font_downloads(self, font_server, temp_cache_dir, monkeypatch):
+        """Test that config directories created at the same time download their common fonts once."""
+        base_url = font_server.url
+        monkeypatch.setattr(download_fonts_module, "FONT_DOWNLOAD_CACHE_DIR", temp_cache_dir)
+        source_lists = [
+            [FontSource(url=f"{base_url}/font0.ttf"), FontSource(url=f"{base_url}/font{i}.ttf")] for i in (1, 2)
+        ]
+
+        threads = [threading.Thread(target=download_fonts, args=(sources,)) for sources in source_lists]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert font_server.requests["/font0.ttf"] == 1
@@ -0,0 +1,120 @@
+"""Tests for font_download.downloader module."""
+
+import hashlib
+import os
+import threading
+
+import pytest
+import requests
+
+from font_download.downloader import FontDownloader
+
+
+@pytest.fixture
+def downloader():
+    downloader = FontDownloader(max_connections_per_host=2, backoff_factor=0.01)
+    yield downloader
+    downloader.close()
+
+
+class TestFontDownloader:
+    def test_download_streams_and_hashes(self, font_server, downloader, tmp_path):
+        path = tmp_path / "font.ttf"
+
+        sha256 = downloader.download(f"{font_server.url}/font0.ttf", path)
+
+        assert path.read_bytes() == b"font 0" * 1000
+        assert sha256 == hashlib.sha256(path.read_bytes()).hexdigest()
+
+    def test_connections_are_kept_alive(self, font_server, downloader, tmp_path):
+        for index in range(3):
+            downloader.download(f"{font_server.url}/font{index}.ttf", tmp_path / f"font{index}.ttf")
+
+        assert font_server.connections == 1
+
+    def test_concurrency_is_limited_per_host(self, font_server, downloader, tmp_path):
+        font_server.delay = 0.05
+        threads = [
+            threading.Thread(target=downloader.download, args=(f"{font_server.url}/font0.ttf", tmp_path / f"{i}.ttf"))
+            for i in range(8)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert font_server.requests["/font0.ttf"] == 8
+        assert font_server.max_in_flight == 2
+
+    def test_server_errors_are_retried(self, font_server, downloader, tmp_path):
+        font_server.failures["/font0.ttf"] = [503, 502]
+
+        downloader.download(f"{font_server.url}/font0.ttf", tmp_path / "font.ttf")
+
+        assert font_server.requests["/font0.ttf"] == 3
+        assert (tmp_path / "font.ttf").read_bytes() == b"font 0" * 1000
+
+    def test_attempts_are_limited_to_one_retry_layer(self, font_server, tmp_path):
+        """Test that a URL failing every time is requested 1 + retries times, whatever the failures."""
+        font_server.failures["/font0.ttf"] = [503, "truncate", 502] * 5
+        downloader = FontDownloader(retries=3, backoff_factor=0.01)
+
+        with pytest.raises(requests.HTTPError):
+            downloader.download(f"{font_server.url}/font0.ttf", tmp_path / "font.ttf")
+
+        assert font_server.requests["/font0.ttf"] == 4
+        downloader.close()
+
+    def test_interrupted_body_is_downloaded_again(self, font_server, downloader, tmp_path):
+        font_server.failures["/font0.ttf"] = ["truncate"]
+
+        downloader.download(f"{font_server.url}/font0.ttf", tmp_path / "font.ttf")
+
+        assert font_server.requests["/font0.ttf"] == 2
+        assert (tmp_path / "font.ttf").read_bytes() == b"font 0" * 1000
+
+    def test_missing_font_is_not_retried(self, font_server, downloader, tmp_path):
+        with pytest.raises(requests.HTTPError):
+            downloader.download(f"{font_server.url}/missing.ttf", tmp_path / "font.ttf")
+
+        assert font_server.requests["/missing.ttf"] == 1
+
+
+class TestConditionalDownload:
+    def test_unchanged_font_is_not_downloaded_again(self, font_server, downloader, tmp_path):
+        url = f"{font_server.url}/font0.ttf"
+        sha256, validators = downloader.download_validated(url, tmp_path / "first.ttf")
+
+        result = downloader.download_validated(url, tmp_path / "second.ttf", validators)
+
+        assert set(validators) == {"etag", "last_modified"}
+        assert result == (None, validators)
+        assert (tmp_path / "second.ttf").read_bytes() == b""
+        assert sha256 == hashlib.sha256(b"font 0" * 1000).hexdigest()
+        assert font_server.statuses == {200: 1, 304: 1}
+
+    def test_changed_font_is_downloaded(self, font_server, downloader, tmp_path):
+        url = f"{font_server.url}/font0.ttf"
+        _, validators = downloader.download_validated(url, tmp_path / "first.ttf")
+        (tmp_path / "served" / "font0.ttf").write_bytes(b"new font 0")
+
+        sha256, new_validators = downloader.download_validated(url, tmp_path / "second.ttf", validators)
+
+        assert sha256 == hashlib.sha256(b"new font 0").hexdigest()
+        assert new_validators["etag"] != validators["etag"]
+        assert (tmp_path / "second.ttf").read_bytes() == b"new font 0"
+
+    def test_last_modified_without_etag(self, font_server, downloader, tmp_path):
+        font_server.etags = False
+        url = f"{font_server.url}/font0.ttf"
+        _, validators = downloader.download_validated(url, tmp_path / "font.ttf")
+
+        assert downloader.download_validated(url, tmp_path / "font.ttf", validators)[0] is None
+        served_path = tmp_path / "served" / "font0.ttf"
+        served_path.write_bytes(b"new font 0")
+        later = served_path.stat().st_mtime + 10
+        os.utime(served_path, (later, later))
+        sha256, _ = downloader.download_validated(url, tmp_path / "font.ttf", validators)
+
+        assert list(validators) == ["last_modified"]
+        assert sha256 == hashlib.sha256(b"new font 0").hexdigest()
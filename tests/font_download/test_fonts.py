@@ -5,7 +5,7 @@ import pathlib
 
 import pytest
 
-from font_download.fonts import FontEntity, FontSource, combine_fonts, compute_file_sha256
+from font_download.fonts import FontEntity, FontSource, combine_fonts, compute_file_sha256, expand_font_sources
 
 
 class TestComputeFileSha256:
@@ -62,6 +62,47 @@ class TestFontSource:
 
         assert result == {"url": "https://example.com/font.ttf", "name": "font.ttf"}
 
+    def test_expected_sha256_round_trip(self):
+        """Test that an expected SHA-256 is kept through dictionaries."""
+        source = FontSource(url="https://example.com/font.ttf", sha256="a" * 64)
+
+        assert source.to_dict()["sha256"] == "a" * 64
+        assert FontSource.from_dict(source.to_dict()) == source
+
+    @pytest.mark.parametrize(
+        ("url", "expected"),
+        [
+            ("/nfs/fonts/My Font.ttf", pathlib.Path("/nfs/fonts/My Font.ttf")),
+            ("file:///nfs/fonts/My%20Font.ttf", pathlib.Path("/nfs/fonts/My Font.ttf")),
+            ("fonts/font.ttf", pathlib.Path("fonts/font.ttf")),
+            ("https://example.com/font.ttf", None),
+        ],
+    )
+    def test_local_path(self, url, expected):
+        source = FontSource(url=url)
+
+        assert source.local_path() == expected
+        assert source.name == pathlib.Path(expected or url).name
+
+
+class TestExpandFontSources:
+    """Test expand_font_sources function."""
+
+    def test_directories_are_expanded_into_font_files(self, tmp_path):
+        for name in ("b.ttf", "a.otf", "readme.txt"):
+            (tmp_path / name).write_bytes(b"")
+        font_file = FontSource(url="https://example.com/font.ttf")
+
+        sources = expand_font_sources([font_file.to_dict(), {"url": str(tmp_path)}, {"url": tmp_path.as_uri()}])
+
+        assert sources == [
+            font_file,
+            FontSource(url=str(tmp_path / "a.otf")),
+            FontSource(url=str(tmp_path / "b.ttf")),
+            FontSource(url=(tmp_path / "a.otf").as_uri()),
+            FontSource(url=(tmp_path / "b.ttf").as_uri()),
+        ]
+
 
 class TestFontEntity:
     """Test FontEntity dataclass."""
@@ -79,6 +120,15 @@ class TestFontEntity:
         assert entity.file_path == font_file
         assert entity.sha256 == hashlib.sha256(content).hexdigest()
 
+    def test_known_hash_is_not_recomputed(self, tmp_path):
+        """Test that a hash computed while downloading is used as is."""
+        font_file = tmp_path / "font.ttf"
+        font_file.write_bytes(b"font data")
+
+        entity = FontEntity(name="font.ttf", url="https://example.com/font.ttf", file_path=font_file, sha256="known")
+
+        assert entity.sha256 == "known"
+
     def test_converts_string_path_to_path(self, tmp_path):
         """Test string paths are converted to Path objects."""
         font_file = tmp_path / "font.ttf"
@@ -0,0 +1,108 @@
+"""Tests for font_download.hash_index module."""
+
+import hashlib
+import os
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+
+import pytest
+
+from font_download.fonts import compute_file_sha256
+from font_download.hash_index import HashIndex
+
+
+@pytest.fixture
+def font_file(tmp_path):
+    font_file = tmp_path / "font.ttf"
+    font_file.write_bytes(b"font data")
+    return font_file
+
+
+@pytest.fixture
+def hash_calls():
+    """Files hashed by the index."""
+    calls = []
+
+    def counting_sha256(path):
+        calls.append(path)
+        return compute_file_sha256(path)
+
+    with patch("font_download.hash_index.compute_file_sha256", counting_sha256):
+        yield calls
+
+
+class TestHashIndex:
+    def test_unchanged_file_is_hashed_once(self, tmp_path, font_file, hash_calls):
+        index = HashIndex(tmp_path / "index.json")
+
+        assert index.sha256(font_file) == hashlib.sha256(b"font data").hexdigest()
+        assert index.sha256(font_file) == hashlib.sha256(b"font data").hexdigest()
+        assert hash_calls == [font_file]
+
+    def test_modified_file_is_hashed_again(self, tmp_path, font_file, hash_calls):
+        index = HashIndex(tmp_path / "index.json")
+        index.sha256(font_file)
+
+        font_file.write_bytes(b"font data, modified")
+
+        assert index.sha256(font_file) == hashlib.sha256(b"font data, modified").hexdigest()
+        assert len(hash_calls) == 2
+
+    def test_same_size_and_time_but_replaced_file_is_hashed_again(self, tmp_path, font_file, hash_calls):
+        """Test that the inode is part of the key, for files replaced by a rename."""
+        index = HashIndex(tmp_path / "index.json")
+        index.sha256(font_file)
+        stat = font_file.stat()
+
+        replacement = tmp_path / "replacement.ttf"
+        replacement.write_bytes(b"FONT DATA")
+        os.utime(replacement, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+        os.replace(replacement, font_file)
+
+        assert index.sha256(font_file) == hashlib.sha256(b"FONT DATA").hexdigest()
+        assert len(hash_calls) == 2
+
+    def test_index_is_persisted(self, tmp_path, font_file, hash_calls):
+        index = HashIndex(tmp_path / "index.json")
+        index.sha256(font_file)
+        index.save()
+
+        assert HashIndex(tmp_path / "index.json").sha256(font_file) == hashlib.sha256(b"font data").hexdigest()
+        assert hash_calls == [font_file]
+
+    def test_save_merges_entries_of_other_processes(self, tmp_path, font_file):
+        other_file = tmp_path / "other.ttf"
+        other_file.write_bytes(b"other font")
+        first, second = HashIndex(tmp_path / "index.json"), HashIndex(tmp_path / "index.json")
+
+        first.sha256(font_file)
+        second.sha256(other_file)
+        first.save()
+        second.save()
+
+        merged = HashIndex(tmp_path / "index.json")
+        assert merged.lookup(font_file) is not None
+        assert merged.lookup(other_file) is not None
+
+    def test_concurrent_saves_keep_every_entry(self, tmp_path):
+        font_files = [tmp_path / f"font_{number}.ttf" for number in range(16)]
+        for font_file in font_files:
+            font_file.write_bytes(font_file.name.encode())
+
+        def save(font_file):
+            index = HashIndex(tmp_path / "index.json")
+            index.sha256(font_file)
+            index.save()
+
+        with ThreadPoolExecutor(max_workers=len(font_files)) as executor:
+            list(executor.map(save, font_files))
+
+        merged = HashIndex(tmp_path / "index.json")
+        assert all(merged.lookup(font_file) is not None for font_file in font_files)
+
+    def test_recorded_hash_is_not_recomputed(self, tmp_path, font_file, hash_calls):
+        index = HashIndex(tmp_path / "index.json")
+        index.record(font_file, "known")
+
+        assert index.sha256(font_file) == "known"
+        assert hash_calls == []
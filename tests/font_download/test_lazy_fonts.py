@@ -0,0 +1,61 @@
+"""Tests for font_download.lazy_fonts module."""
+
+import json
+
+from font_download import FontConfig
+from font_download.fonts import FontSource
+from font_download.lazy_fonts import LazyFontSet, split_core_sources
+from tests.font_download.conftest import ASSET_FONT_SOURCES
+
+HONK, CUNEIFORM = ASSET_FONT_SOURCES
+
+
+class TestSplitCoreSources:
+    def test_core_families(self):
+        assert split_core_sources(ASSET_FONT_SOURCES, ["NotoSansCuneiform"]) == ([CUNEIFORM], [HONK])
+
+    def test_first_source_without_core_families(self):
+        """Test that a font set without any of the core families still has a core font."""
+        assert split_core_sources(ASSET_FONT_SOURCES) == ([HONK], [CUNEIFORM])
+
+    def test_dict_sources(self):
+        assert split_core_sources([s.to_dict() for s in ASSET_FONT_SOURCES], ["Honk"]) == ([HONK], [CUNEIFORM])
+
+
+class TestLazyFontSet:
+    def test_only_core_fonts_are_downloaded_up_front(self, asset_fonts_download_setup):
+        font_set = LazyFontSet(ASSET_FONT_SOURCES, core_families=["Honk"])
+
+        sources = json.loads((font_set.font_dir / "sources.json").read_text())
+
+        assert [source["name"] for source in sources] == [HONK.name]
+        assert font_set.fetch_for("Hello") == []
+        assert font_set.fetched == {}
+
+    def test_fonts_are_fetched_for_missing_characters(self, asset_fonts_download_setup):
+        registered = []
+        font_set = LazyFontSet(ASSET_FONT_SOURCES, core_families=["Honk"], on_fetch=registered.extend)
+
+        fetched = font_set.fetch_for("Hello 𒀀")
+
+        assert fetched == [font_set.fetched[CUNEIFORM.name]]
+        assert registered == fetched
+        assert font_set.fetch_for("𒀀𒀁") == []
+        assert registered == fetched
+
+    def test_characters_no_font_is_designed_for(self, asset_fonts_download_setup):
+        """Test that characters no font of the set is designed for fetch nothing, once."""
+        font_set = LazyFontSet(ASSET_FONT_SOURCES, core_families=["Honk"])
+
+        assert font_set.fetch_for("שלום") == []
+        assert font_set.fetched == {}
+        assert font_set._settled.issuperset("שלום")
+
+    def test_lazy_font_config(self, asset_fonts_download_setup):
+        config = FontConfig(sources=ASSET_FONT_SOURCES, lazy=True, core_families=["Honk"])
+        loaded = FontConfig.from_dict(config.to_dict())
+
+        assert loaded.lazy
+        assert loaded.core_families == ["Honk"]
+        assert [path.name for path in loaded.get_font_dir().iterdir() if path.suffix == ".ttf"] == [HONK.name]
+        assert loaded.lazy_font_set().lazy_sources == [FontSource(url=CUNEIFORM.url)]
@@ -0,0 +1,62 @@
+"""Tests for font_download.scripts module."""
+
+import random
+import unicodedata
+
+import pytest
+
+from font_download.example_fonts.noto_sans import FONTS_NOTO_SANS
+from font_download.scripts import family_characters, font_family, sample_text
+
+
+class TestFontFamily:
+    @pytest.mark.parametrize(
+        ("font_name", "expected"),
+        [
+            ("NotoSansOldItalic-Regular.ttf", "NotoSansOldItalic"),
+            ("NotoSansArabic[wdth,wght].ttf", "NotoSansArabic"),
+            ("NotoSans-Italic[wdth,wght].ttf", "NotoSans"),
+            ("NotoColorEmoji-Regular.ttf", "NotoColorEmoji"),
+        ],
+    )
+    def test_strips_style_and_axes(self, font_name, expected):
+        assert font_family(font_name) == expected
+
+
+class TestFamilyCharacters:
+    def test_script_named_family(self):
+        characters = family_characters("NotoSansOldItalic")
+
+        assert characters
+        assert all(unicodedata.name(char).startswith("OLD ITALIC ") for char in characters)
+
+    def test_variant_shares_base_family(self):
+        assert family_characters("NotoSansNKoUnjoined") == family_characters("NotoSansNKo")
+
+    def test_special_families(self):
+        assert "😀" in family_characters("NotoColorEmoji")
+        assert "あ" in family_characters("NotoSansJP")
+        assert "A" in family_characters("NotoSans")
+
+    def test_unknown_family(self):
+        assert family_characters("NotoSansNoSuchScript") == ""
+
+    def test_most_noto_families_are_known(self):
+        families = {font_family(source.name) for source in FONTS_NOTO_SANS}
+        unknown = {family for family in families if not family_characters(family)}
+
+        # Only scripts newer than this Python's Unicode database may be unknown
+        assert len(unknown) <= 5, unknown
+
+
+class TestSampleText:
+    def test_is_deterministic(self):
+        first = sample_text("NotoSansHebrew", length=12, rng=random.Random(1))
+        second = sample_text("NotoSansHebrew", length=12, rng=random.Random(1))
+
+        assert first == second
+        assert len(first) == 12
+        assert set(first) <= set(family_characters("NotoSansHebrew"))
+
+    def test_unknown_family_is_empty(self):
+        assert sample_text("NotoSansNoSuchScript") == ""
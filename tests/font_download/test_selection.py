@@ -0,0 +1,70 @@
+"""Tests for font_download.selection module."""
+
+import io
+
+import numpy as np
+
+from font_download import FontConfig
+from font_download.selection import _read_lines, count_codepoints, select_fonts
+from tests.font_download.conftest import ASSET_FONT_SOURCES
+
+HONK, CUNEIFORM = (source.name for source in ASSET_FONT_SOURCES)
+
+
+class TestCountCodepoints:
+    def test_counts_across_chunks(self):
+        counts = count_codepoints(iter(["ab", "b", "", "𒀀"]), chunk_texts=2)
+
+        assert counts[ord("a")] == 1
+        assert counts[ord("b")] == 2
+        assert counts[ord("𒀀")] == 1
+        assert counts.sum() == 4
+
+
+class TestSelectFonts:
+    def test_single_font_covers_corpus(self, asset_fonts_download_setup):
+        selection = select_fonts(ASSET_FONT_SOURCES, ["Hello", "𒀀𒀁"])
+
+        assert [source.name for source in selection.sources] == [CUNEIFORM]
+        assert selection.uncovered == ""
+
+    def test_ties_prefer_earlier_sources(self, asset_fonts_download_setup):
+        selection = select_fonts(ASSET_FONT_SOURCES, ["Hello world"])
+
+        assert [source.name for source in selection.sources] == [HONK]
+
+    def test_needs_both_fonts(self, asset_fonts_download_setup):
+        selection = select_fonts(ASSET_FONT_SOURCES, ["Ĉ 𒀀𒀁𒀂"])
+
+        assert [source.name for source in selection.sources] == [HONK, CUNEIFORM]
+        assert selection.covered_by[CUNEIFORM] > selection.covered_by[HONK]
+
+    def test_uncovered_characters(self, asset_fonts_download_setup):
+        selection = select_fonts(ASSET_FONT_SOURCES, ["Hello שלום"])
+
+        assert sorted(selection.uncovered) == sorted("שלום")
+
+    def test_min_count_ignores_rare_characters(self, asset_fonts_download_setup):
+        selection = select_fonts(ASSET_FONT_SOURCES, ["Hello 𒀀"] + ["Hello"] * 3, min_count=2)
+
+        assert [source.name for source in selection.sources] == [HONK]
+
+    def test_to_font_config(self, asset_fonts_download_setup):
+        selection = select_fonts([source.to_dict() for source in ASSET_FONT_SOURCES], ["𒀀"])
+
+        config = selection.to_font_config()
+
+        assert isinstance(config, FontConfig)
+        assert config.coverage("𒀀").is_renderable
+        assert np.array_equal(config.coverage_report(["A"]).renderable, [True])
+
+
+class TestReadLines:
+    def test_stdin_is_not_closed(self, monkeypatch, tmp_path):
+        corpus = tmp_path / "corpus.txt"
+        corpus.write_text("file\n", encoding="utf-8")
+        stdin = io.StringIO("a\nb\n")
+        monkeypatch.setattr("sys.stdin", stdin)
+
+        assert list(_read_lines(["-", str(corpus), "-"])) == ["a\n", "b\n", "file\n"]
+        assert not stdin.closed
@@ -0,0 +1,43 @@
+"""Tests that heavy dependencies are only imported when they are used."""
+
+import importlib.util
+import subprocess
+import sys
+
+import pytest
+
+HEAVY_MODULES = ("transformers", "torch", "gi", "cairo", "signwriting", "utf8_tokenizer")
+
+
+def imported_modules(code: str) -> set[str]:
+    """Heavy modules imported after running `code` in a fresh interpreter."""
+    check = f"import sys; print(' '.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))"
+    completed = subprocess.run([sys.executable, "-c", f"{code}\n{check}"], capture_output=True, text=True, check=True)
+    return set(completed.stdout.split())
+
+
+def test_package_imports_are_light():
+    assert imported_modules("import pixel_renderer, font_download, font_download.selection") == set()
+
+
+def test_lazy_attributes():
+    assert imported_modules("from font_download import download_fonts") == set()
+    assert "transformers" in imported_modules("from font_download import FontConfig")
+
+
+def test_spec_unpickles_without_transformers():
+    code = (
+        "import pickle\n"
+        "from pixel_renderer import PixelRendererSpec\n"
+        "pickle.loads(pickle.dumps(PixelRendererSpec.from_font_dir('/tmp/0123456789abcdef')))"
+    )
+    assert imported_modules(code) == set()
+
+
+@pytest.mark.skipif(importlib.util.find_spec("gi") is None, reason="PyGObject is not installed")
+def test_render_text_does_not_import_transformers():
+    modules = imported_modules("from pixel_renderer import render_text\nrender_text('Hello\\nworld')")
+
+    assert "transformers" not in modules
+    assert "utf8_tokenizer" not in modules
+    assert "signwriting" in modules  # SignWriting detection is part of every render
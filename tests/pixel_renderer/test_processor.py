@@ -1,14 +1,23 @@
 """Tests for PixelRendererProcessor."""
 
+import asyncio
+import logging
+import multiprocessing
+import pickle
+import shutil
 import tempfile
+import threading
 
 import numpy as np
 import pytest
 from transformers import ProcessorMixin
 
 from font_download import FontConfig
+from font_download.example_fonts.honk import FONTS_HONK
 from font_download.example_fonts.noto_sans import FONTS_NOTO_SANS_MINIMAL
-from pixel_renderer.processor import PixelRendererProcessor
+from font_download.fonts import FontSource
+from pixel_renderer import renderer
+from pixel_renderer.processor import PixelRendererProcessor, _initialized_processors
 
 
 @pytest.fixture
@@ -101,6 +110,34 @@ class TestPixelRendererProcessor:
             result = new_processor.render_text("Test", block_size=16, font_size=12)
             assert isinstance(result, np.ndarray)
 
+    @pytest.mark.parametrize("archive", [False, True])
+    def test_processor_saved_with_font_bundle(self, font_config, monkeypatch, tmp_path, archive):
+        """Test that a processor saved with its fonts renders the same elsewhere, without downloading them."""
+        processor = PixelRendererProcessor(font=font_config)
+        expected = processor.render_text("Hello World")
+        processor.save_pretrained(tmp_path / "saved", bundle_fonts=True, archive=archive)
+        shutil.copytree(tmp_path / "saved", tmp_path / "node", symlinks=True)
+
+        monkeypatch.setattr("font_download.config.download_fonts", lambda sources: pytest.fail("fonts downloaded"))
+        loaded = PixelRendererProcessor.from_pretrained(tmp_path / "node")
+
+        assert np.array_equal(loaded.render_text("Hello World"), expected)
+        assert [source["url"] for source in loaded.spec.to_processor().font.sources] == [
+            source["url"] for source in loaded.font.sources
+        ]
+
+    def test_processor_renders_bundle_with_unwritable_cache(self, font_config, monkeypatch, tmp_path):
+        """Test that a processor renders from a font bundle on a node where the font cache cannot be created."""
+        processor = PixelRendererProcessor(font=font_config)
+        expected = processor.render_text("Hello World")
+        processor.save_pretrained(tmp_path / "saved", bundle_fonts=True)
+        (tmp_path / "file").touch()
+
+        monkeypatch.setattr("font_download.download_fonts.FONT_DOWNLOAD_CACHE_DIR", tmp_path / "file" / "font_download")
+        loaded = PixelRendererProcessor.from_pretrained(tmp_path / "saved")
+
+        assert np.array_equal(loaded.render_text("Hello World"), expected)
+
     def test_processor_renders_empty_string(self, font_config):
         """Test rendering empty string."""
         processor = PixelRendererProcessor(font=font_config)
@@ -128,6 +165,150 @@ class TestPixelRendererProcessor:
         # Check that fontconfig path points to font config_dir
         assert processor.fontconfig_path.parent == font_config.get_font_dir()
 
+    def test_processors_with_different_fonts_render_interleaved(self, font_config):
+        """Test that processors with different fonts each render with their own fonts, in any order."""
+        noto = PixelRendererProcessor(font=font_config)
+        honk = PixelRendererProcessor(font=FontConfig(sources=FONTS_HONK))
+
+        noto_first = noto.render_text("Hello World")
+        honk_first = honk.render_text("Hello World")
+        noto_second = noto.render_text("Hello World")
+        honk_second = honk.render_text("Hello World")
+
+        assert noto.font_map is not honk.font_map
+        assert np.array_equal(noto_first, noto_second)
+        assert np.array_equal(honk_first, honk_second)
+        assert not np.array_equal(noto_first, honk_first)
+
+    def test_processor_with_fonts_selected_in_store(self, font_config):
+        """Test that a font directory selecting its fonts in the font store sees none of the other stored fonts."""
+        noto = PixelRendererProcessor(font=font_config)
+        honk = PixelRendererProcessor(font=FontConfig(sources=FONTS_HONK, link_fonts=False))
+
+        noto_result = noto.render_text("Hello World")
+        honk_result = honk.render_text("Hello World")
+
+        assert honk.fontconfig_path == honk.font.get_font_dir() / "fonts.conf"
+        assert honk_result.min() < 255
+        assert not np.array_equal(noto_result, honk_result)
+
+    def test_forked_child_initializes_its_own_state(self, font_config):
+        """Test that a forked child renders with its own font map and Cairo state, not its parent's."""
+        processor = PixelRendererProcessor(font=font_config)
+        expected = processor.render_text("Hello World")
+        parent_font_map = processor.font_map
+        parent_thread_state = renderer._thread_state
+
+        context = multiprocessing.get_context("fork")
+        queue = context.Queue()
+
+        def render_in_child():
+            rendered = processor.render_text("Hello World")
+            fresh_font_map = processor.font_map is not parent_font_map
+            queue.put((fresh_font_map and renderer._thread_state is not parent_thread_state, rendered))
+
+        child = context.Process(target=render_in_child)
+        child.start()
+        fresh_state, rendered = queue.get(timeout=60)
+        child.join()
+
+        assert fresh_state
+        assert np.array_equal(rendered, expected)
+
+    def test_fonts_are_acquired_in_the_background(self, font_config, monkeypatch):
+        """Test that initialization does not wait for the fonts, and the first render does."""
+        release = threading.Event()
+        get_font_dir = FontConfig.get_font_dir
+
+        def slow_get_font_dir(config):
+            release.wait(timeout=60)
+            return get_font_dir(config)
+
+        monkeypatch.setattr(FontConfig, "get_font_dir", slow_get_font_dir)
+
+        processor = PixelRendererProcessor(font=font_config)
+        assert processor._font_dir is None
+
+        release.set()
+        assert isinstance(processor.render_text("Hello"), np.ndarray)
+        assert processor._font_dir == get_font_dir(font_config)
+
+    def test_spec_rebuilds_the_processor(self, font_config, monkeypatch):
+        """Test that a processor rebuilt from its unpickled spec renders the same, without downloading fonts."""
+        processor = PixelRendererProcessor(font=font_config)
+        expected = processor.render_text("Hello World")
+        spec = pickle.loads(pickle.dumps(processor.spec))
+
+        monkeypatch.setattr(FontConfig, "get_font_dir", lambda config: pytest.fail("fonts downloaded again"))
+        rebuilt = spec.to_processor()
+
+        assert rebuilt.spec == spec
+        assert np.array_equal(rebuilt.render_text("Hello World"), expected)
+        assert len(pickle.dumps(spec)) < len(pickle.dumps(processor)) / 10
+
+    def test_spec_keeps_pinned_sources(self, font_config):
+        """Test that the SHA-256 a source pins survives spec -> processor -> spec, and still verifies its font."""
+        pinned = PixelRendererProcessor(font=font_config).spec.font_sources()
+        processor = PixelRendererProcessor(font=FontConfig(sources=pinned))
+        spec = processor.spec
+
+        rebuilt = spec.to_processor()
+
+        assert [FontSource.from_dict(source) for source in rebuilt.font.sources] == pinned
+        assert rebuilt.spec == spec
+        assert rebuilt.spec.font_sources() == pinned
+
+    def test_lazy_fonts_are_fetched_and_registered_on_render(self):
+        """Test that a lazy font set renders characters of fonts it only downloads when they are needed."""
+        processor = PixelRendererProcessor(font=FontConfig(sources=FONTS_NOTO_SANS_MINIMAL, lazy=True))
+        without_arabic = processor.render_text("Hello")
+        assert len(list(processor._font_dir.glob("*.ttf"))) == 1
+
+        font_config = FontConfig(sources=FONTS_NOTO_SANS_MINIMAL)
+        expected = PixelRendererProcessor(font=font_config).render_text("مرحبا")
+
+        assert np.array_equal(processor.render_text("مرحبا"), expected)
+        assert np.array_equal(processor.render_text("Hello"), without_arabic)
+        with pytest.raises(ValueError, match="lazy"):
+            _ = processor.spec
+
+    def test_aready(self, font_config):
+        """Test that the fonts can be awaited from asyncio, overlapping with other work."""
+        processor = PixelRendererProcessor(font=font_config)
+
+        async def load_everything():
+            await asyncio.gather(processor.aready(), asyncio.sleep(0))
+
+        asyncio.run(load_everything())
+        asyncio.run(processor.aready())  # already done
+        assert isinstance(processor.render_text("Hello"), np.ndarray)
+
+    def test_warmup(self, font_config, caplog):
+        """Test that warm-up initializes the processor and logs how long it took."""
+        processor = PixelRendererProcessor(font=font_config)
+
+        with caplog.at_level(logging.INFO, logger="pixel_renderer.processor"):
+            seconds = processor.warmup(texts=["Hello World"], font_sizes=(12, 16))
+
+        assert seconds > 0
+        assert "Warmed up" in caplog.text
+        assert processor in _initialized_processors
+
+    def test_warmup_with_scripts_and_defaults(self, font_config):
+        """Test warm-up with sample text of font families, and with a sample of the processor's fonts."""
+        processor = PixelRendererProcessor(font=font_config)
+
+        assert processor.warmup(scripts=["NotoSans", "UnknownFamily"]) > 0
+        assert processor.warmup() > 0
+
+    def test_worker_init_fn(self, font_config):
+        """Test that the worker init function warms up a DataLoader worker."""
+        processor = PixelRendererProcessor(font=font_config)
+
+        processor.worker_init_fn(0)
+
+        assert processor in _initialized_processors
+
     def test_processor_render_preserves_aspect_ratio(self, font_config):
         """Test that rendered text maintains reasonable aspect ratios."""
         processor = PixelRendererProcessor(font=font_config)
@@ -4,9 +4,21 @@ import numpy as np
 import torch
 
 from pixel_renderer import render_text
+from pixel_renderer.renderer import _CONTROL_PICTURES
 
 
 class TestRenderer(unittest.TestCase):
+    def test_control_characters_are_rendered_as_control_pictures(self):
+        """Test the exact translation of ASCII before rendering, which changes what every rendered input shows."""
+        ascii_text = "".join(map(chr, range(0x80)))
+
+        expected = (
+            "␀␁␂␃␄␅␆␇␈␉␊␋␌␍␎␏␐␑␒␓␔␕␖␗␘␙␚␛␜␝␞␟"
+            " !\"#$%&'()*+,-./0123456789:;<=>?@ABCDEFGHIJKLMNOPQRSTUVWXYZ[\\]^_`abcdefghijklmnopqrstuvwxyz{|}~"
+            "␡"
+        )
+        assert ascii_text.translate(_CONTROL_PICTURES) == expected
+
     def test_single_text_has_black_pixels(self):
         """Test that rendering a single text produces black pixels in the image."""
         text = "Hello World"
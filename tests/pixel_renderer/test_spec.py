@@ -0,0 +1,77 @@
+"""Tests for PixelRendererSpec."""
+
+import json
+import pickle
+
+import pytest
+
+from font_download.download_fonts import _compute_sources_hash
+from font_download.fonts import FontSource
+from pixel_renderer.spec import PixelRendererSpec
+
+SOURCES = [
+    FontSource(url="https://example.com/fonts/font1.ttf"),
+    FontSource(url="https://example.com/fonts/font2.ttf"),
+]
+
+
+@pytest.fixture
+def font_dir(tmp_path):
+    """A complete font directory, as download_fonts creates it."""
+    font_dir = tmp_path / _compute_sources_hash(SOURCES)
+    font_dir.mkdir()
+    (font_dir / "sources.json").write_text(json.dumps([source.to_dict() for source in SOURCES]))
+    return font_dir
+
+
+class TestPixelRendererSpec:
+    def test_from_font_dir(self, font_dir):
+        spec = PixelRendererSpec.from_font_dir(font_dir)
+
+        assert spec.sources_hash == _compute_sources_hash(SOURCES)
+        assert spec.font_dir == str(font_dir)
+        assert spec.font_sources() == SOURCES
+
+    def test_spec_is_frozen_and_hashable(self, font_dir):
+        spec = PixelRendererSpec.from_font_dir(font_dir)
+
+        with pytest.raises(AttributeError):
+            spec.font_dir = "/tmp"
+        assert {spec: 1}[PixelRendererSpec.from_font_dir(font_dir)] == 1
+
+    def test_pickle_round_trip(self, font_dir):
+        spec = PixelRendererSpec.from_font_dir(font_dir)
+        pickled = pickle.dumps(spec)
+
+        assert pickle.loads(pickled) == spec
+        # Only the values, without field names
+        assert b"sources_hash" not in pickled
+        assert len(pickled) < 100 + len(spec.font_dir)
+
+    def test_missing_font_dir(self, tmp_path):
+        spec = PixelRendererSpec.from_font_dir(tmp_path / "0123456789abcdef")
+
+        with pytest.raises(FileNotFoundError, match="not on this machine"):
+            spec.font_sources()
+
+    def test_font_dir_with_other_sources(self, font_dir):
+        spec = PixelRendererSpec(sources_hash=_compute_sources_hash(SOURCES[:1]), font_dir=str(font_dir))
+
+        with pytest.raises(ValueError, match="does not hold the fonts"):
+            spec.font_sources()
+
+    def test_stored_fields_are_kept(self, tmp_path):
+        sources = [
+            FontSource(url="https://example.com/fonts/font1.ttf", sha256="a" * 64),
+            FontSource(url="/fonts/local.ttf", name="Local-Regular.ttf", sha256="b" * 64),
+        ]
+        font_dir = tmp_path / _compute_sources_hash(sources)
+        font_dir.mkdir()
+        (font_dir / "sources.json").write_text(json.dumps([source.to_dict() for source in sources]))
+
+        assert PixelRendererSpec.from_font_dir(font_dir).font_sources() == sources
+
+    def test_font_dir_selecting_fonts_in_store(self, font_dir):
+        spec = PixelRendererSpec(sources_hash=_compute_sources_hash(SOURCES, link_fonts=False), font_dir=str(font_dir))
+
+        assert spec.font_sources() == SOURCES
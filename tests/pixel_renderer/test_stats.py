@@ -0,0 +1,119 @@
+"""Tests for the opt-in render statistics."""
+
+import pickle
+import threading
+
+import pytest
+
+from pixel_renderer import render_text
+from pixel_renderer.stats import (
+    STAGES,
+    RenderStats,
+    StageStats,
+    current_stats,
+    enable_render_stats,
+    get_render_stats,
+    reset_render_stats,
+)
+
+
+@pytest.fixture
+def render_stats():
+    enable_render_stats()
+    reset_render_stats()
+    yield
+    enable_render_stats(False)
+
+
+class TestStageStats:
+    def test_percentiles_bound_recorded_values(self):
+        stage = StageStats()
+        for elapsed_ns in range(1_000, 101_000, 1_000):
+            stage.record(elapsed_ns)
+
+        assert stage.count == 100
+        # Buckets have ~19% resolution, percentiles report the bucket upper bound
+        assert 50_000 <= stage.percentile_ns(50) <= 50_000 * 1.2
+        assert 99_000 <= stage.percentile_ns(99) <= 100_000
+        assert stage.percentile_ns(100) == stage.max_ns == 100_000
+
+    def test_empty_stage(self):
+        assert StageStats().percentile_ns(99) == 0
+        assert StageStats().to_dict()["mean_us"] == 0.0
+
+
+class TestRenderStats:
+    def test_disabled_by_default(self):
+        assert get_render_stats() is None
+        render_text("disabled")
+        assert get_render_stats() is None
+
+    @pytest.mark.usefixtures("render_stats")
+    def test_records_every_text_stage(self):
+        for _ in range(3):
+            render_text("Hello", block_size=16, font_size=12)
+
+        stats = get_render_stats()
+        for stage in ("preprocess", "measure", "fill", "show_layout", "bgra_to_rgb", "total"):
+            assert stats.stages[stage].count == 3, stage
+        assert stats.stages["signwriting"].count == 0
+        assert stats.stages["total"].total_ns >= stats.stages["show_layout"].total_ns
+
+    @pytest.mark.usefixtures("render_stats")
+    def test_records_signwriting_stage(self):
+        render_text("𝠀񀀒񀀚񋚥񋛩𝠃𝤟𝤩񋛩𝣵𝤐񀀒𝤇𝣤񋚥𝤐𝤆񀀚𝣮𝣭")
+
+        stats = get_render_stats()
+        assert stats.stages["signwriting"].count == 1
+        assert stats.stages["measure"].count == 0
+
+    @pytest.mark.usefixtures("render_stats")
+    def test_reset(self):
+        render_text("Hello")
+        reset_render_stats()
+
+        assert get_render_stats().stages["total"].count == 0
+
+    @pytest.mark.usefixtures("render_stats")
+    def test_snapshot_is_independent(self):
+        render_text("Hello")
+        snapshot = get_render_stats()
+        render_text("Hello")
+
+        assert snapshot.stages["total"].count == 1
+
+    @pytest.mark.usefixtures("render_stats")
+    def test_threads_record_without_losing_counts(self):
+        num_threads, laps = 8, 10_000
+        barrier = threading.Barrier(num_threads)
+
+        def record():
+            barrier.wait()
+            for _ in range(laps):
+                current_stats().lap("total", 0)
+
+        threads = [threading.Thread(target=record) for _ in range(num_threads)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        total = get_render_stats().stages["total"]
+        assert total.count == num_threads * laps
+        assert sum(total.buckets) == total.count
+
+    def test_merge_across_workers(self):
+        worker_a, worker_b = RenderStats(), RenderStats()
+        worker_b.pids = {worker_b.pids.pop() + 1}
+        worker_a.stages["total"].record(1_000)
+        worker_b.stages["total"].record(3_000)
+        worker_b.stages["total"].record(5_000)
+
+        # Snapshots travel between processes by pickling
+        merged = RenderStats.merge([pickle.loads(pickle.dumps(worker_a)), worker_b])
+
+        assert merged.stages["total"].count == 3
+        assert merged.stages["total"].total_ns == 9_000
+        assert merged.stages["total"].max_ns == 5_000
+        assert len(merged.pids) == 2
+        assert set(merged.to_dict()["stages"]) == set(STAGES)